@@ -0,0 +1,254 @@
+"""
+Hot/cold tiering for assessments.
+
+Rows older than ARCHIVE_AFTER_DAYS move out of the hot Assessment table into one SQLite
+file per month under ARCHIVE_DIR. Each archived row keeps the summary columns (for the
+history listing) and one zlib-compressed payload with the full record and rebuilt plan.
+ArchivedMonth in the hot database records which months hold a user's rows, so history and
+account deletion only open those partitions.
+
+Run the job (incremental: each batch is copied, committed, then deleted from the hot
+table, so an interrupted run just picks up where it stopped):
+    python archive.py run
+    python archive.py run --older-than-days 90 --vacuum
+    python archive.py list
+    python archive.py reindex   # rebuild ArchivedMonth from the partition files
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import (Column, DateTime, Index, Integer, LargeBinary, MetaData, String, Table,
+                        and_, delete, or_, select as sa_select, text)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+import database
+from models import ArchivedMonth, Assessment
+from planStore import canonical_json, collect_garbage, load_plans
+from schemas import AssessmentSummary
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Per partition file: reads are rare and short, so one connection (plus one overflow) is plenty
+ARCHIVE_POOL_SIZE = int(os.getenv("ARCHIVE_POOL_SIZE", "1"))
+
+archive_metadata = MetaData()
+archived_assessment = Table(
+    "archived_assessment", archive_metadata,
+    Column("id", Integer, primary_key=True),  # same id as in the hot table
+    Column("user_id", Integer, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("issue_type", String, nullable=False),
+    Column("urgency", String, nullable=False),
+    Column("severity_score", Integer, nullable=False),
+    Column("payload", LargeBinary, nullable=False),  # zlib(full record JSON)
+    Index("ix_archived_history", "user_id", "created_at", "id", "issue_type", "urgency", "severity_score"),
+)
+
+_engines: Dict[str, AsyncEngine] = {}
+
+
+def partition_path(month: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"assessments-{month}.db")
+
+
+def partitions() -> List[str]:
+    """Archived months, newest first."""
+    months = [os.path.basename(p)[len("assessments-"):-len(".db")] for p in glob.glob(os.path.join(ARCHIVE_DIR, "assessments-*.db"))]
+    return sorted(months, reverse=True)
+
+
+async def _engine(month: str, create: bool = False) -> AsyncEngine:
+    if create:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    engine = _engines.get(month)
+    if engine is None:
+        engine = _engines[month] = database.make_engine(
+            f"sqlite:///{partition_path(month)}", pool_size=ARCHIVE_POOL_SIZE, max_overflow=1
+        )
+    if create:
+        async with engine.begin() as conn:
+            await conn.run_sync(archive_metadata.create_all)
+    return engine
+
+
+async def dispose_archives():
+    engines = list(_engines.values())
+    _engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+async def archived_months(user_id: int) -> List[str]:
+    """Months with archived rows for the user, newest first."""
+    async with database.new_session() as session:
+        return list((await session.exec(
+            select(ArchivedMonth.month).where(ArchivedMonth.user_id == user_id).order_by(ArchivedMonth.month.desc())
+        )).all())
+
+
+def _mark_archived(pairs: List[Tuple[int, str]]):
+    """INSERT ... ON CONFLICT DO NOTHING for (user_id, month) index rows."""
+    insert = postgresql.insert if database.engine.dialect.name == "postgresql" else sqlite.insert
+    return insert(ArchivedMonth).values([{"user_id": u, "month": m} for u, m in pairs]).on_conflict_do_nothing()
+
+
+def _before(table_or_model, before: Optional[Tuple[datetime, int]]):
+    created_at, assessment_id = before
+    return or_(
+        table_or_model.created_at < created_at,
+        and_(table_or_model.created_at == created_at, table_or_model.id < assessment_id),
+    )
+
+
+async def archive_page(user_id: int, limit: int, before: Optional[Tuple[datetime, int]] = None) -> List[AssessmentSummary]:
+    """Up to `limit` archived summaries older than `before`, walking months newest first."""
+    items: List[AssessmentSummary] = []
+    for month in await archived_months(user_id):
+        if before is not None and month > before[0].strftime("%Y-%m"):
+            continue  # the whole month is newer than the cursor
+        t = archived_assessment.c
+        query = sa_select(t.id, t.created_at, t.issue_type, t.urgency, t.severity_score).where(t.user_id == user_id)
+        if before is not None:
+            query = query.where(_before(t, before))
+        query = query.order_by(t.created_at.desc(), t.id.desc()).limit(limit - len(items))
+        async with (await _engine(month)).connect() as conn:
+            rows = (await conn.execute(query)).all()
+        items.extend(AssessmentSummary(**row._mapping) for row in rows)
+        if len(items) >= limit:
+            break
+    return items
+
+
+async def archived_detail(user_id: int, assessment_id: int) -> Optional[Dict]:
+    for month in await archived_months(user_id):
+        t = archived_assessment.c
+        async with (await _engine(month)).connect() as conn:
+            row = (await conn.execute(
+                sa_select(t.created_at, t.payload).where(t.id == assessment_id, t.user_id == user_id)
+            )).first()
+        if row is not None:
+            record = json.loads(zlib.decompress(row.payload))
+            record["created_at"] = row.created_at
+            return record
+    return None
+
+
+async def delete_user_rows(user_id: int) -> int:
+    """Removes a user's archived assessments from their partitions (account deletion)."""
+    deleted = 0
+    for month in await archived_months(user_id):
+        async with (await _engine(month)).begin() as conn:
+            result = await conn.execute(delete(archived_assessment).where(archived_assessment.c.user_id == user_id))
+        deleted += result.rowcount
+    async with database.new_session() as session:
+        await session.execute(delete(ArchivedMonth).where(ArchivedMonth.user_id == user_id))
+        await session.commit()
+    return deleted
+
+
+async def archive_batch(cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Moves the oldest batch of rows created before cutoff. Returns how many moved (0 = done)."""
+    async with database.new_session() as session:
+        rows = (await session.exec(
+            select(Assessment).where(Assessment.created_at < cutoff)
+            .order_by(Assessment.created_at, Assessment.id).limit(batch_size)
+        )).all()
+        if not rows:
+            return 0
+        plans = await load_plans(session, [row.full_plan_json for row in rows])
+
+    by_month = defaultdict(list)
+    for row, plan in zip(rows, plans):
+        record = row.model_dump()
+        record["full_plan_json"] = plan
+        by_month[row.created_at.strftime("%Y-%m")].append({
+            "id": row.id, "user_id": row.user_id, "created_at": row.created_at,
+            "issue_type": row.issue_type, "urgency": row.urgency, "severity_score": row.severity_score,
+            "payload": zlib.compress(canonical_json(record), 9),
+        })
+
+    # Copy first (idempotent on id), delete from the hot table only once the copy is committed
+    for month, values in by_month.items():
+        async with (await _engine(month, create=True)).begin() as conn:
+            await conn.execute(sqlite.insert(archived_assessment).values(values).on_conflict_do_nothing(index_elements=["id"]))
+
+    # The index rows commit together with the hot delete, so readers never see a row twice
+    async with database.new_session() as session:
+        await session.execute(_mark_archived(sorted({(row.user_id, row.created_at.strftime("%Y-%m")) for row in rows})))
+        await session.execute(delete(Assessment).where(Assessment.id.in_([row.id for row in rows])))
+        await session.commit()
+    return len(rows)
+
+
+async def reindex() -> int:
+    """Rebuilds ArchivedMonth from the partitions (e.g. ones archived before it existed)."""
+    marked = 0
+    for month in partitions():
+        async with (await _engine(month)).connect() as conn:
+            users = (await conn.execute(sa_select(archived_assessment.c.user_id).distinct())).scalars().all()
+        if users:
+            async with database.new_session() as session:
+                await session.execute(_mark_archived([(user_id, month) for user_id in users]))
+                await session.commit()
+            marked += len(users)
+    return marked
+
+
+async def run(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    while True:
+        count = await archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        print(f"  archived {moved} assessments older than {cutoff:%Y-%m-%d}")
+    if moved:
+        # Archived payloads carry their full plan, so blobs only those rows used can go
+        deleted = await collect_garbage()
+        print(f"  removed {deleted} plan blobs no hot row references")
+    return moved
+
+
+async def _main(args):
+    await database.create_db_and_tables()
+    try:
+        if args.command == "run":
+            moved = await run(args.older_than_days, args.batch_size)
+            print(f"✅ Archived {moved} assessments")
+            if moved and args.vacuum and database.engine.dialect.name == "sqlite":
+                async with database.engine.connect() as conn:
+                    await conn.execute(text("VACUUM"))
+                print("🧹 VACUUM done - hot database compacted")
+        elif args.command == "reindex":
+            marked = await reindex()
+            print(f"✅ Indexed {marked} user-months")
+        else:
+            for month in partitions():
+                async with (await _engine(month)).connect() as conn:
+                    count = (await conn.execute(text("SELECT count(*) FROM archived_assessment"))).scalar()
+                print(f"📦 {month}: {count} assessments ({os.path.getsize(partition_path(month))} bytes)")
+    finally:
+        await dispose_archives()
+        await database.dispose_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old assessments into monthly SQLite partitions")
+    parser.add_argument("command", choices=["run", "list", "reindex"])
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--vacuum", action="store_true", help="Compact the hot SQLite file afterwards")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
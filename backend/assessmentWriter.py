@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel.ext.asyncio.session import AsyncSession
+import database
+from models import Assessment
+from planStore import store_plans
+from schemas import UserAssessmentInput, FinalPlan
+
+# --- Write-behind persistence for Assessment rows ---
+# generate-plan enqueues the row and returns; one background writer drains the queue
+# and group-commits up to ASSESSMENT_BATCH_MAX rows per transaction, so SQLite pays one
+# fsync per batch instead of one per request. The queue is bounded: when it is full,
+# submit() waits (backpressure) rather than dropping assessments. Readers flush only their
+# own user's queued rows, so a history read never waits behind everyone else's writes.
+
+ASSESSMENT_WRITE_BEHIND = os.getenv("ASSESSMENT_WRITE_BEHIND", "1") == "1"
+ASSESSMENT_QUEUE_MAX = int(os.getenv("ASSESSMENT_QUEUE_MAX", "1000"))
+ASSESSMENT_BATCH_MAX = int(os.getenv("ASSESSMENT_BATCH_MAX", "100"))
+ASSESSMENT_BATCH_WAIT_S = float(os.getenv("ASSESSMENT_BATCH_WAIT_S", "0.02"))
+# SQLite durability per batch commit: "full" fsyncs the WAL on every commit, "normal"
+# only at checkpoints (a power loss can drop the last batches, never corrupt the file)
+ASSESSMENT_SYNC = os.getenv("ASSESSMENT_SYNC", "normal").upper()
+ASSESSMENT_LOCK_RETRIES = int(os.getenv("ASSESSMENT_LOCK_RETRIES", "5"))
+
+
+def build_assessment(user_id: int, data: UserAssessmentInput, plan: FinalPlan) -> Dict:
+    """Column values for one Assessment row."""
+    scores = plan.scores
+    return dict(
+        user_id=user_id,
+
+        # The Raw Text - Matches UserAssessmentInput
+        raw_primary_concern=data.primary_concern,
+        raw_distress=data.answer_distress,
+        raw_functioning=data.answer_functioning,
+        raw_urgency=data.answer_urgency,
+        raw_safety=data.answer_safety,
+        raw_constraints=data.answer_constraints,
+        latitude=data.latitude,
+        longitude=data.longitude,
+
+        # The Calculated Scores - Matches AssessmentScores
+        issue_type=scores.issue_type,
+        urgency=scores.urgency,
+        severity_score=scores.severity_score,
+        needs_immediate_resources=scores.needs_immediate_resources,
+        confidence=scores.confidence,
+        reasoning=scores.reasoning,
+        personalized_note=scores.personalized_note,
+        classification_source=scores.source,
+
+        # The Full Recommendation
+        full_plan_json=plan.dict(),
+    )
+
+
+def _is_locked(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and "locked" in str(error).lower()
+
+
+class AssessmentWriter:
+    """Bounded queue + one batching writer task, bound to the running event loop."""
+
+    def __init__(self, queue_max: int = ASSESSMENT_QUEUE_MAX, batch_max: int = ASSESSMENT_BATCH_MAX,
+                 batch_wait_s: float = ASSESSMENT_BATCH_WAIT_S, write_behind: bool = ASSESSMENT_WRITE_BEHIND):
+        self.queue_max = queue_max
+        self.batch_max = batch_max
+        self.batch_wait_s = batch_wait_s
+        self.write_behind = write_behind
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self._pending: Dict[int, Set[asyncio.Future]] = {}  # user_id -> rows not yet committed
+        self.written = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.lock_retries = 0
+        self.failed = 0
+
+    def start(self):
+        """Starts the writer on the running loop (also done lazily by submit)."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        self._pending = {}
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row: Dict):
+        if not self.write_behind:
+            await self._write([row])
+            return
+        self.start()
+        done = self._loop.create_future()
+        pending = self._pending.setdefault(row.get("user_id"), set())
+        pending.add(done)
+        done.add_done_callback(lambda f, user_id=row.get("user_id"): self._settled(user_id, f))
+        try:
+            await self._queue.put((row, done))
+        except BaseException:
+            done.cancel()
+            raise
+
+    def _settled(self, user_id, done: asyncio.Future):
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            pending.discard(done)
+            if not pending:
+                del self._pending[user_id]
+
+    async def flush(self, user_id: Optional[int] = None):
+        """
+        Waits until rows submitted so far are committed (or have failed): only that user's
+        rows when user_id is given, otherwise the whole queue.
+        """
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        if user_id is None:
+            await self._queue.join()
+            return
+        pending = list(self._pending.get(user_id, ()))
+        if pending:
+            await asyncio.wait(pending)
+
+    async def stop(self):
+        """Flushes the queue, then stops the writer (app shutdown)."""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._queue = self._loop = None
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            # Let concurrent requests pile in so one commit covers them
+            deadline = time.monotonic() + self.batch_wait_s
+            while len(batch) < self.batch_max:
+                if queue.empty():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+            try:
+                await self._write([row for row, _ in batch])
+            finally:
+                for _, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+                    queue.task_done()
+
+    async def _write(self, rows: List[Dict]):
+        try:
+            await self._commit_with_retry(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                self.failed += 1
+                print(f"❌ Assessment write failed for user {rows[0].get('user_id')}: {e}")
+                return
+            # One bad row shouldn't take the whole batch down with it
+            print(f"⚠️ Batch of {len(rows)} assessments failed ({type(e).__name__}) - retrying row by row")
+            for row in rows:
+                await self._write([row])
+            return
+        self.written += len(rows)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(rows))
+
+    async def _commit_with_retry(self, rows: List[Dict]):
+        for attempt in range(ASSESSMENT_LOCK_RETRIES + 1):
+            try:
+                return await self._commit(rows)
+            except Exception as e:
+                if not _is_locked(e) or attempt == ASSESSMENT_LOCK_RETRIES:
+                    raise
+                self.lock_retries += 1
+                await asyncio.sleep(min(0.05 * 2 ** attempt, 1.0))
+
+    async def _commit(self, rows: List[Dict]):
+        engine = database.get_engine()
+        # The durability override is per connection, so it is set and reset on the one
+        # connection this batch uses rather than leaking into the pool
+        override = engine.dialect.name == "sqlite" and ASSESSMENT_SYNC != database.SQLITE_SYNCHRONOUS
+        async with engine.connect() as conn:
+            if override:
+                await conn.execute(text(f"PRAGMA synchronous={ASSESSMENT_SYNC}"))
+                await conn.commit()
+            try:
+                async with AsyncSession(bind=conn, expire_on_commit=False) as session:
+                    # The plan goes in as a manifest; its shared parts land in PlanBlob (see planStore.py)
+                    manifests = await store_plans(session, [row["full_plan_json"] for row in rows])
+                    session.add_all([Assessment(**{**row, "full_plan_json": manifest}) for row, manifest in zip(rows, manifests)])
+                    await session.commit()
+            finally:
+                if override:
+                    await conn.rollback()
+                    await conn.execute(text(f"PRAGMA synchronous={database.SQLITE_SYNCHRONOUS}"))
+                    await conn.commit()
+
+    def stats(self) -> Dict:
+        return {
+            "write_behind": self.write_behind,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "lock_retries": self.lock_retries,
+            "failed": self.failed,
+        }
+
+
+assessment_writer = AssessmentWriter()
@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+import time
+from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
-from database import engine
-from models import User 
+from sqlmodel import select
+from database import new_session
+from models import User
+from authCache import Principal, principal_cache, revocations
+from passwordHasher import pwd_context
 
 # --- CONFIGURATION ---
 # In production, get these from os.environ!
@@ -14,8 +16,8 @@ SECRET_KEY = "super_secret_demo_key_change_this_immediately"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Setup hashing engine (bcrypt)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashing engine (bcrypt, cost from BCRYPT_ROUNDS) - request handlers go through
+# password_hasher's dedicated pool, see passwordHasher.py
 
 # Setup the token extractor
 # This tells FastAPI that the token will be in the "Authorization: Bearer <token>" header
@@ -40,23 +42,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
         
-    to_encode.update({"exp": expire})
+    # iat with millisecond resolution, so a revocation can't overlap tokens issued in the same second
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def issue_token(user: User) -> str:
+    """Access token carrying the user id, so authenticated routes don't need a user lookup."""
+    return create_access_token(data={"sub": user.email, "uid": user.id})
+
+async def get_user_by_email(email: str) -> Optional[User]:
+    async with new_session() as session:
+        return (await session.exec(select(User).where(User.email == email))).first()
+
+async def get_user_by_id(user_id: int) -> Optional[User]:
+    async with new_session() as session:
+        return await session.get(User, user_id)
+
+def invalidate_user(user_id: int):
+    """Forget cached tokens for the user (call after revoking them)."""
+    principal_cache.invalidate_user(user_id)
+
 # --- THE DEPENDENCY (The Guard) ---
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
     """
-    Decodes the token, extracts the email, and fetches the user from the DB.
-    Use this dependency on any route that requires login.
+    Validates the token and returns who is calling (id + email).
+    Use this dependency on any route that requires login. Verified tokens are cached,
+    and tokens with a "uid" claim never need the database.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+    cached = principal_cache.lookup(token)
+    if cached is not None:
+        principal, issued_at = cached
+        # In memory (refreshed every AUTH_REVOCATION_REFRESH_S): catches revocations
+        # made by another process while this one still has the token cached
+        if await revocations.is_revoked(principal.id, issued_at):
+            principal_cache.invalidate_user(principal.id)
+            raise credentials_exception
+        return principal
+
     try:
         # 1. Decode the token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -65,11 +95,30 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    # 2. Fetch User from DB
-    with Session(engine) as session:
-        user = session.exec(select(User).where(User.email == email)).first()
+
+    # 2. Identify the user: from the claims, or (tokens issued before "uid") from the DB
+    user_id = payload.get("uid")
+    if user_id is None:
+        user = await get_user_by_email(email)
         if user is None:
             raise credentials_exception
-            
-    return user
\ No newline at end of file
+        user_id = user.id
+
+    # 3. Tokens issued before a password change / account deletion are void
+    if await revocations.is_revoked(user_id, payload.get("iat", 0)):
+        raise credentials_exception
+
+    principal = Principal(id=user_id, email=email)
+    principal_cache.put(token, principal, payload.get("exp"), payload.get("iat", 0))
+    return principal
+
+async def get_current_user(principal: Principal = Depends(get_current_principal)) -> User:
+    """The full User row, for the few routes that need more than id + email."""
+    user = await get_user_by_id(principal.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlmodel import select
+import database
+from models import TokenRevocation
+
+# --- Verified-token cache + revocation list ---
+# A token that has been verified once maps straight to its Principal until it expires
+# or AUTH_CACHE_TTL_S passes, so hot routes skip both the JWT decode and the database.
+# Password changes and account deletion write a TokenRevocation row ("tokens issued
+# before this moment are void") and drop the user's cached tokens. Cache hits are still
+# checked against the in-memory revocation list, so other processes reject a revoked
+# token within AUTH_REVOCATION_REFRESH_S whether or not they had it cached. Each refresh
+# only loads rows written since the previous one, and revocations older than the token
+# lifetime are dropped (no token they could void is still valid).
+
+AUTH_CACHE_TTL_S = float(os.getenv("AUTH_CACHE_TTL_S", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_REVOCATION_REFRESH_S = float(os.getenv("AUTH_REVOCATION_REFRESH_S", "30"))
+# At least auth.ACCESS_TOKEN_EXPIRE_MINUTES: revocations are kept this long, then pruned
+AUTH_REVOCATION_RETENTION_S = float(os.getenv("AUTH_REVOCATION_RETENTION_S", "1800"))
+AUTH_REVOCATION_PRUNE_S = float(os.getenv("AUTH_REVOCATION_PRUNE_S", "600"))
+
+
+class Principal(BaseModel):
+    """The authenticated caller, straight from the token claims."""
+    id: int
+    email: str
+
+
+class PrincipalCache:
+    """Bounded LRU of token -> (expires_at, Principal, issued_at), indexed by user for invalidation."""
+
+    def __init__(self, ttl_s: float = AUTH_CACHE_TTL_S, max_entries: int = AUTH_CACHE_MAX_ENTRIES, clock=time.time):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[float, Principal, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        entry = self.lookup(token)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, token: str) -> Optional[Tuple[Principal, float]]:
+        """(Principal, token issued_at) for a cached token, or None."""
+        with self._lock:
+            entry = self._items.get(token)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    self._drop(token)
+                self.misses += 1
+                return None
+            self._items.move_to_end(token)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float] = None, issued_at: float = 0.0):
+        expires_at = self.clock() + self.ttl_s
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._items[token] = (expires_at, principal, issued_at)
+            self._items.move_to_end(token)
+            self._by_user.setdefault(principal.id, set()).add(token)
+            while len(self._items) > self.max_entries:
+                self._drop(next(iter(self._items)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in list(self._by_user.get(user_id, ())):
+                self._drop(token)
+
+    def _drop(self, token: str):
+        _, principal, _ = self._items.pop(token)
+        tokens = self._by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[principal.id]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class RevocationList:
+    """user_id -> epoch time before which that user's tokens are void, mirrored from the DB."""
+
+    def __init__(self, refresh_s: float = AUTH_REVOCATION_REFRESH_S, retention_s: float = AUTH_REVOCATION_RETENTION_S,
+                 prune_s: float = AUTH_REVOCATION_PRUNE_S, clock=time.time):
+        self.refresh_s = refresh_s
+        self.retention_s = retention_s
+        self.prune_s = prune_s
+        self.clock = clock
+        self._revoked: Dict[int, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._pruned_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self.loads = 0
+
+    async def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        if self._loaded_at is None or self.clock() - self._loaded_at >= self.refresh_s:
+            await self.refresh()
+        return issued_at < self._revoked.get(user_id, 0)
+
+    async def refresh(self):
+        """Single-flight: callers that find the list stale together share one load."""
+        task = self._refreshing
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refreshing = asyncio.ensure_future(self._load())
+        await asyncio.shield(task)
+
+    async def _load(self):
+        now = self.clock()
+        query = select(TokenRevocation)
+        if self._loaded_at is not None:
+            # Rows since the last load, with one refresh period of overlap for writers that
+            # were still committing (or whose clock is a little behind ours)
+            query = query.where(TokenRevocation.revoked_before >= self._loaded_at - self.refresh_s)
+        cutoff = now - self.retention_s
+        async with database.new_session() as session:
+            rows = (await session.exec(query)).all()
+            if now - self._pruned_at >= self.prune_s:
+                await session.execute(delete(TokenRevocation).where(TokenRevocation.revoked_before < cutoff))
+                await session.commit()
+                self._pruned_at = now
+        self.loads += 1
+        for row in rows:
+            if row.revoked_before > self._revoked.get(row.user_id, float("-inf")):
+                self._revoked[row.user_id] = row.revoked_before
+        # Every token issued before these has expired on its own by now
+        self._revoked = {user_id: before for user_id, before in self._revoked.items() if before >= cutoff}
+        self._loaded_at = now
+
+    async def revoke(self, session, user_id: int) -> float:
+        """Voids the user's existing tokens (inside the caller's transaction)."""
+        revoked_before = round(self.clock(), 3)
+        row = await session.get(TokenRevocation, user_id)
+        if row is None:
+            row = TokenRevocation(user_id=user_id, revoked_before=revoked_before)
+        row.revoked_before = revoked_before
+        session.add(row)
+        self._revoked[user_id] = revoked_before
+        return revoked_before
+
+    def clear(self):
+        self._revoked.clear()
+        self._loaded_at = None
+        self._refreshing = None
+
+
+principal_cache = PrincipalCache()
+revocations = RevocationList()
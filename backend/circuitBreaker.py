@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+# --- Circuit breakers for upstream calls (one per upstream / model) ---
+# closed    -> calls flow; outcomes are kept for a rolling window
+# open      -> error rate or slow-call rate crossed its threshold: calls are refused
+#              instantly so callers go straight to their fallback
+# half_open -> after BREAKER_OPEN_S a few probe calls are let through; all succeed
+#              -> closed, any failure -> open again
+
+BREAKER_WINDOW_S = float(os.getenv("BREAKER_WINDOW_S", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# Kept below the smallest stage budget in deadline.py (places, 1.5s): a call the deadline
+# cancels has to be able to count as slow, or the breaker never sees the slowdown
+BREAKER_SLOW_CALL_S = float(os.getenv("BREAKER_SLOW_CALL_S", "1.2"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_S = float(os.getenv("BREAKER_OPEN_S", "15"))
+BREAKER_PROBES = int(os.getenv("BREAKER_PROBES", "2"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window_s: float = BREAKER_WINDOW_S, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, slow_call_s: float = BREAKER_SLOW_CALL_S,
+                 slow_rate: float = BREAKER_SLOW_RATE, open_s: float = BREAKER_OPEN_S,
+                 probes: int = BREAKER_PROBES, clock=time.monotonic):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_s = open_s
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (timestamp, failed, slow)
+        self._opened_at = 0.0
+        self._probes_inflight = 0
+        self._probes_passed = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def before(self):
+        """Call before the upstream request. Raises CircuitOpen when the call must not be made."""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self._opened_at >= self.open_s:
+                self.state = HALF_OPEN
+                self._probes_inflight = self._probes_passed = 0
+                print(f"🔌 Breaker '{self.name}' half-open, probing")
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and self._probes_inflight + self._probes_passed < self.probes:
+                self._probes_inflight += 1
+                return
+            self.rejected += 1
+        raise CircuitOpen(f"{self.name} circuit open")
+
+    def success(self, latency_s: float):
+        self._record(failed=False, slow=latency_s >= self.slow_call_s)
+
+    def failure(self):
+        self._record(failed=True, slow=False)
+
+    def cancelled(self, latency_s: float):
+        """Call was cancelled by its caller (stage deadline, client gone). Once it has run past
+        the slow-call threshold it counts as a slow call; before that it says nothing."""
+        if latency_s >= self.slow_call_s:
+            self._record(failed=False, slow=True)
+        else:
+            self.release()
+
+    def release(self):
+        """Call finished without a verdict on upstream health (cancelled, caller error)."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_inflight:
+                self._probes_inflight -= 1
+
+    def _record(self, failed: bool, slow: bool):
+        with self._lock:
+            now = self.clock()
+            if self.state == HALF_OPEN:
+                self._probes_inflight = max(0, self._probes_inflight - 1)
+                if failed or slow:
+                    self._trip(now)
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.probes:
+                        self.state = CLOSED
+                        self._outcomes.clear()
+                        print(f"🔌 Breaker '{self.name}' closed")
+                return
+            if self.state == OPEN:
+                return  # straggler from before the trip
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_s:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, _, s in self._outcomes if s)
+            if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.trips += 1
+        print(f"🔌 Breaker '{self.name}' OPEN - serving fallbacks for {self.open_s:.0f}s")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_error_rate": round(sum(1 for _, f, _ in self._outcomes if f) / calls, 3) if calls else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Shared breaker for an upstream, e.g. "places" or "llm:gemini-2.5-flash"."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breaker_stats() -> Dict:
+    return {name: breaker.stats() for name, breaker in sorted(_breakers.items())}
@@ -1,187 +1,260 @@
 import os
 import json
-from typing import Dict
-from schemas import UserAssessmentInput
-from dotenv import load_dotenv
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from schemas import UserAssessmentInput, AssessmentScores
+from crisisDetector import detect_crisis
+from classifyCache import classification_cache, CLASSIFY_CACHE_ENABLED
+from localClassifier import local_classifier, LOCAL_CLASSIFIER_ENABLED
+from llmGateway import llm_gateway, LLMUnavailable
+from exercisesToolbox import validate_toolbox, EXERCISE_SOURCE
+from prompts import CLASSIFY_PROMPT, COMBINED_PROMPT
 
-# Load environment variables from .env file
-load_dotenv()
+# Share of users (0.0-1.0, hashed on user id) whose plans use one combined
+# classify + exercises Gemini call instead of separate calls. Only takes effect with
+# EXERCISE_SOURCE=llm; library toolboxes need no exercises call to save.
+COMBINED_CALL_RATIO = float(os.getenv("COMBINED_CALL_RATIO", "0"))
 
-# The new SDK uses 'from google import genai'
-try:
-    from google import genai
-    from google.genai import types
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+ISSUE_TYPES = {
+    "mental_health", "gambling", "alcohol", "drug_use", "behavioral_addiction", "crisis_safety",
+    "general_support", "financial_stress", "relationship_family", "grief_loss", "unknown",
+}
+URGENCY_LEVELS = {"routine", "soon", "urgent", "immediate_crisis"}
 
-# ---------------------------
-# Gemini Client Setup
-# ---------------------------
+UNAVAILABLE_SCORES = {
+    "issue_type": "general_support",
+    "urgency": "soon",
+    "severity_score": 2,
+    "needs_immediate_resources": False,
+    "confidence": 0.0,
+    "reasoning": "System unavailable - default routing applied.",
+    "personalized_note": "We're here to help. Based on your responses, we recommend connecting with a mental health professional who can provide personalized support.",
+    "source": "fallback",
+}
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-client = None
 
-if GEMINI_AVAILABLE and GEMINI_API_KEY:
-    try:
-        # New SDK initialization
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        print(f"✅ Gemini client initialized successfully")
-    except Exception as e:
-        print(f"❌ Gemini initialization error: {e}")
-        client = None
-else:
-    if not GEMINI_AVAILABLE:
-        print("❌ Google GenAI SDK not installed. Run: pip install google-genai")
-    if not GEMINI_API_KEY:
-        print("❌ GEMINI_API_KEY environment variable not set")
+def _error_scores(reasoning: str) -> Dict:
+    """Safe moderate routing used when the model call or its JSON fails."""
+    return {
+        "issue_type": "unknown",
+        "urgency": "soon",
+        "severity_score": 2,
+        "needs_immediate_resources": False,
+        "confidence": 0.0,
+        "reasoning": reasoning,
+        "personalized_note": "Thank you for sharing with us. We're experiencing a technical issue, but we've identified resources that can provide the support you need. Please reach out to a mental health professional for personalized guidance.",
+        "source": "fallback",
+    }
+
+
+def _build_prompt(input: UserAssessmentInput) -> str:
+    """Per-request payload; the static rulebook is CLASSIFY_PROMPT's system instruction."""
+    return CLASSIFY_PROMPT.render(intake_data=input.model_dump())
+
+
+def _handle_failure(e: Exception, text=None) -> Dict:
+    if isinstance(e, LLMUnavailable):
+        return dict(UNAVAILABLE_SCORES)
+    if isinstance(e, json.JSONDecodeError):
+        print(f"❌ JSON parsing error: {e}")
+        print(f"Raw response: {text if text is not None else 'No response'}")
+        return _error_scores("JSON parsing error - default moderate routing applied.")
+    print(f"❌ Gemini API error: {type(e).__name__}: {e}")
+    return _error_scores("Model error - default moderate routing applied.")
+
+
+def _from_gemini(result: Dict) -> Dict:
+    """Tags a model-produced result; only these rows are used as training labels later."""
+    result["source"] = "gemini"
+    return result
+
+
+def _cached_scores(input: UserAssessmentInput):
+    """Cheap tiers before Gemini: semantic cache, then the local classifier."""
+    if CLASSIFY_CACHE_ENABLED:
+        cached = classification_cache.lookup(input)
+        if cached:
+            print(f"♻️ Classification served from semantic cache")
+            return cached
+    if LOCAL_CLASSIFIER_ENABLED:
+        local = local_classifier.classify(input)
+        if local:
+            print(f"🧮 Local classifier confident ({local['confidence']}), skipping Gemini")
+            return local
+    return None
+
+
+def _remember(input: UserAssessmentInput, result: Dict):
+    if CLASSIFY_CACHE_ENABLED:
+        classification_cache.store(input, result)
+
 
 def classify_user_text(input: UserAssessmentInput) -> Dict:
     """
     Uses the new Google Gen AI SDK to classify mental health needs.
     """
-    # If no client or key, return the safe moderate fallback immediately
-    if not client:
-        return {
-            "issue_type": "general_support",
-            "urgency": "soon",
-            "severity_score": 2,
-            "needs_immediate_resources": False,
-            "confidence": 0.0,
-            "reasoning": "System unavailable - default routing applied.",
-            "personalized_note": "We're here to help. Based on your responses, we recommend connecting with a mental health professional who can provide personalized support."
-        }
-    
-    intake_json = json.dumps(input.model_dump(), ensure_ascii=False)
-
-    prompt = f"""
-        You are a SUPPORT TRIAGE CLASSIFIER.
-
-        Your job is NOT to diagnose or provide therapy.
-        Your job is ONLY to classify support needs and urgency
-        based on structured intake answers.
-        Never infer substance use, gambling, or addiction unless explicitly mentioned in primary_concern or intake text.
-
-        You must follow ALL rules strictly.
-
-        --------------------------------
-        ALLOWED ISSUE TYPES (choose ONE only):
-        - mental_health
-        - gambling
-        - alcohol
-        - drug_use
-        - behavioral_addiction
-        - crisis_safety
-        - general_support
-        - financial_stress
-        - relationship_family
-        - grief_loss
-        - unknown
-
-        ALLOWED URGENCY LEVELS:
-        - routine
-        - soon
-        - urgent
-        - immediate_crisis
-
-        --------------------------------
-        DECISION RULES:
-
-        1. If answer_safety contains explicit self-harm risk:
-        - issue_type = crisis_safety
-        - urgency = immediate_crisis
-
-        2. If safety_check = "I'm not sure":
-        - urgency must be at least "urgent"
-
-        3. Daily functioning matters more than emotional distress.
-
-        4. Time sensitivity maps to urgency:
-        - Not urgent → routine
-        - Soon → soon
-        - As soon as possible → urgent
-
-        5. Emotional distress alone does NOT mean crisis.
-
-        6. If information is unclear:
-        - use "unknown" or "general_support"
-
-        7. NEVER invent diagnoses or medical labels.
-
-        --------------------------------
-        SEVERITY SCORE GUIDE:
-        1 = mild distress + functioning intact
-        2 = moderate distress OR mild impairment
-        3 = major impairment OR urgent support needed
-        4 = safety concern OR cannot function
-
-        --------------------------------
-        PERSONALIZED NOTE GUIDELINES:
-        Create a compassionate, warm message (2-4 sentences) that:
-        - Acknowledges what the person shared
-        - Validates their experience without diagnosing
-        - Provides reassurance about the support available
-        - Uses supportive, hopeful language
-        - Reflects the urgency level appropriately
-        
-        Example for crisis: "Thank you for reaching out during this difficult time. Your safety is our top priority, and we've identified immediate resources that can provide support right now."
-        
-        Example for routine: "We appreciate you taking this step. Based on what you've shared, connecting with support resources can help you navigate these challenges at a comfortable pace."
-
-        --------------------------------
-        Return ONLY valid JSON. If you produce anything other than valid JSON, the response is invalid.
-        OUTPUT FORMAT:
-        
-        {{
-        "issue_type": "",
-        "urgency": "",
-        "severity_score": 1-4,
-        "needs_immediate_resources": true/false,
-        "confidence": 0.0-1.0,
-        "reasoning": "brief non-clinical explanation",
-        "personalized_note": "2-4 sentence compassionate message acknowledging their situation"
-        }}
-
-        --------------------------------
-        INTAKE DATA:
-        {intake_json}
+    # Explicit crisis language never waits on the model
+    crisis = detect_crisis(input)
+    if crisis:
+        print(f"🚨 Crisis fast-path triggered")
+        return crisis
+
+    # Near-identical intakes and routine cases the local model is sure about skip the LLM
+    cached = _cached_scores(input)
+    if cached:
+        return cached
+
+    # No backend configured -> the safe moderate fallback, immediately
+    if not llm_gateway.available():
+        return dict(UNAVAILABLE_SCORES)
+
+    prompt = _build_prompt(input)
+    text = None
+    try:
+        # Shared gateway: rate limit, concurrency caps and retries (JSON output forced)
+        text = llm_gateway.generate(prompt, template=CLASSIFY_PROMPT)
+        result = _from_gemini(json.loads(text))
+        print(f"✅ Gemini API call successful")
+        _remember(input, result)
+        return result
+    except Exception as e:
+        return _handle_failure(e, text)
+
+
+def classify_without_llm(input: UserAssessmentInput) -> Optional[Dict]:
+    """Crisis fast-path, semantic cache or a confident local model. None when Gemini is needed."""
+    crisis = detect_crisis(input)
+    if crisis:
+        print(f"🚨 Crisis fast-path triggered")
+        return crisis
+    return _cached_scores(input)
+
+
+async def classify_user_text_async(input: UserAssessmentInput) -> Dict:
+    """
+    Non-blocking variant of classify_user_text for use inside the event loop.
     """
+    cheap = classify_without_llm(input)
+    if cheap:
+        return cheap
+
+    result = await classify_with_gemini_async(input)
+    _remember(input, result)
+    return result
 
+
+async def classify_with_gemini_async(input: UserAssessmentInput) -> Dict:
+    """Gemini-only classification (skips the crisis fast-path), e.g. to enrich a fast-path result."""
+    if not llm_gateway.available():
+        return dict(UNAVAILABLE_SCORES)
+
+    prompt = _build_prompt(input)
+    text = None
     try:
-        # New SDK syntax: client.models.generate_content
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',  # Stable model version
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type='application/json' # Forces JSON output
-            )
-        )
-        
-        # In the new SDK, response.text is directly accessible
-        result = json.loads(response.text)
+        text = await llm_gateway.agenerate(prompt, template=CLASSIFY_PROMPT)
+        result = _from_gemini(json.loads(text))
         print(f"✅ Gemini API call successful")
         return result
+    except Exception as e:
+        return _handle_failure(e, text)
 
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON parsing error: {e}")
-        print(f"Raw response: {response.text if 'response' in locals() else 'No response'}")
-        return {
-            "issue_type": "unknown",
-            "urgency": "soon",
-            "severity_score": 2,
-            "needs_immediate_resources": False,
-            "confidence": 0.0,
-            "reasoning": "JSON parsing error - default moderate routing applied.",
-            "personalized_note": "Thank you for sharing with us. We're experiencing a technical issue, but we've identified resources that can provide the support you need. Please reach out to a mental health professional for personalized guidance."
-        }
+
+# --- Combined mode: scores + exercise toolbox from one schema-constrained call ---
+
+COMBINED_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "scores": {
+            "type": "OBJECT",
+            "properties": {
+                "issue_type": {"type": "STRING", "enum": sorted(ISSUE_TYPES)},
+                "urgency": {"type": "STRING", "enum": sorted(URGENCY_LEVELS)},
+                "severity_score": {"type": "INTEGER"},
+                "needs_immediate_resources": {"type": "BOOLEAN"},
+                "confidence": {"type": "NUMBER"},
+                "reasoning": {"type": "STRING"},
+                "personalized_note": {"type": "STRING"},
+            },
+            "required": ["issue_type", "urgency", "severity_score", "needs_immediate_resources",
+                         "confidence", "reasoning", "personalized_note"],
+        },
+        "exercises": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "title": {"type": "STRING"},
+                    "steps": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "benefit": {"type": "STRING"},
+                },
+                "required": ["title", "steps", "benefit"],
+            },
+        },
+    },
+    "required": ["scores", "exercises"],
+}
+
+
+def use_combined_call(bucket_key) -> bool:
+    """Stable A/B assignment: the same user always lands in the same arm."""
+    # The combined call only saves the separate exercises call, and with the library
+    # serving curated toolboxes there is no such call - it would only replace them
+    if COMBINED_CALL_RATIO <= 0 or EXERCISE_SOURCE == "library":
+        return False
+    if COMBINED_CALL_RATIO >= 1:
+        return True
+    digest = hashlib.sha256(str(bucket_key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32 < COMBINED_CALL_RATIO
+
+
+def validate_scores(scores) -> Optional[Dict]:
+    """Strict check of a model-produced scores object; None if anything is off."""
+    try:
+        parsed = AssessmentScores(**scores).model_dump()
+    except (TypeError, ValidationError):
+        return None
+    if (parsed["issue_type"] not in ISSUE_TYPES or parsed["urgency"] not in URGENCY_LEVELS
+            or not 1 <= parsed["severity_score"] <= 4 or not 0.0 <= parsed["confidence"] <= 1.0):
+        return None
+    return parsed
+
+
+def parse_combined(text: str) -> Tuple[Optional[Dict], Optional[List[Dict]]]:
+    """(scores, exercises) from a combined response; a malformed section comes back as None."""
+    try:
+        data = json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        return None, None
+    if not isinstance(data, dict):
+        return None, None
+    return validate_scores(data.get("scores")), validate_toolbox(data.get("exercises"))
+
+
+async def classify_with_toolbox_async(input: UserAssessmentInput) -> Tuple[Dict, Optional[List[Dict]]]:
+    """
+    Scores plus exercises from a single Gemini call. When the cheap tiers answer, or a
+    section is malformed, that section falls back to its own path (exercises: None).
+    """
+    cheap = classify_without_llm(input)
+    if cheap:
+        return cheap, None
+    if not llm_gateway.available():
+        return dict(UNAVAILABLE_SCORES), None
+
+    text = None
+    try:
+        payload = COMBINED_PROMPT.render(intake_data=input.model_dump())
+        text = await llm_gateway.agenerate(payload, schema=COMBINED_SCHEMA, template=COMBINED_PROMPT)
     except Exception as e:
-        print(f"❌ Gemini API error: {type(e).__name__}: {e}")
-        return {
-            "issue_type": "unknown",
-            "urgency": "soon",
-            "severity_score": 2,
-            "needs_immediate_resources": False,
-            "confidence": 0.0,
-            "reasoning": "Model error - default moderate routing applied.",
-            "personalized_note": "Thank you for sharing with us. We're experiencing a technical issue, but we've identified resources that can provide the support you need. Please reach out to a mental health professional for personalized guidance."
-        }
\ No newline at end of file
+        return _handle_failure(e, text), None
+
+    scores, exercises = parse_combined(text)
+    print(f"✅ Combined Gemini call: scores {'ok' if scores else 'malformed'}, exercises {'ok' if exercises else 'malformed'}")
+    if scores is None:
+        # Only the broken section is redone
+        scores = await classify_with_gemini_async(input)
+    else:
+        scores = _from_gemini(scores)
+    _remember(input, scores)
+    return scores, exercises
@@ -0,0 +1,149 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+import numpy as np
+from schemas import UserAssessmentInput
+from crisisDetector import detect_crisis
+from textFeatures import HASH_DIM, intake_vector
+
+# --- Semantic cache in front of the Gemini classifier ---
+# Near-paraphrase intakes reuse a prior AssessmentScores. Vectors live in one
+# preallocated NumPy matrix; lookup is a single matrix-vector product (cosine,
+# since rows are L2-normalised) and a top-1 argmax.
+
+CLASSIFY_CACHE_ENABLED = os.getenv("CLASSIFY_CACHE_ENABLED", "1") == "1"
+CLASSIFY_CACHE_THRESHOLD = float(os.getenv("CLASSIFY_CACHE_THRESHOLD", "0.92"))
+CLASSIFY_CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFY_CACHE_MAX_ENTRIES", "2000"))  # x HASH_DIM float32 = ~16 MB
+CLASSIFY_CACHE_TTL_S = float(os.getenv("CLASSIFY_CACHE_TTL_S", "86400"))
+# "template" swaps the cached personalized_note (written for someone else) for a generic one
+CLASSIFY_CACHE_NOTE = os.getenv("CLASSIFY_CACHE_NOTE", "template")
+
+# Any hint of uncertain safety must be judged fresh, never from a neighbour's result
+UNCERTAIN_SAFETY = re.compile(r"not sure|unsure|don'?t know|no idea|maybe|not safe|unsafe")
+
+NOTE_TEMPLATES = {
+    "routine": "We appreciate you taking this step. Based on what you've shared, connecting with support resources can help you navigate these challenges at a comfortable pace.",
+    "soon": "Thank you for sharing what you're going through. The resources below can help you get support soon, and reaching out is a meaningful first step.",
+    "urgent": "Thank you for telling us how hard things are right now. We've prioritized resources that can support you as soon as possible - please reach out to one today.",
+    "immediate_crisis": "Thank you for reaching out during this difficult time. Your safety is our top priority, and we've identified immediate resources that can provide support right now.",
+}
+
+
+def template_note(urgency: str) -> str:
+    """Generic compassionate note for an urgency level (no LLM)."""
+    return NOTE_TEMPLATES.get(urgency, NOTE_TEMPLATES["soon"])
+
+
+def template_reasoning(scores: Dict, input: UserAssessmentInput) -> str:
+    """Reasoning for a cache hit, built from this user's own intake rather than the cached neighbour's."""
+    label = f"{scores.get('issue_type', 'unknown').replace('_', ' ')}, {scores.get('urgency', 'soon').replace('_', ' ')}"
+    return f"Matched a near-identical earlier intake ({label}). Primary concern: {input.primary_concern.strip()}"
+
+
+def is_crisis_flagged(input: UserAssessmentInput) -> bool:
+    return detect_crisis(input) is not None or bool(UNCERTAIN_SAFETY.search((input.answer_safety or "").lower()))
+
+
+def is_cacheable(scores: Dict) -> bool:
+    """Only confident, non-crisis model results may be reused."""
+    return (
+        bool(scores.get("confidence"))
+        and scores.get("issue_type") != "crisis_safety"
+        and scores.get("urgency") not in ("urgent", "immediate_crisis")
+        and int(scores.get("severity_score") or 0) < 4
+        and not scores.get("needs_immediate_resources")
+    )
+
+
+class SemanticCache:
+    """Bounded cosine top-1 cache with TTL and least-recently-used eviction."""
+
+    def __init__(self, max_entries: int = CLASSIFY_CACHE_MAX_ENTRIES, threshold: float = CLASSIFY_CACHE_THRESHOLD,
+                 ttl_s: float = CLASSIFY_CACHE_TTL_S, dim: int = HASH_DIM, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._scores = [None] * max_entries
+        self._stored_at = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def lookup(self, input: UserAssessmentInput) -> Optional[Dict]:
+        """Cached scores for a near-identical intake, or None."""
+        if is_crisis_flagged(input):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        vec = intake_vector(input)
+        with self._lock:
+            now = self.clock()
+            if self._size:
+                sims = self._vectors[:self._size] @ vec
+                # Expired rows can't win
+                sims[now - self._stored_at[:self._size] > self.ttl_s] = -1.0
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self._last_used[best] = now
+                    self.hits += 1
+                    result = dict(self._scores[best])
+                    # The cached reasoning was written about someone else's intake and may quote it
+                    result["reasoning"] = template_reasoning(result, input)
+                    result["source"] = "cache"
+                    if CLASSIFY_CACHE_NOTE == "template":
+                        result["personalized_note"] = template_note(result.get("urgency"))
+                    return result
+            self.misses += 1
+            return None
+
+    def store(self, input: UserAssessmentInput, scores: Dict):
+        if not is_cacheable(scores) or is_crisis_flagged(input):
+            return
+        vec = intake_vector(input)
+        with self._lock:
+            now = self.clock()
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                # Reuse an expired row if there is one, else the least recently used
+                expired = np.flatnonzero(now - self._stored_at > self.ttl_s)
+                slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vec
+            self._scores[slot] = dict(scores)
+            self._stored_at[slot] = now
+            self._last_used[slot] = now
+            self.stores += 1
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._scores = [None] * self.max_entries
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+classification_cache = SemanticCache()
@@ -0,0 +1,89 @@
+"""
+Import-time and cold-start budget for the API process.
+
+Each run starts a fresh interpreter, imports main, runs the FastAPI lifespan startup
+(and shutdown) and reports the timings; the median over --runs is checked against the
+budgets. Exits non-zero when a budget is blown, so it can gate CI:
+    python coldStart.py
+    python coldStart.py --runs 5 --warm
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+COLD_IMPORT_BUDGET_S = float(os.getenv("COLD_IMPORT_BUDGET_S", "1.5"))
+# Startup always builds the LLM client, so this includes the google-genai import (~1.6s here)
+COLD_STARTUP_BUDGET_S = float(os.getenv("COLD_STARTUP_BUDGET_S", "2.5"))
+# Modules that must stay out of `import main` (they load lazily on first use)
+LAZY_MODULES = ("google.genai",)
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+# Checked before startup, since warm-up is allowed to load these
+eager = [m for m in LAZY_MODULES if m in sys.modules]
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(boot())
+print("COLD_START " + json.dumps({"import_s": imported - start, "startup_s": ready - imported, "eager_modules": eager}))
+"""
+
+
+def measure_once(warm: bool) -> dict:
+    env = dict(os.environ, STARTUP_WARMUP="1" if warm else "0")
+    # A throwaway database, so the measurement doesn't depend on (or touch) real data
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cold.db')}")
+    code = f"LAZY_MODULES = {LAZY_MODULES!r}\n" + CHILD
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("COLD_START "):
+            return json.loads(line[len("COLD_START "):])
+    raise RuntimeError(f"cold start run failed:\n{result.stderr[-2000:]}")
+
+
+def measure(runs: int = 3, warm: bool = False) -> dict:
+    samples = [measure_once(warm) for _ in range(runs)]
+    return {
+        "runs": runs,
+        "import_s": round(statistics.median(s["import_s"] for s in samples), 3),
+        "startup_s": round(statistics.median(s["startup_s"] for s in samples), 3),
+        "eager_modules": sorted({m for s in samples for m in s["eager_modules"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start budget check")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="Include the STARTUP_WARMUP step")
+    args = parser.parse_args()
+
+    result = measure(args.runs, args.warm)
+    over = []
+    if result["import_s"] > COLD_IMPORT_BUDGET_S:
+        over.append(f"import {result['import_s']}s > {COLD_IMPORT_BUDGET_S}s")
+    if result["startup_s"] > COLD_STARTUP_BUDGET_S:
+        over.append(f"startup {result['startup_s']}s > {COLD_STARTUP_BUDGET_S}s")
+    if result["eager_modules"]:
+        over.append(f"imported eagerly: {', '.join(result['eager_modules'])}")
+
+    print(f"⏱️ import main: {result['import_s']}s (budget {COLD_IMPORT_BUDGET_S}s), "
+          f"startup{' + warm-up' if args.warm else ''}: {result['startup_s']}s (budget {COLD_STARTUP_BUDGET_S}s), "
+          f"median of {result['runs']}")
+    if over:
+        print(f"❌ Cold-start budget exceeded: {'; '.join(over)}")
+        sys.exit(1)
+    print("✅ Within cold-start budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+from typing import List
+from dotenv import load_dotenv
+
+# --- Environment, loaded once per process ---
+# Import this before reading any setting: modules read os.getenv at import time, so
+# .env has to be in the environment first. Later imports are free (module cache).
+
+load_dotenv()
+
+REQUIRED_KEYS = ("GEMINI_API_KEY", "GOOGLE_MAPS_API_KEY")
+
+
+def missing_keys() -> List[str]:
+    return [key for key in REQUIRED_KEYS if not os.getenv(key)]
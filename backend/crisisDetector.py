@@ -0,0 +1,145 @@
+import re
+from typing import Dict, List, Optional
+from schemas import UserAssessmentInput
+
+# --- Deterministic crisis fast-path ---
+# Explicit self-harm / suicide language routes straight to 9-1-1 / 9-8-8 without
+# waiting on Gemini. All patterns are compiled into one alternation and the six
+# intake answers are scanned in a single pass.
+
+# Phrases that already say "I" (myself, my life) - a crisis whenever they aren't negated
+# or clearly about the past
+FIRST_PERSON_PHRASES = [
+    r"kill(?:ing)? myself",
+    r"end(?:ing)? (?:my|it) (?:own )?life",
+    r"take (?:my|my own) life",
+    r"(?:hurt|harm|cut|injure)(?:ing)? myself",
+    r"(?:don'?t|do not) want to (?:live|be alive|wake up|be here anymore)",
+    r"no reason to (?:live|go on)",
+    r"hang(?:ing)? myself",
+]
+# Topic words that are just as often about someone else or the past ("my brother died by
+# suicide", "I used to self-harm") - they also need the speaker as the subject
+TOPIC_PHRASES = [
+    r"end it all",
+    r"suicid(?:e|al)",
+    r"self[- ]?harm(?:ing)?",
+    r"(?:want|wanna|going|plan(?:ning)?) to die",
+    r"better off dead",
+    r"(?:take|taking) an overdose",
+    r"overdos(?:e|ing) on",
+    r"jump(?:ing)? off (?:a |the )?(?:bridge|building|roof)",
+]
+CRISIS_PHRASES = FIRST_PERSON_PHRASES + TOPIC_PHRASES
+
+# Negations only count inside the same clause, right before the phrase
+# ("no thoughts of self-harm", "I have no plans to hurt myself").
+NEGATIONS = re.compile(
+    r"\b(?:no|not|never|without|deny|denies|nor|don'?t|do not|"
+    r"wouldn'?t|won'?t|isn'?t|aren'?t|free of)\b"
+)
+# ...or right after it: "Self-harm? Never.", "suicide isn't something I'd consider".
+# A bare "no" after a comma only counts when it stands alone ("kill myself, no one cares" stays).
+POST_NEGATION = re.compile(
+    r"^\s*(?:[?:,\-]+\s*(?:no|never|nope|not really|not at all|none)\s*(?:[.!,;\n]|$)"
+    r"|(?:is|are|was|were)\s+(?:not|never)\b|isn'?t\b|aren'?t\b|wasn'?t\b)"
+)
+CLAUSE_BREAK = re.compile(r"[.;!?,\n]|\bbut\b|\bhowever\b|\bthough\b")
+# Past episodes and other people's experiences are for the LLM to weigh, not the fast-path
+PAST_CONTEXT = re.compile(
+    r"\b(?:used to|i was|i did|when i was|as a (?:teen|teenager|kid|child)|years ago|in the past|"
+    r"back then|died by|died from|died of|passed away|lost (?:him|her|them|my \w+) to)\b"
+)
+SPEAKER = re.compile(r"\b(?:i|i'?m|i'?ve|i'?d|me|my|myself|having|feeling|thinking|thoughts|urges?)\b")
+OTHER_PERSON = re.compile(
+    r"\b(?:he|she|they|him|her|them|his|their|who|someone|somebody|friend|brother|sister|mom|mum|mother|"
+    r"dad|father|son|daughter|partner|husband|wife|boyfriend|girlfriend|child|kid|cousin|family)\b"
+)
+# A wrongly applied negation only costs a Gemini round trip; the LLM still sees the intake.
+NEGATION_WINDOW = 30  # characters to look back (and ahead) for a negation
+
+CRISIS_PATTERN = re.compile(r"\b(?:" + "|".join(CRISIS_PHRASES) + r")\b")
+TOPIC_PATTERN = re.compile(r"(?:" + "|".join(TOPIC_PHRASES) + r")")
+
+INTAKE_FIELDS = (
+    "primary_concern",
+    "answer_distress",
+    "answer_functioning",
+    "answer_urgency",
+    "answer_safety",
+    "answer_constraints",
+)
+
+CRISIS_NOTE = "Thank you for reaching out during this difficult time. Your safety is our top priority, and we've identified immediate resources that can provide support right now."
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("’", "'")
+
+
+def _is_negated(text: str, start: int, end: int) -> bool:
+    window = text[max(0, start - NEGATION_WINDOW):start]
+    clause = CLAUSE_BREAK.split(window)[-1]
+    return NEGATIONS.search(clause) is not None or POST_NEGATION.match(text[end:end + NEGATION_WINDOW]) is not None
+
+
+def _clause_around(text: str, start: int, end: int) -> str:
+    before = CLAUSE_BREAK.split(text[:start])[-1]
+    after = CLAUSE_BREAK.split(text[end:])[0]
+    return before + text[start:end] + after
+
+
+def _is_current_and_own(text: str, match: re.Match) -> bool:
+    """Present-tense and about the speaker: not a past episode, not someone else's."""
+    if PAST_CONTEXT.search(_clause_around(text, match.start(), match.end())):
+        return False
+    if not TOPIC_PATTERN.fullmatch(match.group(0)):
+        return True
+    # Topic words need the speaker as the nearest subject before them in the clause
+    before = CLAUSE_BREAK.split(text[:match.start()])[-1]
+    speaker = [m.end() for m in SPEAKER.finditer(before)]
+    other = [m.end() for m in OTHER_PERSON.finditer(before)]
+    return bool(speaker) and (not other or speaker[-1] > other[-1])
+
+
+def find_crisis_phrases(input: UserAssessmentInput) -> List[str]:
+    """Returns every non-negated, first-person, present-tense crisis phrase across the intake answers."""
+    text = _normalize("\n".join(getattr(input, field) or "" for field in INTAKE_FIELDS))
+    return [
+        match.group(0)
+        for match in CRISIS_PATTERN.finditer(text)
+        if not _is_negated(text, match.start(), match.end()) and _is_current_and_own(text, match)
+    ]
+
+
+def detect_crisis(input: UserAssessmentInput) -> Optional[Dict]:
+    """
+    Classification result for an explicit crisis, or None if the intake needs the LLM.
+    Same shape as classify_user_text output.
+    """
+    if not find_crisis_phrases(input):
+        return None
+    return {
+        "issue_type": "crisis_safety",
+        "urgency": "immediate_crisis",
+        "severity_score": 4,
+        "needs_immediate_resources": True,
+        "confidence": 1.0,
+        "reasoning": "Explicit self-harm or suicide language in intake - immediate safety routing applied.",
+        "personalized_note": CRISIS_NOTE,
+        "source": "crisis",
+    }
+
+
+def merge_crisis_enrichment(crisis_scores: Dict, llm_scores: Dict) -> Dict:
+    """
+    Lets the LLM add its wording to a fast-path result without ever downgrading it.
+    Fallback results (confidence 0.0) are ignored.
+    """
+    if not llm_scores or not llm_scores.get("confidence"):
+        return crisis_scores
+    merged = dict(crisis_scores)
+    for field in ("reasoning", "personalized_note"):
+        if llm_scores.get(field):
+            merged[field] = llm_scores[field]
+    return merged
@@ -1,17 +1,142 @@
 # database.py
-from sqlmodel import SQLModel, create_engine, Session
+import asyncio
+import os
+from typing import AsyncIterator, Dict, Optional
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+import config  # noqa: F401 - DATABASE_URL may come from .env
 
-# This creates a file named 'database.db' in the same folder
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+# --- One shared async engine for the whole app ---
+# SQLite (default, file 'database.db' next to the app) goes through aiosqlite in WAL mode;
+# set DATABASE_URL=postgresql://... to run on PostgreSQL through asyncpg.
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = "NORMAL"  # every pooled connection starts with this durability level
 
-# check_same_thread=False is needed only for SQLite
-connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, echo=True, connect_args=connect_args)
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+def async_url(url: str) -> str:
+    """Plain sqlite:// / postgresql:// URLs mapped onto their async drivers."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith(("postgres://", "postgresql://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite setup: readers don't block the writer, writers wait instead of failing."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def make_engine(url: str = DATABASE_URL, echo: bool = DB_ECHO, pool_size: int = DB_POOL_SIZE,
+                max_overflow: int = DB_MAX_OVERFLOW) -> AsyncEngine:
+    url = async_url(url)
+    options = {"echo": echo, "pool_pre_ping": not url.startswith("sqlite")}
+    if ":memory:" not in url and url != "sqlite+aiosqlite://":
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=DB_POOL_TIMEOUT_S)
+    engine = create_async_engine(url, **options)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+    return engine
+
+
+# Built on first use (app startup, or the first query in a script), not at import
+_engine: Optional[AsyncEngine] = None
+_session_factory = None
+
+
+def configure(url: str = DATABASE_URL, echo: bool = DB_ECHO) -> AsyncEngine:
+    """Points the shared engine at a database (tests and scripts pass their own URL)."""
+    global _engine, _session_factory
+    _engine = make_engine(url, echo)
+    _session_factory = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _engine
+
+
+def get_engine() -> AsyncEngine:
+    return _engine if _engine is not None else configure()
+
+
+def __getattr__(name: str):
+    # `database.engine` stays the way to reach the shared engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module 'database' has no attribute {name!r}")
+
+
+def new_session() -> AsyncSession:
+    """`async with new_session() as session:` - for work that outlives a request."""
+    if _session_factory is None:
+        configure()
+    return _session_factory()
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with new_session() as session:
+        yield session
+
+
+async def create_db_and_tables():
+    import models  # noqa: F401 - registers the tables on SQLModel.metadata
+    async with get_engine().begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        # create_all skips existing tables, so columns and indexes added later are created here
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+
+
+def _add_missing_columns(sync_conn):
+    """Adds new nullable or server-defaulted columns to tables created by an older version."""
+    inspector = inspect(sync_conn)
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or (not column.nullable and column.server_default is None):
+                continue
+            ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} " \
+                  f"{column.type.compile(sync_conn.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT '{column.server_default.arg}'"
+            sync_conn.execute(text(ddl))
+            print(f"🛠️ Added column {table.name}.{column.name}")
+
+
+def _create_missing_indexes(sync_conn):
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def dispose_db():
+    if _engine is not None:
+        await _engine.dispose()
+
+
+async def warm_db(connections: int = 2):
+    """Opens pooled connections ahead of the first request."""
+    engine = get_engine()
+    connections = min(connections, engine.pool.size()) if hasattr(engine.pool, "size") else 1
+
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*[touch() for _ in range(max(connections, 1))])
+
+
+def db_stats() -> Dict:
+    if _engine is None:
+        return {"started": False}
+    return {"dialect": _engine.dialect.name, "driver": _engine.dialect.driver, "pool": _engine.pool.status()}
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List
+
+# --- Per-request deadline for /api/generate-plan ---
+# One Deadline is created per request and passed down the pipeline. Each stage
+# gets min(its own slice, time left overall); when that runs out (or the stage
+# blows up) the stage is cancelled, its cheap fallback is used instead and the
+# stage name is recorded in FinalPlan.degraded_stages.
+
+PLAN_DEADLINE_S = float(os.getenv("PLAN_DEADLINE_S", "6.0"))
+
+STAGE_BUDGETS_S = {
+    "classify": float(os.getenv("PLAN_BUDGET_CLASSIFY_S", "2.5")),
+    "places": float(os.getenv("PLAN_BUDGET_PLACES_S", "1.5")),
+    "selection": float(os.getenv("PLAN_BUDGET_SELECTION_S", "2.0")),
+    "exercises": float(os.getenv("PLAN_BUDGET_EXERCISES_S", "3.0")),
+}
+
+
+class Deadline:
+    def __init__(self, total_s: float = PLAN_DEADLINE_S, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = clock() + total_s
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+    def budget(self, stage: str) -> float:
+        """Time this stage may take: its own slice, capped by what is left overall."""
+        return min(STAGE_BUDGETS_S.get(stage, self.remaining()), self.remaining())
+
+    async def run(self, stage: str, work: Awaitable, fallback: Callable[[], object]):
+        """Awaits work within the stage budget, else cancels it and returns fallback()."""
+        try:
+            return await asyncio.wait_for(work, timeout=self.budget(stage))
+        except asyncio.TimeoutError:
+            print(f"⏱️ Stage '{stage}' ran out of time - using fallback")
+        except Exception as e:
+            print(f"⚠️ Stage '{stage}' failed ({type(e).__name__}: {e}) - using fallback")
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+        return fallback()
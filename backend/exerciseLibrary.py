@@ -0,0 +1,366 @@
+"""
+Versioned library of coping-exercise toolboxes, one entry per (issue_type, severity).
+
+Requests are served from the library in O(1) instead of a Gemini call per plan:
+    python exerciseLibrary.py seed               # (re)build from the curated catalog below
+    python exerciseLibrary.py refresh            # offline job: add Gemini-written variants
+    python exerciseLibrary.py stats
+
+When an entry has several variants, the one whose keywords best overlap the
+classifier's reasoning is chosen; ties go to the newest library version.
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from schemas import AssessmentScores
+
+EXERCISE_LIBRARY_PATH = os.getenv(
+    "EXERCISE_LIBRARY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exercise_library.json")
+)
+RELOAD_CHECK_S = 60  # how often to look for a refreshed library file
+
+ISSUE_TYPES = [
+    "mental_health", "gambling", "alcohol", "drug_use", "behavioral_addiction", "crisis_safety",
+    "general_support", "financial_stress", "relationship_family", "grief_loss", "loneliness", "unknown",
+]
+SEVERITIES = [1, 2, 3, 4]
+
+# --- Curated catalog (brief, evidence-based, under 5 minutes each) ---
+SEED_EXERCISES = {
+    "box_breathing": {
+        "title": "Box Breathing",
+        "steps": ["Breathe in through your nose for 4 counts.", "Hold for 4 counts.", "Breathe out slowly for 4 counts.", "Hold for 4 counts, then repeat 4 times."],
+        "benefit": "Slowing your breath signals safety to your nervous system and eases the physical rush of stress."
+    },
+    "grounding_54321": {
+        "title": "5-4-3-2-1 Grounding",
+        "steps": ["Name 5 things you can see.", "Name 4 things you can touch.", "Name 3 things you can hear.", "Name 2 things you can smell.", "Name 1 thing you can taste."],
+        "benefit": "Anchors your attention in the present moment when thoughts or feelings feel overwhelming."
+    },
+    "slow_exhale": {
+        "title": "Long Exhale Breathing",
+        "steps": ["Sit or lie somewhere supported.", "Breathe in gently for 4 counts.", "Breathe out for 6 to 8 counts, like blowing through a straw.", "Repeat for 2 minutes."],
+        "benefit": "A longer out-breath activates the body's calming response and can lower a racing heart."
+    },
+    "cold_water_reset": {
+        "title": "Cold Water Reset",
+        "steps": ["Fill a bowl or sink with cold water, or hold an ice pack.", "Hold your breath and put your face in the water (or the pack on your eyes and cheeks) for 15-30 seconds.", "Breathe slowly afterwards and notice your heart rate settle."],
+        "benefit": "Triggers the body's dive reflex, which quickly turns down intense emotional arousal."
+    },
+    "reach_out_now": {
+        "title": "Reach Out Right Now",
+        "steps": ["Call or text 9-8-8, or call 9-1-1 if you are in immediate danger.", "If you can, move away from anything you could use to hurt yourself.", "Tell one person nearby or by phone how you are feeling, even in a single sentence."],
+        "benefit": "Connecting with another person and making your space safer are the most protective steps in a crisis."
+    },
+    "safe_people_list": {
+        "title": "Three Safe People",
+        "steps": ["Write down three people or services you could contact today.", "Add a phone number or way to reach each one.", "Keep the list somewhere you will see it, like your phone's lock screen."],
+        "benefit": "Having support written down makes it easier to reach out when it's hard to think clearly."
+    },
+    "butterfly_hug": {
+        "title": "Butterfly Hug",
+        "steps": ["Cross your arms over your chest with your hands resting near your collarbones.", "Gently tap left, then right, at a slow steady pace.", "Breathe slowly and continue for 1-2 minutes."],
+        "benefit": "Slow, rhythmic bilateral tapping can soothe distress and help you feel held."
+    },
+    "muscle_release": {
+        "title": "Quick Muscle Release",
+        "steps": ["Clench your fists tightly for 5 seconds, then let go.", "Lift your shoulders to your ears for 5 seconds, then drop them.", "Scrunch your face for 5 seconds, then relax it.", "Notice the difference between tension and release."],
+        "benefit": "Releasing physical tension helps the mind follow the body into a calmer state."
+    },
+    "thought_check": {
+        "title": "Two-Column Thought Check",
+        "steps": ["Write down the thought that is bothering you most.", "In a second column, write what you would say to a friend who had that thought.", "Rate how strongly you believe the original thought now, from 0 to 100."],
+        "benefit": "Stepping back from a thought loosens its grip and makes room for a more balanced view."
+    },
+    "one_small_step": {
+        "title": "One Small Step",
+        "steps": ["Pick one tiny task you can finish in 5 minutes (drink water, open a window, wash one dish).", "Do it now, without judging how small it is.", "Notice any shift in your mood afterwards."],
+        "benefit": "Small actions build momentum and can lift low mood before motivation returns."
+    },
+    "worry_window": {
+        "title": "Worry Window",
+        "steps": ["Write your worries down in a quick list.", "Choose a 10-minute 'worry time' later today.", "When a worry pops up before then, remind yourself it has a time slot and return to what you're doing."],
+        "benefit": "Containing worry to a set time reduces how much it spills into the rest of your day."
+    },
+    "self_compassion_break": {
+        "title": "Self-Compassion Break",
+        "steps": ["Say to yourself: 'This is a moment of difficulty.'", "Remind yourself: 'Struggle is part of being human.'", "Place a hand on your chest and say: 'May I be kind to myself right now.'"],
+        "benefit": "Meeting yourself with kindness lowers shame and self-criticism, which fuel distress."
+    },
+    "urge_surfing": {
+        "title": "Urge Surfing",
+        "steps": ["Notice the urge and where you feel it in your body.", "Picture it as a wave: it builds, peaks and falls.", "Breathe slowly and ride it for a few minutes without acting on it.", "Notice that the urge changes and passes."],
+        "benefit": "Urges peak and fade on their own; watching one pass builds confidence that you don't have to act on it."
+    },
+    "delay_and_distract": {
+        "title": "Delay and Distract",
+        "steps": ["Tell yourself you will wait 15 minutes before deciding.", "Do something absorbing: a walk, a call, a game, a shower.", "When the time is up, check in with how strong the urge is now."],
+        "benefit": "Buying time weakens the urge and puts you back in charge of the decision."
+    },
+    "play_the_tape_forward": {
+        "title": "Play the Tape Forward",
+        "steps": ["Imagine giving in to the urge right now.", "Picture how you would feel in an hour, tomorrow morning and next week.", "Compare that with how you'd feel if you let this urge pass."],
+        "benefit": "Thinking past the immediate relief makes the longer-term costs and your goals easier to see."
+    },
+    "name_the_feeling": {
+        "title": "Name the Feeling",
+        "steps": ["Pause and ask yourself what you are feeling right now.", "Put a word to it: sad, angry, numb, guilty, lonely.", "Say it to yourself: 'I notice I'm feeling...' and breathe with it for a minute."],
+        "benefit": "Naming an emotion calms the brain's alarm response and makes the feeling easier to carry."
+    },
+    "letter_to_loved_one": {
+        "title": "A Few Words to Them",
+        "steps": ["Write a short note to the person or thing you've lost.", "Share a memory, something you miss, or something left unsaid.", "Keep it, or put it somewhere meaningful."],
+        "benefit": "Expressing what is unspoken helps grief move rather than stay stuck."
+    },
+    "money_snapshot": {
+        "title": "Money Worry Brain-Dump",
+        "steps": ["Write every money worry on one page, without sorting them.", "Circle the one that is most urgent this week.", "Write one small next step for it, like making a call or checking a balance."],
+        "benefit": "Getting worries onto paper reduces mental load and turns a fog of stress into a concrete next step."
+    },
+    "i_statement": {
+        "title": "Prepare an I-Statement",
+        "steps": ["Think of a recent conflict.", "Complete: 'I feel ___ when ___ because ___.'", "Add: 'What I need is ___.' Practise saying it calmly."],
+        "benefit": "Describing your feelings and needs without blame makes difficult conversations safer and more productive."
+    },
+    "time_out_plan": {
+        "title": "Take a Time-Out",
+        "steps": ["Notice early signs of anger or hurt rising (tight jaw, raised voice).", "Say 'I need a few minutes' and step away somewhere safe.", "Breathe slowly and return when you feel calmer."],
+        "benefit": "Pausing before reacting protects relationships and keeps conflicts from escalating."
+    },
+    "reach_out_small": {
+        "title": "One Small Connection",
+        "steps": ["Think of one person you haven't talked to in a while.", "Send them a short message, like 'Thinking of you, how are you?'", "Notice how it feels to reach out, whatever the reply."],
+        "benefit": "Small moments of connection reduce loneliness and rebuild a sense of belonging."
+    },
+    "three_good_things": {
+        "title": "Three Good Things",
+        "steps": ["Write down three things that went okay today, however small.", "For each, note why it happened or what you did.", "Read them back slowly."],
+        "benefit": "Training attention on what went well gradually shifts mood and builds resilience."
+    },
+    "values_check": {
+        "title": "Values Compass",
+        "steps": ["Name one thing that really matters to you (family, health, learning, kindness).", "Pick one small action today that moves you toward it.", "Schedule when you will do it."],
+        "benefit": "Acting on your values gives direction when life feels stuck or overwhelming."
+    },
+}
+
+# Issue-specific variants: keywords are matched against the classifier's reasoning
+ISSUE_VARIANTS = {
+    "mental_health": [
+        {"keywords": ["anxi", "panic", "worr", "stress", "overwhelm", "nervous"], "exercise_ids": ["worry_window", "thought_check"]},
+        {"keywords": ["depress", "sad", "low", "hopeless", "motivat", "bed", "tired"], "exercise_ids": ["one_small_step", "three_good_things"]},
+    ],
+    "gambling": [{"keywords": ["gambl", "bet", "casino", "money", "urge"], "exercise_ids": ["urge_surfing", "play_the_tape_forward"]}],
+    "alcohol": [{"keywords": ["drink", "alcohol", "craving", "urge"], "exercise_ids": ["urge_surfing", "delay_and_distract"]}],
+    "drug_use": [{"keywords": ["drug", "use", "craving", "urge", "substance"], "exercise_ids": ["urge_surfing", "delay_and_distract"]}],
+    "behavioral_addiction": [{"keywords": ["gaming", "phone", "scroll", "shopping", "urge", "habit"], "exercise_ids": ["delay_and_distract", "play_the_tape_forward"]}],
+    "crisis_safety": [
+        {"keywords": ["safety", "crisis", "harm", "hopeless"], "exercise_ids": ["safe_people_list", "butterfly_hug"]},
+        {"keywords": ["panic", "agitat", "intense", "racing", "anger"], "exercise_ids": ["cold_water_reset", "safe_people_list"]},
+    ],
+    "general_support": [
+        {"keywords": ["stress", "work", "balance", "busy", "overwhelm"], "exercise_ids": ["muscle_release", "values_check"]},
+        {"keywords": ["mood", "down", "unsure", "support"], "exercise_ids": ["three_good_things", "values_check"]},
+    ],
+    "financial_stress": [{"keywords": ["money", "debt", "rent", "bills", "job", "financ"], "exercise_ids": ["money_snapshot", "worry_window"]}],
+    "relationship_family": [{"keywords": ["partner", "family", "conflict", "argu", "relationship"], "exercise_ids": ["i_statement", "time_out_plan"]}],
+    "grief_loss": [{"keywords": ["loss", "grief", "died", "death", "miss"], "exercise_ids": ["name_the_feeling", "letter_to_loved_one"]}],
+    "loneliness": [{"keywords": ["alone", "lonely", "isolat", "friends"], "exercise_ids": ["reach_out_small", "self_compassion_break"]}],
+    "unknown": [{"keywords": [], "exercise_ids": ["grounding_54321", "self_compassion_break"]}],
+}
+
+# Severity 4 always gets stabilisation and safety, whatever the issue
+CRISIS_TOOLBOX = ["reach_out_now", "grounding_54321", "slow_exhale"]
+HIGH_DISTRESS_LEAD = "box_breathing"        # severity 3: grounding first
+SKILL_BUILDING_TAIL = "self_compassion_break"  # severity 1-2: reflection last
+
+
+def _toolbox_ids(severity: int, variant_ids: List[str]) -> List[str]:
+    if severity >= 4:
+        return list(CRISIS_TOOLBOX)
+    if severity == 3:
+        ids = [HIGH_DISTRESS_LEAD] + variant_ids
+    else:
+        ids = variant_ids + [SKILL_BUILDING_TAIL]
+    # Pad with general exercises if duplicates collapsed
+    return list(dict.fromkeys(ids + ["grounding_54321", "box_breathing"]))[:3]
+
+
+def build_seed_library() -> Dict:
+    """Composes every (issue_type, severity) toolbox from the curated catalog."""
+    toolboxes = {}
+    for issue in ISSUE_TYPES:
+        for severity in SEVERITIES:
+            toolboxes[f"{issue}:{severity}"] = [
+                {"id": f"seed-{n}", "keywords": variant["keywords"], "exercise_ids": _toolbox_ids(severity, variant["exercise_ids"])}
+                for n, variant in enumerate(ISSUE_VARIANTS[issue], 1)
+            ]
+    return {
+        "version": 1,
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "exercises": copy.deepcopy(SEED_EXERCISES),
+        "toolboxes": toolboxes,
+    }
+
+
+def save_library(library: Dict, path: str = EXERCISE_LIBRARY_PATH):
+    """Atomic write so a running server never reads a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(library, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z]+", (text or "").lower())
+
+
+# Words too generic to say anything about which variant fits an intake
+KEYWORD_STOPWORDS = {"about", "after", "again", "before", "being", "could", "every", "feeling", "helps", "other",
+                     "their", "there", "these", "things", "those", "through", "where", "which", "while", "would", "yourself"}
+KEYWORD_PREFIX_LEN = 6
+MAX_VARIANT_KEYWORDS = 10
+
+
+def keywords_from_exercises(exercises: List[Dict]) -> List[str]:
+    """Prefix keywords for a generated variant, taken from its own titles and benefits."""
+    keywords = []
+    for exercise in exercises:
+        for word in _tokens(f"{exercise.get('title', '')} {exercise.get('benefit', '')}"):
+            if len(word) >= 5 and word not in KEYWORD_STOPWORDS:
+                keywords.append(word[:KEYWORD_PREFIX_LEN])
+    return list(dict.fromkeys(keywords))[:MAX_VARIANT_KEYWORDS]
+
+
+class ExerciseLibrary:
+    """In-memory view of the library file, reloaded when the file changes."""
+
+    def __init__(self, path: str = EXERCISE_LIBRARY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[Dict] = None
+        self._mtime = 0.0
+        self._checked_at = 0.0
+
+    def _load(self):
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < RELOAD_CHECK_S:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if self._data is not None and mtime == self._mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+            print(f"🧘 Exercise library v{self._data.get('version')} loaded ({len(self._data.get('toolboxes', {}))} toolboxes)")
+
+    @property
+    def version(self) -> Optional[int]:
+        self._load()
+        return self._data.get("version") if self._data else None
+
+    def get_toolbox(self, assessment: AssessmentScores) -> Optional[List[Dict]]:
+        """Toolbox for the assessment, or None if the library has no entry for it."""
+        self._load()
+        if not self._data:
+            return None
+        severity = min(max(int(assessment.severity_score), 1), 4)
+        variants = self._data["toolboxes"].get(f"{assessment.issue_type}:{severity}")
+        if not variants:
+            variants = self._data["toolboxes"].get(f"general_support:{severity}")
+        if not variants:
+            return None
+
+        # Lightweight retrieval: keyword-prefix overlap with the reasoning. Ties go to the
+        # newest library version, then to the first variant (seed variants are version 1)
+        words = _tokens(assessment.reasoning)
+        def rank(variant):
+            overlap = sum(any(w.startswith(k) for w in words) for k in variant.get("keywords", []))
+            return overlap, variant.get("version", 1)
+        best = max(variants, key=rank)
+
+        exercises = self._data["exercises"]
+        return [copy.deepcopy(exercises[eid]) for eid in best["exercise_ids"] if eid in exercises]
+
+
+exercise_library = ExerciseLibrary()
+
+
+def canned_toolbox(severity: int) -> List[Dict]:
+    """Built-in toolbox from the curated catalog - needs neither the library file nor Gemini."""
+    severity = min(max(int(severity), 1), 4)
+    return [copy.deepcopy(SEED_EXERCISES[eid]) for eid in _toolbox_ids(severity, [])]
+
+
+def refresh_library(path: str = EXERCISE_LIBRARY_PATH, issues: Optional[List[str]] = None):
+    """
+    Offline job: asks Gemini for one new variant per (issue_type, severity) and appends it.
+    Run from cron or by hand; the server picks up the new version without a restart.
+    """
+    from exercisesToolbox import generate_exercise_toolbox_llm
+
+    with open(path, encoding="utf-8") as f:
+        library = json.load(f)
+    version = library.get("version", 1) + 1
+    added = 0
+    for issue in issues or ISSUE_TYPES:
+        # Severity 4 keeps the fixed crisis toolbox; generated variants never replace it
+        for severity in [s for s in SEVERITIES if s < 4]:
+            assessment = AssessmentScores(
+                issue_type=issue, urgency="soon", severity_score=severity, needs_immediate_resources=severity >= 4,
+                confidence=1.0, reasoning=f"Typical {issue.replace('_', ' ')} concerns at severity {severity}.",
+                personalized_note=""
+            )
+            toolbox = generate_exercise_toolbox_llm(assessment)
+            if not toolbox:
+                print(f"⚠️ No exercises generated for {issue}:{severity}")
+                continue
+            ids = []
+            for n, exercise in enumerate(toolbox):
+                eid = f"v{version}-{issue}-{severity}-{n}"
+                library["exercises"][eid] = {k: exercise.get(k) for k in ("title", "steps", "benefit")}
+                ids.append(eid)
+            library["toolboxes"].setdefault(f"{issue}:{severity}", []).append(
+                {"id": f"v{version}", "version": version, "keywords": keywords_from_exercises(toolbox), "exercise_ids": ids}
+            )
+            added += 1
+    library["version"] = version
+    library["generated_at"] = datetime.utcnow().isoformat(timespec="seconds")
+    save_library(library, path)
+    print(f"✅ Library v{version}: added {added} variants")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise toolbox library")
+    parser.add_argument("command", choices=["seed", "refresh", "stats"])
+    parser.add_argument("--path", default=EXERCISE_LIBRARY_PATH)
+    parser.add_argument("--issue", action="append", help="Limit refresh to these issue types")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        library = build_seed_library()
+        save_library(library, args.path)
+        print(f"✅ Seeded {len(library['toolboxes'])} toolboxes from {len(library['exercises'])} exercises")
+    elif args.command == "refresh":
+        refresh_library(args.path, args.issue)
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            library = json.load(f)
+        variants = sum(len(v) for v in library["toolboxes"].values())
+        print(f"📚 v{library['version']} ({library['generated_at']}): {len(library['toolboxes'])} toolboxes, "
+              f"{variants} variants, {len(library['exercises'])} exercises")
+
+
+if __name__ == "__main__":
+    main()
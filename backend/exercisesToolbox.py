@@ -1,61 +1,80 @@
 import os
 import json
-from dotenv import load_dotenv
-from google import genai
+from typing import Dict, List, Optional
+import config  # noqa: F401 - .env loaded before the settings below
 from schemas import AssessmentScores
+from exerciseLibrary import exercise_library, canned_toolbox
+from llmGateway import llm_gateway
+from prompts import TOOLBOX_PROMPT
 
-# Load variables from .env
-load_dotenv()
+# "library" serves pre-generated toolboxes (Gemini only for combinations the library lacks),
+# "llm" generates every toolbox with Gemini
+EXERCISE_SOURCE = os.getenv("EXERCISE_SOURCE", "library")
 
-# Get keys from environment
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+def _build_toolbox_prompt(assessment: AssessmentScores) -> str:
+    """Per-request payload; the instructions are TOOLBOX_PROMPT's system instruction."""
+    return TOOLBOX_PROMPT.render(
+        issue_type=assessment.issue_type,
+        severity_level=f"{assessment.severity_score}/4",
+        clinical_reasoning=assessment.reasoning,
+    )
 
-# Check if keys are missing to avoid confusing errors later
-if not GEMINI_API_KEY:
-    print("⚠️ WARNING: API Keys are missing! Check your .env file.")
 
+def _library_toolbox(assessment: AssessmentScores):
+    if EXERCISE_SOURCE != "library":
+        return None
+    return exercise_library.get_toolbox(assessment)
 
-# --- Configuration ---
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY")
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+def validate_toolbox(items) -> Optional[List[Dict]]:
+    """Well-formed exercises only (title, non-empty steps, benefit), at most 3. None if none survive."""
+    if not isinstance(items, list):
+        return None
+    valid = [
+        {"title": item["title"], "steps": item["steps"], "benefit": item["benefit"]}
+        for item in items
+        if isinstance(item, dict)
+        and isinstance(item.get("title"), str) and item["title"].strip()
+        and isinstance(item.get("steps"), list) and item["steps"] and all(isinstance(step, str) for step in item["steps"])
+        and isinstance(item.get("benefit"), str)
+    ]
+    return valid[:3] or None
+
+
+def fallback_toolbox(assessment: AssessmentScores):
+    """Instant toolbox for when generation is out of time: library entry, else the built-in catalog."""
+    return exercise_library.get_toolbox(assessment) or canned_toolbox(assessment.severity_score)
+
 
 def generate_exercise_toolbox(assessment: AssessmentScores):
+    """Returns 3 immediate, evidence-based coping exercises based on the user's issue."""
+    return _library_toolbox(assessment) or generate_exercise_toolbox_llm(assessment)
+
+
+async def generate_exercise_toolbox_async(assessment: AssessmentScores):
+    """Non-blocking variant of generate_exercise_toolbox."""
+    return _library_toolbox(assessment) or await generate_exercise_toolbox_llm_async(assessment)
+
+
+def generate_exercise_toolbox_llm(assessment: AssessmentScores):
     """Generates 3 immediate, evidence-based coping exercises based on the user's issue."""
-    
-    prompt = f"""
-    ### ROLE
-    You are a clinical psychologist specializing in immediate crisis stabilization and grounding techniques.
-
-    ### CONTEXT
-    The user is currently experiencing: {assessment.issue_type}
-    Severity Level: {assessment.severity_score}/4
-    Clinical Reasoning: {assessment.reasoning}
-
-    ### TASK
-    Provide 3 specific, actionable coping exercises the user can do RIGHT NOW.
-    - If severity is high (4), focus on grounding and safety.
-    - If severity is low (1-2), focus on skill-building or reflection.
-    - Exercises must be brief (under 5 minutes).
-
-    ### OUTPUT FORMAT
-    Return ONLY a JSON array of objects:
-    [
-      {{
-        "title": "Exercise Name",
-        "steps": ["Step 1...", "Step 2..."],
-        "benefit": "Why this helps for this specific issue"
-      }}
-    ]
-    """
+
+    prompt = _build_toolbox_prompt(assessment)
+
+    try:
+        return json.loads(llm_gateway.generate(prompt, template=TOOLBOX_PROMPT))
+    except Exception as e:
+        print(f"Coping Toolbox Error: {e}")
+        return []
+
+
+async def generate_exercise_toolbox_llm_async(assessment: AssessmentScores):
+    """Non-blocking variant of generate_exercise_toolbox_llm."""
+
+    prompt = _build_toolbox_prompt(assessment)
 
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config={'response_mime_type': 'application/json'}
-        )
-        return json.loads(response.text)
+        return json.loads(await llm_gateway.agenerate(prompt, template=TOOLBOX_PROMPT))
     except Exception as e:
         print(f"Coping Toolbox Error: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,180 @@
+"""
+Offline store of care facilities backed by a SQLite R*Tree index.
+
+Ingest a dataset once, then answer radius + category queries locally in microseconds:
+    python facilityStore.py ingest facilities.csv
+    python facilityStore.py query 44.2262 -76.4916 mental_health
+
+Dataset columns (CSV header or JSON object keys):
+    name, address, lat, lng, category, cost, languages
+'category' and 'languages' may hold several values separated by ';' (e.g. "mental_health;counseling").
+Categories use the classifier issue types plus "counseling".
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from placesCache import haversine_m
+
+FACILITY_DB_PATH = os.getenv("FACILITY_DB_PATH", "facilities.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS facility (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    categories TEXT NOT NULL,
+    cost TEXT,
+    languages TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS facility_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng);
+"""
+
+BBOX_QUERY = """
+SELECT f.id, f.name, f.address, f.lat, f.lng, f.categories, f.cost, f.languages
+FROM facility_rtree r JOIN facility f ON f.id = r.id
+WHERE r.min_lat <= ? AND r.max_lat >= ? AND r.min_lng <= ? AND r.max_lng >= ?
+"""
+
+METRES_PER_DEGREE_LAT = 111320.0
+
+
+def _split(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip().lower() for v in value if str(v).strip()]
+    return [v.strip().lower() for v in str(value or "").split(";") if v.strip()]
+
+
+def _read_dataset(path: str) -> Iterable[Dict]:
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+def ingest(path: str, db_path: str = FACILITY_DB_PATH, replace: bool = False) -> int:
+    """Loads a CSV/JSON facility dataset into the on-disk index. Returns rows written."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+        if replace:
+            conn.execute("DELETE FROM facility")
+            conn.execute("DELETE FROM facility_rtree")
+        count = 0
+        for row in _read_dataset(path):
+            lat, lng = float(row["lat"]), float(row["lng"])
+            cur = conn.execute(
+                "INSERT INTO facility (name, address, lat, lng, categories, cost, languages) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    row["name"],
+                    row.get("address", ""),
+                    lat,
+                    lng,
+                    ";".join(_split(row.get("category", ""))),
+                    (row.get("cost") or "").strip().lower(),
+                    ";".join(_split(row.get("languages", ""))),
+                ),
+            )
+            conn.execute("INSERT INTO facility_rtree VALUES (?, ?, ?, ?, ?)", (cur.lastrowid, lat, lat, lng, lng))
+            count += 1
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
+
+class FacilityStore:
+    """Read-only radius + category lookups over the facility index."""
+
+    def __init__(self, db_path: str = FACILITY_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def available(self) -> bool:
+        return os.path.exists(self.db_path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def query(self, lat: float, lng: float, radius_m: float, category: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Facilities within radius_m of (lat, lng), nearest first, shaped like Places results."""
+        if not self.available():
+            return []
+        d_lat = radius_m / METRES_PER_DEGREE_LAT
+        d_lng = radius_m / (METRES_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        try:
+            rows = self._conn().execute(BBOX_QUERY, (lat + d_lat, lat - d_lat, lng + d_lng, lng - d_lng)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Facility store error: {e}")
+            return []
+
+        matches = []
+        for fid, name, address, f_lat, f_lng, categories, cost, languages in rows:
+            if category and category not in categories.split(";"):
+                continue
+            distance = haversine_m(lat, lng, f_lat, f_lng)
+            if distance > radius_m:
+                continue
+            matches.append({
+                "place_id": f"facility:{fid}",
+                "name": name,
+                "vicinity": address,
+                "geometry": {"location": {"lat": f_lat, "lng": f_lng}},
+                "categories": categories.split(";") if categories else [],
+                "cost": cost or None,
+                "languages": languages.split(";") if languages else [],
+                "distance_m": round(distance),
+                "source": "facility_store",
+            })
+        matches.sort(key=lambda p: p["distance_m"])
+        return matches[:limit]
+
+
+facility_store = FacilityStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline care facility index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Load a CSV/JSON dataset into the index")
+    p_ingest.add_argument("path")
+    p_ingest.add_argument("--db", default=FACILITY_DB_PATH)
+    p_ingest.add_argument("--replace", action="store_true", help="Drop existing rows first")
+
+    p_query = sub.add_parser("query", help="Radius + category lookup")
+    p_query.add_argument("lat", type=float)
+    p_query.add_argument("lng", type=float)
+    p_query.add_argument("category", nargs="?")
+    p_query.add_argument("--radius", type=float, default=5000)
+    p_query.add_argument("--db", default=FACILITY_DB_PATH)
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        count = ingest(args.path, args.db, args.replace)
+        print(f"✅ Indexed {count} facilities into {args.db}")
+    else:
+        store = FacilityStore(args.db)
+        start = time.perf_counter()
+        results = store.query(args.lat, args.lng, args.radius, args.category)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        for p in results:
+            print(f"  {p['name']} - {p['vicinity']} ({p['distance_m']} m)")
+        print(f"🗂️ {len(results)} facilities in {elapsed_us:.0f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import base64
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlmodel import select
+import database
+from models import Assessment
+from planStore import load_plan
+from archive import archive_page, archived_detail
+from schemas import AssessmentSummary
+
+# --- Assessment history: keyset pages of summaries + one full row on demand ---
+# Pages walk (created_at, id) newest first. The cursor is the last row's key, so page N
+# costs the same index range scan as page 1 however long the history gets. Rows moved
+# out by the archival job (archive.py) are read from the monthly partitions.
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "100"))
+
+SUMMARY_COLUMNS = (Assessment.id, Assessment.created_at, Assessment.issue_type, Assessment.urgency, Assessment.severity_score)
+
+
+def encode_cursor(created_at: datetime, assessment_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{assessment_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for anything that isn't a cursor we issued."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, assessment_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+    return datetime.fromisoformat(created_at), int(assessment_id)
+
+
+async def history_page(user_id: int, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None) -> Tuple[List[AssessmentSummary], Optional[str]]:
+    """(summaries, next_cursor) - next_cursor is None on the last page."""
+    before = decode_cursor(cursor) if cursor else None
+    query = select(*SUMMARY_COLUMNS).where(Assessment.user_id == user_id)
+    if before:
+        created_at, assessment_id = before
+        query = query.where(or_(
+            Assessment.created_at < created_at,
+            and_(Assessment.created_at == created_at, Assessment.id < assessment_id),
+        ))
+    query = query.order_by(Assessment.created_at.desc(), Assessment.id.desc()).limit(limit + 1)
+
+    async with database.new_session() as session:
+        rows = [AssessmentSummary(**row._mapping) for row in (await session.exec(query)).all()]
+
+    # Archived rows are all older than hot ones, so the archive is only read once a user
+    # pages past the end of the hot table
+    if len(rows) <= limit:
+        last = (rows[-1].created_at, rows[-1].id) if rows else before
+        rows += await archive_page(user_id, limit + 1 - len(rows), last)
+
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if len(rows) > limit else None
+    return items, next_cursor
+
+
+async def assessment_detail(user_id: int, assessment_id: int) -> Optional[Dict]:
+    """The full record (raw answers + rebuilt plan JSON), only if it belongs to the user."""
+    async with database.new_session() as session:
+        assessment = (await session.exec(
+            select(Assessment).where(Assessment.id == assessment_id, Assessment.user_id == user_id)
+        )).first()
+        if assessment is None:
+            return await archived_detail(user_id, assessment_id)
+        record = assessment.model_dump()
+        record["full_plan_json"] = await load_plan(session, assessment.full_plan_json)
+    return record
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+import httpx
+
+# --- Shared outbound HTTP layer ---
+# One pooled keep-alive client per process (plus one async client per event loop),
+# so upstream calls reuse TCP+TLS connections instead of handshaking every time.
+# Every call is bounded by connect/read timeouts and a retry budget.
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "2.0"))
+HTTP_READ_TIMEOUT_S = float(os.getenv("HTTP_READ_TIMEOUT_S", "5.0"))
+HTTP_POOL_TIMEOUT_S = float(os.getenv("HTTP_POOL_TIMEOUT_S", "2.0"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "1"))
+HTTP_RETRY_BUDGET_S = float(os.getenv("HTTP_RETRY_BUDGET_S", "8.0"))  # total time across attempts
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE_S = 0.1
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream call fails after its retry budget is spent."""
+
+
+def _timeout(connect: Optional[float], read: Optional[float]) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=connect if connect is not None else HTTP_CONNECT_TIMEOUT_S,
+        read=read if read is not None else HTTP_READ_TIMEOUT_S,
+        write=read if read is not None else HTTP_READ_TIMEOUT_S,
+        pool=HTTP_POOL_TIMEOUT_S,
+    )
+
+
+def _transport_kwargs() -> Dict:
+    return {
+        "http2": HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+        # Connect failures are retried by the transport itself
+        "retries": 1,
+    }
+
+
+def _build(client_cls, transport_cls):
+    return client_cls(transport=transport_cls(**_transport_kwargs()), timeout=_timeout(None, None))
+
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def get_client() -> httpx.Client:
+    """Shared blocking client (for worker threads and scripts)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = _build(httpx.Client, httpx.HTTPTransport)
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        # Forget clients whose loop is gone (e.g. one asyncio.run per script call)
+        for stale in [l for l in _async_clients if l.is_closed()]:
+            del _async_clients[stale]
+        client = _build(httpx.AsyncClient, httpx.AsyncHTTPTransport)
+        _async_clients[loop] = client
+    return client
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, BACKOFF_BASE_S * (2 ** attempt))
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    return response.status_code in RETRYABLE_STATUS
+
+
+def get_json(url: str, params: Optional[Dict] = None, *, connect_timeout: Optional[float] = None,
+             read_timeout: Optional[float] = None, retries: Optional[int] = None,
+             budget_s: Optional[float] = None) -> Dict:
+    """GET a JSON document through the pooled client, retrying transient failures."""
+    retries = HTTP_RETRIES if retries is None else retries
+    deadline = time.monotonic() + (HTTP_RETRY_BUDGET_S if budget_s is None else budget_s)
+    timeout = _timeout(connect_timeout, read_timeout)
+    last_error = None
+    for attempt in range(retries + 1):
+        try:
+            response = get_client().get(url, params=params, timeout=timeout)
+            if not _should_retry(response):
+                return response.json()
+            last_error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            last_error = f"{type(e).__name__}: {e}"
+        pause = _backoff(attempt)
+        if attempt == retries or time.monotonic() + pause >= deadline:
+            break
+        time.sleep(pause)
+    raise UpstreamError(f"GET {url} failed: {last_error}")
+
+
+async def aget_json(url: str, params: Optional[Dict] = None, *, connect_timeout: Optional[float] = None,
+                    read_timeout: Optional[float] = None, retries: Optional[int] = None,
+                    budget_s: Optional[float] = None) -> Dict:
+    """Async variant of get_json."""
+    retries = HTTP_RETRIES if retries is None else retries
+    deadline = time.monotonic() + (HTTP_RETRY_BUDGET_S if budget_s is None else budget_s)
+    timeout = _timeout(connect_timeout, read_timeout)
+    last_error = None
+    for attempt in range(retries + 1):
+        try:
+            response = await get_async_client().get(url, params=params, timeout=timeout)
+            if not _should_retry(response):
+                return response.json()
+            last_error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            last_error = f"{type(e).__name__}: {e}"
+        pause = _backoff(attempt)
+        if attempt == retries or time.monotonic() + pause >= deadline:
+            break
+        await asyncio.sleep(pause)
+    raise UpstreamError(f"GET {url} failed: {last_error}")
+
+
+async def aclose_clients():
+    """Closes every pooled connection. Called on app shutdown."""
+    global _client
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    _async_clients.clear()
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from schemas import UserAssessmentInput, FinalPlan
+
+# --- Idempotency keys + single-flight for plan generation ---
+# Retries of the same request share one computation: a repeat that arrives while
+# the first is still running awaits the same task, and a repeat within the TTL gets
+# the finished FinalPlan back without touching Gemini, Places or the database.
+# A client key is bound to the intake it was first used with: reusing it for a
+# different intake is rejected (IdempotencyConflict -> 422) instead of replaying
+# a plan for answers the user didn't send.
+
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1024"))
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused with a different request body."""
+
+
+def intake_digest(data: UserAssessmentInput) -> str:
+    return hashlib.sha256(data.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def request_key(user_id: int, data: UserAssessmentInput, client_key: Optional[str] = None) -> str:
+    """Client-supplied key when present, else a hash of the intake. Always scoped to the user."""
+    if client_key:
+        return f"{user_id}:key:{client_key.strip()[:128]}"
+    return f"{user_id}:intake:{intake_digest(data)}"
+
+
+class PlanFlight:
+    """In-flight tasks plus a TTL/LRU store of finished plans, keyed by request_key."""
+
+    def __init__(self, ttl_s: float = IDEMPOTENCY_TTL_S, max_entries: int = IDEMPOTENCY_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.clock = clock
+        self._done: "OrderedDict[str, Tuple[float, FinalPlan, Optional[str]]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[asyncio.Task, Optional[str]]] = {}
+        self.misses = 0
+        self.coalesced = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _entry(self, key: str):
+        entry = self._done.get(key)
+        if entry is not None and self.clock() - entry[0] > self.ttl_s:
+            del self._done[key]
+            return None
+        return entry
+
+    def check(self, key: str, body: Optional[str] = None):
+        """Raises IdempotencyConflict if the key is live for a different body (see intake_digest)."""
+        if body is None:
+            return
+        inflight = self._inflight.get(key)
+        entry = self._entry(key)
+        known = inflight[1] if inflight is not None else entry[2] if entry is not None else None
+        if known is not None and known != body:
+            self.conflicts += 1
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+
+    def get(self, key: str) -> Optional[FinalPlan]:
+        """Finished plan for the key, if still inside the window."""
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        self._done.move_to_end(key)
+        return entry[1]
+
+    def replay(self, key: str, body: Optional[str] = None) -> Optional[FinalPlan]:
+        """Like get(), but checked against the body and counted as a replayed request."""
+        self.check(key, body)
+        plan = self.get(key)
+        if plan is not None:
+            self.replayed += 1
+        return plan
+
+    def remember(self, key: str, plan: FinalPlan, body: Optional[str] = None):
+        self._done[key] = (self.clock(), plan, body)
+        self._done.move_to_end(key)
+        while len(self._done) > self.max_entries:
+            self._done.popitem(last=False)
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[FinalPlan]],
+                  body: Optional[str] = None) -> Tuple[FinalPlan, str]:
+        """
+        Returns (plan, outcome) where outcome is "computed", "coalesced" or "replayed".
+        Raises IdempotencyConflict when the key is live for a different body.
+        """
+        plan = self.replay(key, body)
+        if plan is not None:
+            return plan, "replayed"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight[0]), "coalesced"
+
+        self.misses += 1
+        # Own task, so a caller that disconnects doesn't cancel the work others are waiting on
+        task = asyncio.create_task(compute())
+        self._inflight[key] = (task, body)
+        try:
+            plan = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda t: self._finish(key, t, body))
+        self.remember(key, plan, body)
+        return plan, "computed"
+
+    def _finish(self, key: str, task: asyncio.Task, body: Optional[str]):
+        """The first caller went away before the shared task finished."""
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.remember(key, task.result(), body)
+
+    def clear(self):
+        self._done.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._done),
+            "inflight": len(self._inflight),
+            "computed": self.misses,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
+
+
+plan_flight = PlanFlight()
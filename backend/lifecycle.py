@@ -0,0 +1,75 @@
+import asyncio
+import os
+import time
+from typing import Dict
+import config
+import database
+from archive import dispose_archives
+from assessmentWriter import assessment_writer
+from exerciseLibrary import exercise_library
+from httpClient import aclose_clients, get_async_client
+from llmGateway import llm_gateway
+from localClassifier import local_classifier
+from passwordHasher import password_hasher
+
+# --- Process lifecycle for the shared clients ---
+# Importing the app builds nothing expensive: the LLM client (and its SDK), the DB
+# engine and the HTTP pools are all created on first use. startup() runs in the FastAPI
+# lifespan and always builds the LLM client in a worker thread, so the SDK import never
+# lands on the event loop inside a request. STARTUP_WARMUP=1 additionally opens DB
+# connections and loads the optional local models before traffic arrives.
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "2"))
+WARMUP_TIMEOUT_S = float(os.getenv("WARMUP_TIMEOUT_S", "5"))
+
+startup_timings: Dict[str, float] = {}
+
+
+async def _timed(name: str, work):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(work, WARMUP_TIMEOUT_S)
+    except Exception as e:
+        # Best effort - the same thing happens lazily on first use
+        print(f"⚠️ Startup step '{name}' skipped: {type(e).__name__}: {e}")
+    startup_timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def warm_up():
+    """Opens connections and loads the optional models ahead of the first request."""
+    await asyncio.gather(
+        _timed("db_pool", database.warm_db(WARMUP_DB_CONNECTIONS)),
+        _timed("local_classifier", asyncio.to_thread(local_classifier.available)),
+        _timed("exercise_library", asyncio.to_thread(lambda: exercise_library.version)),
+    )
+    get_async_client()
+
+
+async def startup(warm: bool = STARTUP_WARMUP):
+    start = time.perf_counter()
+    missing = config.missing_keys()
+    if missing:
+        print(f"⚠️ WARNING: {', '.join(missing)} not set! Check your .env file.")
+    await database.create_db_and_tables()
+    startup_timings["db_schema"] = round((time.perf_counter() - start) * 1000, 1)
+    assessment_writer.start()
+    # Not optional: built lazily, the first request would import the SDK on the event loop
+    await _timed("llm_client", asyncio.to_thread(lambda: llm_gateway.backend))
+    if warm:
+        await warm_up()
+    startup_timings["startup_total"] = round((time.perf_counter() - start) * 1000, 1)
+    print(f"🚀 Ready in {startup_timings['startup_total']:.0f}ms{' (warmed up)' if warm else ''}")
+
+
+async def shutdown():
+    # Commit queued assessments, then drop pooled upstream and database connections
+    await assessment_writer.stop()
+    await aclose_clients()
+    await dispose_archives()
+    await database.dispose_db()
+    password_hasher.shutdown()
+
+
+def startup_stats() -> Dict:
+    return {"warmup": STARTUP_WARMUP, "timings_ms": dict(startup_timings)}
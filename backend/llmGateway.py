@@ -0,0 +1,443 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+import config  # noqa: F401 - .env loaded before the settings below
+from httpClient import RETRYABLE_STATUS
+from circuitBreaker import CircuitOpen, get_breaker
+
+# --- Single gateway for every LLM call ---
+# One client per process behind a global and a per-model concurrency cap, a token
+# bucket sized to the quota, and jittered exponential-backoff retries on 429/5xx.
+# A circuit breaker per model answers an outage instantly (LLMUnavailable, so the
+# caller's fallback runs) instead of every request waiting for its own timeout.
+# The backend is pluggable: LLM_BACKEND=stub swaps Gemini for canned local responses
+# (tests, load runs).
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gemini-2.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "16"))
+LLM_RATE_PER_MIN = float(os.getenv("LLM_RATE_PER_MIN", "900"))   # quota, requests per minute
+LLM_BURST = int(os.getenv("LLM_BURST", "20"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.25"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "4.0"))
+LLM_STUB_LATENCY_S = float(os.getenv("LLM_STUB_LATENCY_S", "0"))
+# Static prompt instructions go into Gemini context caches when the model accepts them
+PROMPT_CONTEXT_CACHE = os.getenv("PROMPT_CONTEXT_CACHE", "1") == "1"
+PROMPT_CACHE_TTL_S = float(os.getenv("PROMPT_CACHE_TTL_S", "3600"))
+STALE_CACHE_STATUS = {400, 403, 404}
+
+
+class LLMUnavailable(Exception):
+    """Raised when no LLM backend is configured (e.g. missing API key)."""
+
+
+def is_retryable(e: Exception) -> bool:
+    """Quota/server errors and dropped connections are worth another attempt."""
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    if code in RETRYABLE_STATUS:
+        return True
+    return isinstance(e, (asyncio.TimeoutError, TimeoutError, ConnectionError)) or type(e).__name__ in (
+        "ConnectError", "ReadTimeout", "RemoteProtocolError", "ServerError",
+    )
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(LLM_RETRY_MAX_S, LLM_RETRY_BASE_S * (2 ** attempt)))
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.client = None
+        self._caches: Dict[tuple, tuple] = {}  # (model, template key) -> (cache name or None, expires_at)
+        # Single-flight cache creation: concurrent first calls for a key wait for one create
+        # instead of each making (and paying for) its own server-side cache
+        self._cache_locks: Dict[tuple, threading.Lock] = {}
+        self._cache_locks_guard = threading.Lock()
+        self._cache_inflight: Dict[tuple, asyncio.Future] = {}
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        try:
+            from google import genai
+        except ImportError:
+            print("❌ Google GenAI SDK not installed. Run: pip install google-genai")
+            return
+        if not api_key:
+            print("❌ GEMINI_API_KEY environment variable not set")
+            return
+        try:
+            self.client = genai.Client(api_key=api_key)
+            print(f"✅ Gemini client initialized successfully")
+        except Exception as e:
+            print(f"❌ Gemini initialization error: {e}")
+
+    def available(self) -> bool:
+        return self.client is not None
+
+    def _config(self, json_output: bool, schema: Optional[Dict], system: Optional[str] = None, cached: Optional[str] = None):
+        config = {}
+        if json_output:
+            config["response_mime_type"] = "application/json"
+            if schema:
+                config["response_schema"] = schema
+        # The static instruction comes from the context cache when there is one
+        if cached:
+            config["cached_content"] = cached
+        elif system:
+            config["system_instruction"] = system
+        return config or None
+
+    def _cache_lookup(self, model: str, template):
+        """(use_cache_name, needs_create) for a template's static instruction."""
+        if not PROMPT_CONTEXT_CACHE or template is None:
+            return None, False
+        entry = self._caches.get((model, template.key))
+        now = time.monotonic()
+        if entry and now < entry[1] - 60:
+            return entry[0], False   # None here means caching is unsupported for this prompt; retry later
+        return None, True
+
+    def _cache_created(self, model: str, template, cache=None, error: Optional[Exception] = None):
+        key = (model, template.key)
+        expires = time.monotonic() + PROMPT_CACHE_TTL_S
+        if error is not None:
+            # Too short for explicit caching, or not supported: fall back to a plain system
+            # instruction (still a stable prefix for implicit caching) and retry after the TTL
+            print(f"ℹ️ Context cache unavailable for {template.key} ({type(error).__name__}) - using system instruction")
+            self._caches[key] = (None, expires)
+            return None
+        print(f"🧠 Context cache created for {template.key} on {model}")
+        self._caches[key] = (cache.name, expires)
+        return cache.name
+
+    def _cache_config(self, template) -> Dict:
+        return {"system_instruction": template.system, "ttl": f"{int(PROMPT_CACHE_TTL_S)}s", "display_name": template.key}
+
+    def _cache_lock(self, key: tuple) -> threading.Lock:
+        with self._cache_locks_guard:
+            return self._cache_locks.setdefault(key, threading.Lock())
+
+    def _cached_name(self, model: str, template) -> Optional[str]:
+        name, needs_create = self._cache_lookup(model, template)
+        if not needs_create:
+            return name
+        with self._cache_lock((model, template.key)):
+            # Another thread may have created it while we waited
+            name, needs_create = self._cache_lookup(model, template)
+            if not needs_create:
+                return name
+            try:
+                return self._cache_created(model, template, self.client.caches.create(model=model, config=self._cache_config(template)))
+            except Exception as e:
+                return self._cache_created(model, template, error=e)
+
+    async def _acached_name(self, model: str, template) -> Optional[str]:
+        name, needs_create = self._cache_lookup(model, template)
+        if not needs_create:
+            return name
+        key = (model, template.key)
+        loop = asyncio.get_running_loop()
+        pending = self._cache_inflight.get(key)
+        if pending is not None and not pending.done() and pending.get_loop() is loop:
+            await asyncio.wait({pending})
+            if not pending.cancelled():
+                return pending.result()
+            return await self._acached_name(model, template)  # the creating call was cancelled
+
+        future = self._cache_inflight[key] = loop.create_future()
+        try:
+            try:
+                cache = await self.client.aio.caches.create(model=model, config=self._cache_config(template))
+                name = self._cache_created(model, template, cache)
+            except Exception as e:
+                name = self._cache_created(model, template, error=e)
+            future.set_result(name)
+            return name
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._cache_inflight.get(key) is future:
+                del self._cache_inflight[key]
+
+    def _drop_cache(self, model: str, template, e: Exception):
+        """A cache that expired or was deleted server-side: forget it and send the instruction inline."""
+        print(f"ℹ️ Context cache for {template.key} rejected ({type(e).__name__}) - resending inline")
+        self._caches.pop((model, template.key), None)
+
+    def generate(self, model: str, prompt: str, json_output: bool, schema: Optional[Dict] = None, template=None) -> str:
+        system = template.system if template else None
+        cached = self._cached_name(model, template)
+        try:
+            response = self.client.models.generate_content(
+                model=model, contents=prompt, config=self._config(json_output, schema, system, cached))
+        except Exception as e:
+            if not cached or getattr(e, "code", None) not in STALE_CACHE_STATUS:
+                raise
+            self._drop_cache(model, template, e)
+            response = self.client.models.generate_content(
+                model=model, contents=prompt, config=self._config(json_output, schema, system))
+        return response.text
+
+    async def agenerate(self, model: str, prompt: str, json_output: bool, schema: Optional[Dict] = None, template=None) -> str:
+        system = template.system if template else None
+        cached = await self._acached_name(model, template)
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=model, contents=prompt, config=self._config(json_output, schema, system, cached))
+        except Exception as e:
+            if not cached or getattr(e, "code", None) not in STALE_CACHE_STATUS:
+                raise
+            self._drop_cache(model, template, e)
+            response = await self.client.aio.models.generate_content(
+                model=model, contents=prompt, config=self._config(json_output, schema, system))
+        return response.text
+
+
+STUB_EXERCISES = [
+    {"title": "Box Breathing", "steps": ["Inhale 4s", "Hold 4s", "Exhale 4s", "Hold 4s"], "benefit": "Slows the stress response."},
+    {"title": "5-4-3-2-1 Grounding", "steps": ["Name 5 things you see", "4 you can touch", "3 you hear"], "benefit": "Anchors attention in the present."},
+    {"title": "Brain Dump", "steps": ["Write every worry down for 3 minutes"], "benefit": "Frees working memory."},
+]
+
+STUB_SCORES = {
+    "issue_type": "general_support",
+    "urgency": "soon",
+    "severity_score": 2,
+    "needs_immediate_resources": False,
+    "confidence": 0.5,
+    "reasoning": "Stub backend classification.",
+    "personalized_note": "Thank you for sharing. Connecting with support can help you work through this.",
+}
+
+
+def stub_response(model: str, prompt: str) -> str:
+    """Canned, well-formed answers shaped like each of our prompts."""
+    if "AVAILABLE RESOURCES" in prompt:
+        return json.dumps([{"index": i, "rationale": "Stub selection."} for i in range(3)])
+    if "COMBINED OUTPUT" in prompt:
+        return json.dumps({"scores": STUB_SCORES, "exercises": STUB_EXERCISES})
+    if "coping exercises" in prompt:
+        return json.dumps(STUB_EXERCISES)
+    return json.dumps(STUB_SCORES)
+
+
+class StubBackend:
+    """Local stand-in for Gemini. responder(model, prompt) -> text; may raise to simulate failures."""
+    name = "stub"
+
+    def __init__(self, responder: Callable[[str, str], str] = stub_response, latency_s: float = LLM_STUB_LATENCY_S):
+        self.responder = responder
+        self.latency_s = latency_s
+
+    def available(self) -> bool:
+        return True
+
+    @staticmethod
+    def _full_prompt(prompt: str, template) -> str:
+        return f"{template.system}\n{prompt}" if template else prompt
+
+    def generate(self, model: str, prompt: str, json_output: bool, schema: Optional[Dict] = None, template=None) -> str:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self.responder(model, self._full_prompt(prompt, template))
+
+    async def agenerate(self, model: str, prompt: str, json_output: bool, schema: Optional[Dict] = None, template=None) -> str:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self.responder(model, self._full_prompt(prompt, template))
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+
+class TokenBucket:
+    """Thread-safe token bucket. reserve() takes a token and returns how long to wait for it."""
+
+    def __init__(self, rate_per_s: float, capacity: int, clock=time.monotonic):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is a queue of callers; each waits for its own token
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate_per_s
+
+
+class LLMGateway:
+    """Rate-limited, concurrency-capped, retrying front door to the LLM backend."""
+
+    def __init__(self, backend=None, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 model_concurrency: int = LLM_MODEL_CONCURRENCY, rate_per_min: float = LLM_RATE_PER_MIN,
+                 burst: int = LLM_BURST, retries: int = LLM_RETRIES):
+        # The default backend (and its SDK import) is only built on first use - see `backend`
+        self._backend = backend
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency
+        self.retries = retries
+        self.bucket = TokenBucket(rate_per_min / 60.0, burst)
+        self._lock = threading.Lock()
+        # asyncio primitives belong to one event loop; threads get their own semaphores
+        self._async_limits: Dict[asyncio.AbstractEventLoop, Dict] = {}
+        self._sync_global = threading.BoundedSemaphore(max_concurrency)
+        self._sync_models: Dict[str, threading.BoundedSemaphore] = {}
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+        self.inflight = 0
+        self.short_circuited = 0
+        self.throttled_s = 0.0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = BACKENDS.get(LLM_BACKEND, GeminiBackend)()
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+
+    def available(self) -> bool:
+        return self.backend is not None and self.backend.available()
+
+    def _loop_limits(self) -> Dict:
+        loop = asyncio.get_running_loop()
+        limits = self._async_limits.get(loop)
+        if limits is None:
+            with self._lock:
+                for other in [l for l in self._async_limits if l.is_closed()]:
+                    del self._async_limits[other]
+                limits = self._async_limits.setdefault(loop, {"global": asyncio.Semaphore(self.max_concurrency), "models": {}})
+        return limits
+
+    def _sync_model(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._sync_models:
+                self._sync_models[model] = threading.BoundedSemaphore(self.model_concurrency)
+            return self._sync_models[model]
+
+    def _count(self, field: str, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    @staticmethod
+    def _breaker(model: str):
+        return get_breaker(f"llm:{model}")
+
+    def _admit(self, breaker):
+        """Refuses the attempt instantly while the model's breaker is open."""
+        try:
+            breaker.before()
+        except CircuitOpen as e:
+            self._count("short_circuited")
+            raise LLMUnavailable(str(e)) from e
+
+    def _give_up(self, breaker, e: Exception, attempt: int) -> bool:
+        """Records a failed attempt; True when the error should go back to the caller."""
+        retryable = is_retryable(e)
+        if retryable:
+            breaker.failure()
+        else:
+            breaker.release()  # a bad request says nothing about upstream health
+        if attempt >= self.retries or not retryable:
+            self._count("failures")
+            return True
+        print(f"🔁 LLM retry {attempt + 1}/{self.retries} after {type(e).__name__}")
+        self._count("retried")
+        return False
+
+    async def agenerate(self, prompt: str, model: str = LLM_DEFAULT_MODEL, json_output: bool = True,
+                        schema: Optional[Dict] = None, template=None) -> str:
+        """
+        Response text from the backend. `prompt` is the per-request payload; `template`
+        (a prompts.PromptTemplate) supplies the static system instruction.
+        Raises LLMUnavailable or the last backend error.
+        """
+        if not self.available():
+            raise LLMUnavailable("No LLM backend configured")
+        breaker = self._breaker(model)
+        limits = self._loop_limits()
+        model_sem = limits["models"].setdefault(model, asyncio.Semaphore(self.model_concurrency))
+        async with limits["global"], model_sem:
+            for attempt in range(self.retries + 1):
+                self._admit(breaker)
+                wait = self.bucket.reserve()
+                if wait:
+                    self._count("throttled_s", wait)
+                    await asyncio.sleep(wait)
+                self._count("calls")
+                self._count("inflight")
+                started = time.monotonic()
+                try:
+                    text = await self.backend.agenerate(model, prompt, json_output, schema, template)
+                    breaker.success(time.monotonic() - started)
+                    return text
+                except asyncio.CancelledError:
+                    breaker.cancelled(time.monotonic() - started)
+                    raise
+                except Exception as e:
+                    if self._give_up(breaker, e, attempt):
+                        raise
+                finally:
+                    self._count("inflight", -1)
+                await asyncio.sleep(backoff_delay(attempt))
+
+    def generate(self, prompt: str, model: str = LLM_DEFAULT_MODEL, json_output: bool = True,
+                 schema: Optional[Dict] = None, template=None) -> str:
+        """Blocking variant for worker threads and scripts."""
+        if not self.available():
+            raise LLMUnavailable("No LLM backend configured")
+        breaker = self._breaker(model)
+        with self._sync_global, self._sync_model(model):
+            for attempt in range(self.retries + 1):
+                self._admit(breaker)
+                wait = self.bucket.reserve()
+                if wait:
+                    self._count("throttled_s", wait)
+                    time.sleep(wait)
+                self._count("calls")
+                self._count("inflight")
+                started = time.monotonic()
+                try:
+                    text = self.backend.generate(model, prompt, json_output, schema, template)
+                    breaker.success(time.monotonic() - started)
+                    return text
+                except Exception as e:
+                    if self._give_up(breaker, e, attempt):
+                        raise
+                finally:
+                    self._count("inflight", -1)
+                time.sleep(backoff_delay(attempt))
+
+    def stats(self) -> Dict:
+        return {
+            "backend": getattr(self._backend, "name", type(self._backend).__name__) if self._backend is not None else "not started",
+            # Not built yet: don't construct it (and import the SDK) just to answer a health probe
+            "available": self.available() if self._backend is not None else None,
+            "calls": self.calls,
+            "retried": self.retried,
+            "failures": self.failures,
+            "inflight": self.inflight,
+            "short_circuited": self.short_circuited,
+            "throttled_s": round(self.throttled_s, 3),
+        }
+
+
+llm_gateway = LLMGateway()
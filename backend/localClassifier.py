@@ -0,0 +1,276 @@
+"""
+Local classifier tier: hashed n-grams + softmax regression, trained on past Gemini labels.
+Only rows whose classification_source is "gemini" count as labels - rows answered by this
+classifier, the semantic cache or the crisis fast-path would just feed its own output back.
+
+Train from the Assessment table, then check how often it agrees with Gemini:
+    python localClassifier.py train
+    python localClassifier.py report
+
+Three heads (issue_type, urgency, severity_score) share one hashed feature vector.
+Each head's probabilities are temperature-calibrated on a held-out slice of the most
+recent rows; the cascade in classify.py only trusts the local answer when the
+calibrated confidence clears LOCAL_CLASSIFIER_THRESHOLD.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from schemas import UserAssessmentInput
+from textFeatures import HASH_DIM, hash_vector, intake_vector, normalize_intake
+from classifyCache import is_crisis_flagged, template_note
+import database
+
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "1") == "1"
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", "local_classifier.npz")
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.75"))
+LOCAL_CLASSIFIER_DB = os.getenv("LOCAL_CLASSIFIER_DB", database.DATABASE_URL)
+
+HEADS = ("issue_type", "urgency", "severity")
+MIN_TRAINING_ROWS = 50
+TEMPERATURES = np.linspace(0.5, 5.0, 46)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def fit_softmax(X: np.ndarray, y: np.ndarray, n_classes: int, epochs: int = 300, lr: float = 1.0, l2: float = 1e-4) -> Tuple[np.ndarray, np.ndarray]:
+    """Full-batch gradient descent on multinomial logistic regression."""
+    n, d = X.shape
+    W = np.zeros((d, n_classes), dtype=np.float32)
+    b = np.zeros(n_classes, dtype=np.float32)
+    onehot = np.eye(n_classes, dtype=np.float32)[y]
+    for _ in range(epochs):
+        grad = (_softmax(X @ W + b) - onehot) / n
+        W -= lr * (X.T @ grad + l2 * W)
+        b -= lr * grad.sum(axis=0)
+    return W, b
+
+
+def fit_temperature(logits: np.ndarray, y: np.ndarray) -> float:
+    """Temperature minimising held-out negative log-likelihood."""
+    if len(y) == 0:
+        return 1.0
+    nll = [-np.log(_softmax(logits / t)[np.arange(len(y)), y] + 1e-12).mean() for t in TEMPERATURES]
+    return float(TEMPERATURES[int(np.argmin(nll))])
+
+
+def _is_high_risk(issue_type: str, urgency: str, severity: int) -> bool:
+    """High-risk calls are always left to Gemini."""
+    return issue_type == "crisis_safety" or urgency in ("urgent", "immediate_crisis") or severity >= 4
+
+
+def _labels(row) -> Dict[str, str]:
+    return {"issue_type": row.issue_type, "urgency": row.urgency, "severity": str(int(row.severity_score))}
+
+
+def _row_text(row) -> str:
+    return normalize_intake(UserAssessmentInput(
+        primary_concern=row.raw_primary_concern,
+        answer_distress=row.raw_distress,
+        answer_functioning=row.raw_functioning,
+        answer_urgency=row.raw_urgency,
+        answer_safety=row.raw_safety,
+        answer_constraints=row.raw_constraints,
+    ))
+
+
+def load_training_rows(db_url: str = LOCAL_CLASSIFIER_DB) -> list:
+    """Gemini-labelled assessments, oldest first (failed/default classifications excluded)."""
+    from sqlmodel import Session, create_engine, select
+    from models import Assessment
+
+    engine = create_engine(db_url)
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Assessment)
+            .where(Assessment.classification_source == "gemini")
+            .where(Assessment.confidence > 0)
+            .where(Assessment.issue_type != "unknown")
+            .order_by(Assessment.created_at, Assessment.id)
+        ).all()
+    return rows
+
+
+def train(rows: list, holdout: float = 0.2) -> Dict[str, np.ndarray]:
+    """Trains all heads; the newest `holdout` fraction of rows is used only for calibration."""
+    if len(rows) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Need at least {MIN_TRAINING_ROWS} labelled assessments, found {len(rows)}")
+    X = np.stack([hash_vector(_row_text(r)) for r in rows])
+    labels = [_labels(r) for r in rows]
+    split = len(rows) - max(int(len(rows) * holdout), 1)
+
+    model = {
+        "dim": np.array(HASH_DIM),
+        "trained_rows": np.array(split),
+        "trained_through": np.array(rows[split - 1].created_at.isoformat()),
+        "trained_at": np.array(datetime.utcnow().isoformat()),
+    }
+    for head in HEADS:
+        classes = sorted({l[head] for l in labels})
+        index = {c: i for i, c in enumerate(classes)}
+        y = np.array([index[l[head]] for l in labels])
+        W, b = fit_softmax(X[:split], y[:split], len(classes))
+        temperature = fit_temperature(X[split:] @ W + b, y[split:])
+        held_out_acc = float(((X[split:] @ W + b).argmax(axis=1) == y[split:]).mean())
+        model[f"{head}_W"] = W
+        model[f"{head}_b"] = b
+        model[f"{head}_classes"] = np.array(classes)
+        model[f"{head}_temperature"] = np.array(temperature)
+        print(f"  {head}: {len(classes)} classes, held-out accuracy {held_out_acc:.1%}, T={temperature:.2f}")
+    return model
+
+
+def save_model(model: Dict[str, np.ndarray], path: str = LOCAL_CLASSIFIER_PATH):
+    tmp = f"{path}.tmp.npz"
+    np.savez_compressed(tmp, **model)
+    os.replace(tmp, path)
+
+
+class LocalClassifier:
+    """Loads the trained artifact once and classifies in well under a millisecond."""
+
+    def __init__(self, path: str = LOCAL_CLASSIFIER_PATH, threshold: float = LOCAL_CLASSIFIER_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._model: Optional[Dict[str, np.ndarray]] = None
+        self._loaded = False
+        self.handled = 0
+        self.escalated = 0
+
+    def _load(self) -> Optional[Dict[str, np.ndarray]]:
+        if self._loaded:
+            return self._model
+        with self._lock:
+            if not self._loaded:
+                if os.path.exists(self.path):
+                    with np.load(self.path) as data:
+                        self._model = {k: data[k] for k in data.files}
+                    print(f"🧮 Local classifier loaded ({int(self._model['trained_rows'])} training rows)")
+                self._loaded = True
+        return self._model
+
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def predict_vector(self, vec: np.ndarray) -> Dict[str, Tuple[str, float]]:
+        """{head: (label, calibrated probability)} for one feature vector."""
+        model = self._load()
+        out = {}
+        for head in HEADS:
+            logits = vec @ model[f"{head}_W"] + model[f"{head}_b"]
+            probs = _softmax(logits / float(model[f"{head}_temperature"]))
+            best = int(np.argmax(probs))
+            out[head] = (str(model[f"{head}_classes"][best]), float(probs[best]))
+        return out
+
+    def classify(self, input: UserAssessmentInput) -> Optional[Dict]:
+        """Scores when the local tier is confident, None to escalate to Gemini."""
+        if not self.available() or is_crisis_flagged(input):
+            return None
+        pred = self.predict_vector(intake_vector(input, int(self._model["dim"])))
+        issue_type, urgency, severity = pred["issue_type"][0], pred["urgency"][0], int(pred["severity"][0])
+        # Joint confidence: all three heads have to be right
+        confidence = float(np.prod([p for _, p in pred.values()]))
+
+        if _is_high_risk(issue_type, urgency, severity) or confidence < self.threshold:
+            self.escalated += 1
+            return None
+        self.handled += 1
+        return {
+            "issue_type": issue_type,
+            "urgency": urgency,
+            "severity_score": severity,
+            "needs_immediate_resources": False,
+            "confidence": round(confidence, 3),
+            "reasoning": f"Local classifier: {issue_type.replace('_', ' ')}, {urgency} follow-up.",
+            "personalized_note": template_note(urgency),
+            "source": "local",
+        }
+
+    def stats(self) -> Dict:
+        total = self.handled + self.escalated
+        return {
+            "available": self._model is not None,
+            "threshold": self.threshold,
+            "handled": self.handled,
+            "escalated": self.escalated,
+            "local_rate": round(self.handled / total, 4) if total else 0.0,
+        }
+
+
+local_classifier = LocalClassifier()
+
+
+def report(classifier: LocalClassifier, rows: list) -> Dict:
+    """Agreement with the stored Gemini labels, overall and on the rows the local tier would keep."""
+    trained_through = str(classifier._load()["trained_through"])
+    unseen = [r for r in rows if r.created_at.isoformat() > trained_through]
+    if unseen:
+        rows = unseen
+    else:
+        print("⚠️ No assessments newer than the training data; agreement below includes training rows")
+
+    agree = {head: 0 for head in HEADS}
+    kept, kept_agree = 0, 0
+    elapsed = 0.0
+    for r in rows:
+        start = time.perf_counter()
+        pred = classifier.predict_vector(hash_vector(_row_text(r)))
+        elapsed += time.perf_counter() - start
+        truth = _labels(r)
+        hits = {head: pred[head][0] == truth[head] for head in HEADS}
+        for head in HEADS:
+            agree[head] += hits[head]
+        confidence = np.prod([p for _, p in pred.values()])
+        risky = _is_high_risk(pred["issue_type"][0], pred["urgency"][0], int(pred["severity"][0]))
+        if confidence >= classifier.threshold and not risky:
+            kept += 1
+            kept_agree += all(hits.values())
+
+    n = len(rows)
+    return {
+        "rows": n,
+        "agreement": {head: round(agree[head] / n, 4) for head in HEADS} if n else {},
+        "local_coverage": round(kept / n, 4) if n else 0.0,
+        "agreement_when_local": round(kept_agree / kept, 4) if kept else 0.0,
+        "mean_latency_us": round(elapsed / n * 1e6, 1) if n else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local classifier tier")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--db", default=LOCAL_CLASSIFIER_DB, help="SQLAlchemy URL of the assessments database")
+    parser.add_argument("--path", default=LOCAL_CLASSIFIER_PATH)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Newest fraction of rows kept for calibration")
+    args = parser.parse_args()
+
+    rows = load_training_rows(args.db)
+    if args.command == "train":
+        print(f"🧮 Training on {len(rows)} labelled assessments")
+        model = train(rows, args.holdout)
+        save_model(model, args.path)
+        print(f"✅ Saved local classifier to {args.path}")
+    else:
+        classifier = LocalClassifier(args.path)
+        if not classifier.available():
+            print(f"❌ No trained model at {args.path}. Run: python localClassifier.py train")
+            return
+        result = report(classifier, rows)
+        print(f"📊 {result['rows']} assessments")
+        for head, rate in result["agreement"].items():
+            print(f"  {head}: {rate:.1%} agreement with Gemini")
+        print(f"  handled locally: {result['local_coverage']:.1%} "
+              f"({result['agreement_when_local']:.1%} fully agree), {result['mean_latency_us']}µs per intake")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,46 @@
-import requests
+import asyncio
 import json
 import os
-from dotenv import load_dotenv
-from google import genai
+import time
+import config  # noqa: F401 - .env loaded before the settings below
 from schemas import UserAssessmentInput, AssessmentScores
+from httpClient import get_json, aget_json
+from facilityStore import facility_store
+from placesCache import places_cache, geohash_encode, cell_query, within_radius, haversine_m
+from resourceRanker import rank_resources, top_indices
+from llmGateway import llm_gateway
+from prompts import SELECTION_PROMPT
+from circuitBreaker import CircuitOpen, get_breaker
 
-# Load variables from .env
-load_dotenv()
-
-# Get keys from environment (backend .env: GOOGLE_MAPS_API_KEY for Places API)
-MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-# Check if keys are missing to avoid confusing errors later
-if not MAPS_API_KEY or not GEMINI_API_KEY:
-    print("⚠️ WARNING: API Keys are missing! Check your .env file.")
-
+# Missing keys are reported once at startup (see lifecycle.py).
 # For Nearby Search to return places: enable "Places API" (not just Maps JavaScript API)
 # in Google Cloud Console → APIs & Services → Enable APIs.
 
 
 # --- Configuration ---
+# backend .env: GOOGLE_MAPS_API_KEY for Places API
 MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "YOUR_GOOGLE_MAPS_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY")
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Nearby Search radius around the user (metres)
+SEARCH_RADIUS_M = 5000
+
+# How the keyword fallback chain runs in the async path:
+#   sequential - next keyword only after the previous one came back empty
+#   hedged     - next keyword also fires after PLACES_HEDGE_DELAY_S without a result
+#   parallel   - every keyword fires at once
+PLACES_FALLBACK_MODE = os.getenv("PLACES_FALLBACK_MODE", "hedged")
+PLACES_HEDGE_DELAY_S = float(os.getenv("PLACES_HEDGE_DELAY_S", "0.3"))
+
+# The offline facility store answers first; Places is only queried when it has
+# fewer than this many matches (sparse areas)
+FACILITY_MIN_RESULTS = int(os.getenv("FACILITY_MIN_RESULTS", "3"))
+
+# How pick_best_resources chooses the 3 local facilities:
+#   llm       - every candidate goes to Gemini
+#   prefilter - the NumPy ranker trims candidates to RANKER_PREFILTER_K before Gemini
+#   ranker    - the NumPy ranker alone, no LLM call
+RESOURCE_SELECTION_MODE = os.getenv("RESOURCE_SELECTION_MODE", "prefilter")
+RANKER_PREFILTER_K = int(os.getenv("RANKER_PREFILTER_K", "6"))
 
 ISSUE_SPECIFIC_RESOURCES = {
     "mental_health": [
@@ -73,6 +89,11 @@ TYPE_MAP = {
         "unknown": "mental health"
     }
 
+# Issue types whose specific keyword is narrow enough to warrant a "counseling" retry
+BROAD_FALLBACK_TYPES = (
+    "mental_health", "behavioral_addiction", "grief_loss", "relationship_family", "unknown"
+)
+
 def generate_resource_list(assessment: AssessmentScores):
     """Generates the mandatory national/static safety net."""
     final_resources = []
@@ -128,110 +149,305 @@ def generate_resource_list(assessment: AssessmentScores):
 
     return final_resources
 
-def _places_nearby_search(lat: float, lng: float, keyword: str) -> list:
-    """Single Places API Nearby Search request. Returns up to 10 results."""
-    url = f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?location={lat},{lng}&radius=5000&keyword={keyword}&key={MAPS_API_KEY}"
+PLACES_NEARBY_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+
+
+def _places_params(lat: float, lng: float, keyword: str, radius: float) -> dict:
+    return {"location": f"{lat},{lng}", "radius": int(radius), "keyword": keyword, "key": MAPS_API_KEY}
+
+
+def _read_places_response(data: dict, keyword: str):
+    """Returns (results, cacheable) from a Nearby Search payload."""
+    results = data.get("results", [])
+    status = data.get("status", "")
+    if not results:
+        print(f"🗺️ Places API: status={status!r} keyword={keyword!r}")
+        if status not in ("OK", "ZERO_RESULTS"):
+            print(f"   error_message={data.get('error_message', 'none')}")
+    return results, status in ("OK", "ZERO_RESULTS")
+
+
+# Over-quota / server-side statuses count against the Places breaker; ZERO_RESULTS etc. don't
+PLACES_UPSTREAM_ERRORS = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+def _fetch_places(lat: float, lng: float, keyword: str, radius: float):
+    """Raw Places API Nearby Search request. Returns (results, cacheable)."""
+    breaker = get_breaker("places")
     try:
-        response = requests.get(url)
-        data = response.json()
-        results = data.get("results", [])[:10]
-        status = data.get("status", "")
-        if not results:
-            print(f"🗺️ Places API: status={status!r} keyword={keyword!r}")
-            if status not in ("OK", "ZERO_RESULTS"):
-                print(f"   error_message={data.get('error_message', 'none')}")
-        return results
+        breaker.before()
+        started = time.monotonic()
+        data = get_json(PLACES_NEARBY_URL, _places_params(lat, lng, keyword, radius))
+        _record_places_outcome(breaker, data, started)
+        return _read_places_response(data, keyword)
+    except CircuitOpen:
+        return [], False
     except Exception as e:
+        breaker.failure()
         print(f"Maps API Error: {e}")
-        return []
+        return [], False
+
+
+async def _fetch_places_async(lat: float, lng: float, keyword: str, radius: float):
+    """Async variant of _fetch_places on the shared pooled client."""
+    breaker = get_breaker("places")
+    try:
+        breaker.before()
+        started = time.monotonic()
+        data = await aget_json(PLACES_NEARBY_URL, _places_params(lat, lng, keyword, radius))
+        _record_places_outcome(breaker, data, started)
+        return _read_places_response(data, keyword)
+    except CircuitOpen:
+        return [], False
+    except asyncio.CancelledError:
+        breaker.cancelled(time.monotonic() - started)
+        raise
+    except Exception as e:
+        breaker.failure()
+        print(f"Maps API Error: {e}")
+        return [], False
+
+
+def _record_places_outcome(breaker, data: dict, started: float):
+    if data.get("status") in PLACES_UPSTREAM_ERRORS:
+        breaker.failure()
+    else:
+        breaker.success(time.monotonic() - started)
+
+
+def _store_in_cache(cell: str, keyword: str, places: list, cacheable: bool):
+    if cacheable:
+        places_cache.put(cell, keyword, places)
+    stats = places_cache.stats()
+    print(f"🗺️ Places cache miss cell={cell} keyword={keyword!r} (hits={stats['hits']} misses={stats['misses']})")
+
+
+def _places_nearby_search(lat: float, lng: float, keyword: str) -> list:
+    """Places Nearby Search served through the geo-tiled cache. Returns up to 10 results."""
+    cell = geohash_encode(lat, lng)
+    places = places_cache.get(cell, keyword)
+    if places is None:
+        c_lat, c_lng, radius = cell_query(cell, SEARCH_RADIUS_M)
+        places, cacheable = _fetch_places(c_lat, c_lng, keyword, radius)
+        _store_in_cache(cell, keyword, places, cacheable)
+    return within_radius(places, lat, lng, SEARCH_RADIUS_M)[:10]
+
+
+async def _places_nearby_search_async(lat: float, lng: float, keyword: str) -> list:
+    """Async variant of _places_nearby_search; never blocks the event loop."""
+    cell = geohash_encode(lat, lng)
+    places = places_cache.get(cell, keyword)
+    if places is None:
+        c_lat, c_lng, radius = cell_query(cell, SEARCH_RADIUS_M)
+        places, cacheable = await _fetch_places_async(c_lat, c_lng, keyword, radius)
+        _store_in_cache(cell, keyword, places, cacheable)
+    return within_radius(places, lat, lng, SEARCH_RADIUS_M)[:10]
+
+
+def fallback_keywords(assessment: AssessmentScores) -> list:
+    """Places keywords to try, most specific first."""
+    keywords = [TYPE_MAP.get(assessment.issue_type, "mental health")]
+    # Fallback: if no results with specific keyword, try broader terms
+    if assessment.issue_type in BROAD_FALLBACK_TYPES:
+        keywords.append("counseling")
+    keywords.append("mental health")
+    return list(dict.fromkeys(keywords))
+
+
+def facility_categories(assessment: AssessmentScores) -> list:
+    """Facility store categories to try, most specific first (mirrors fallback_keywords)."""
+    categories = [assessment.issue_type]
+    if assessment.issue_type in BROAD_FALLBACK_TYPES:
+        categories.append("counseling")
+    categories.append("mental_health")
+    return list(dict.fromkeys(categories))
+
+
+def _local_facilities(lat: float, lng: float, assessment: AssessmentScores) -> list:
+    """Offline facility index lookup - microseconds, no network."""
+    for category in facility_categories(assessment):
+        results = facility_store.query(lat, lng, SEARCH_RADIUS_M, category)
+        if results:
+            return results
+    return []
+
+
+def _merge_with_places(local: list, places: list) -> list:
+    """Local facilities first, then Places results not already listed."""
+    seen = {p["name"].lower() for p in local}
+    extra = [p for p in places if (p.get("name") or "").lower() not in seen]
+    return (local + extra)[:10]
 
 
 def get_nearby_resources(responses: UserAssessmentInput, assessment: AssessmentScores):
     """Fetches raw data from Google Maps Places API (Nearby Search) based on detected issue type."""
 
     lat, lng = responses.latitude, responses.longitude
-    keyword = TYPE_MAP.get(assessment.issue_type, "mental health")
-    results = _places_nearby_search(lat, lng, keyword)
-    # Fallback: if no results with specific keyword, try broader terms
-    if not results and assessment.issue_type in (
-        "mental_health", "behavioral_addiction", "grief_loss", "relationship_family", "unknown"
-    ):
-        results = _places_nearby_search(lat, lng, "counseling")
-    if not results:
-        results = _places_nearby_search(lat, lng, "mental health")
-    return results
+    local = _local_facilities(lat, lng, assessment)
+    if len(local) >= FACILITY_MIN_RESULTS:
+        print(f"🗂️ Facility store served {len(local)} places")
+        return local
 
-def pick_best_resources(responses: UserAssessmentInput, assessment: AssessmentScores, raw_places: list):
-    """Uses Gemini to select the 3 most appropriate local results based on user story."""
-    if not raw_places:
+    results = []
+    for keyword in fallback_keywords(assessment):
+        results = _places_nearby_search(lat, lng, keyword)
+        if results:
+            break
+    return _merge_with_places(local, results)
+
+
+async def _first_acceptable(lat: float, lng: float, keywords: list, hedge_delay: float) -> list:
+    """
+    Speculative fallback chain: each broader keyword fires when the previous one comes back
+    empty or after hedge_delay seconds, whichever is first (0 = all at once). Results are
+    taken in keyword order so the most specific non-empty set wins; the rest are cancelled.
+    """
+    failed = [asyncio.Event() for _ in keywords]
+
+    async def attempt(i: int, keyword: str) -> list:
+        if i > 0:
+            try:
+                await asyncio.wait_for(failed[i - 1].wait(), timeout=hedge_delay)
+            except asyncio.TimeoutError:
+                pass
+        results = await _places_nearby_search_async(lat, lng, keyword)
+        if not results:
+            failed[i].set()
+        return results
+
+    tasks = [asyncio.create_task(attempt(i, kw)) for i, kw in enumerate(keywords)]
+    try:
+        for task in tasks:
+            results = await task
+            if results:
+                return results
         return []
+    finally:
+        for task in tasks:
+            task.cancel()
 
+
+async def get_nearby_resources_async(responses: UserAssessmentInput, assessment: AssessmentScores):
+    """Non-blocking variant of get_nearby_resources; PLACES_FALLBACK_MODE picks the strategy."""
+
+    lat, lng = responses.latitude, responses.longitude
+    local = _local_facilities(lat, lng, assessment)
+    if len(local) >= FACILITY_MIN_RESULTS:
+        print(f"🗂️ Facility store served {len(local)} places")
+        return local
+
+    keywords = fallback_keywords(assessment)
+    results = []
+    if PLACES_FALLBACK_MODE == "sequential":
+        for keyword in keywords:
+            results = await _places_nearby_search_async(lat, lng, keyword)
+            if results:
+                break
+    else:
+        hedge_delay = 0 if PLACES_FALLBACK_MODE == "parallel" else PLACES_HEDGE_DELAY_S
+        results = await _first_acceptable(lat, lng, keywords, hedge_delay)
+    return _merge_with_places(local, results)
+
+def _build_selection_prompt(responses: UserAssessmentInput, assessment: AssessmentScores, raw_places: list) -> str:
     # Simplify data for the LLM
     places_summary = []
     for i, p in enumerate(raw_places):
-        places_summary.append({
+        summary = {
             "index": i,
             "name": p.get("name"),
             "rating": p.get("rating"),
             "address": p.get("vicinity")
-        })
+        }
+        loc = p.get("geometry", {}).get("location", {})
+        if responses.latitude is not None and responses.longitude is not None and loc.get("lat") is not None:
+            summary["distance_km"] = round(haversine_m(responses.latitude, responses.longitude, loc["lat"], loc["lng"]) / 1000, 1)
+        # Extra attributes only the offline facility store knows about
+        for field in ("cost", "languages"):
+            if p.get(field):
+                summary[field] = p[field]
+        places_summary.append(summary)
 
-    # Prepare context
+    # Per-request payload; role, task and output format are SELECTION_PROMPT's system instruction
     data = responses.model_dump()
     data.pop("answer_constraints", None)
-    user_story = json.dumps(data, ensure_ascii=False)
-    user_assessment = json.dumps(assessment.model_dump(), ensure_ascii=False)
-
-    prompt = f"""
-    ### ROLE
-    You are a mental health clinical coordinator.
-
-    ### CONTEXT
-    User Story: "{user_story}"
-    User Assessment: "{user_assessment}"
-    User Constraints: {responses.answer_constraints}
-
-    ### AVAILABLE RESOURCES
-    {json.dumps(places_summary)}
-
-    ### TASK
-    1. Analyze the User Story and Constraints.
-    2. From the AVAILABLE RESOURCES, select the top 3 that best match the user's needs.
-    3. If a resource violates a constraint (e.g., costs money when user needs free), skip it.
-    4. For each selection, provide a brief "rationale."
-
-    ### OUTPUT FORMAT
-    Return ONLY a JSON array of objects.
-    Example: [{{"index": 0, "rationale": "Description here"}}]
-    """
+    return SELECTION_PROMPT.render(
+        user_story=data,
+        user_assessment=assessment.model_dump(),
+        user_constraints=responses.answer_constraints,
+        available_resources=places_summary,
+    )
+
+
+def _facility_entry(place: dict, rationale: str) -> dict:
+    geo = place.get("geometry", {})
+    loc = geo.get("location", {})
+    out = {
+        "name": place.get("name"),
+        "type": "Facility",
+        "description": rationale,
+        "data": place.get("vicinity")
+    }
+    if loc.get("lat") is not None and loc.get("lng") is not None:
+        out["latitude"] = loc["lat"]
+        out["longitude"] = loc["lng"]
+    return out
+
+
+def _parse_selections(text: str, raw_places: list) -> list:
+    selections = json.loads(text)
+    final_output = []
+
+    for item in selections:
+        idx = item.get("index")
+        if 0 <= idx < len(raw_places):
+            final_output.append(_facility_entry(raw_places[idx], item.get("rationale")))
+    return final_output
+
+
+def ranked_selection(responses: UserAssessmentInput, assessment: AssessmentScores, raw_places: list) -> list:
+    """Deterministic LLM-free top 3 with templated rationales."""
+    keyword = TYPE_MAP.get(assessment.issue_type, "mental health")
+    picks = rank_resources(responses, raw_places, k=3, issue_keyword=keyword)
+    return [_facility_entry(raw_places[i], why) for i, why in picks]
+
+
+def _selection_candidates(responses: UserAssessmentInput, assessment: AssessmentScores, raw_places: list) -> list:
+    """Candidates sent to Gemini - trimmed by the ranker in prefilter mode."""
+    if RESOURCE_SELECTION_MODE != "prefilter" or len(raw_places) <= RANKER_PREFILTER_K:
+        return raw_places
+    keyword = TYPE_MAP.get(assessment.issue_type, "mental health")
+    return [raw_places[i] for i in top_indices(responses, raw_places, RANKER_PREFILTER_K, keyword)]
+
+
+def pick_best_resources(responses: UserAssessmentInput, assessment: AssessmentScores, raw_places: list):
+    """Uses Gemini to select the 3 most appropriate local results based on user story."""
+    if not raw_places:
+        return []
+    if RESOURCE_SELECTION_MODE == "ranker":
+        return ranked_selection(responses, assessment, raw_places)
+
+    candidates = _selection_candidates(responses, assessment, raw_places)
+    prompt = _build_selection_prompt(responses, assessment, candidates)
 
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config={'response_mime_type': 'application/json'}
-        )
-
-        selections = json.loads(response.text)
-        final_output = []
-
-        for item in selections:
-            idx = item.get("index")
-            if 0 <= idx < len(raw_places):
-                place = raw_places[idx]
-                geo = place.get("geometry", {})
-                loc = geo.get("location", {})
-                out = {
-                    "name": place.get("name"),
-                    "type": "Facility",
-                    "description": item.get("rationale"),
-                    "data": place.get("vicinity")
-                }
-                if loc.get("lat") is not None and loc.get("lng") is not None:
-                    out["latitude"] = loc["lat"]
-                    out["longitude"] = loc["lng"]
-                final_output.append(out)
-        return final_output
+        return _parse_selections(llm_gateway.generate(prompt, template=SELECTION_PROMPT), candidates)
     except Exception as e:
         print(f"Gemini Selection Error: {e}")
+        return ranked_selection(responses, assessment, candidates)
+
+
+async def pick_best_resources_async(responses: UserAssessmentInput, assessment: AssessmentScores, raw_places: list):
+    """Non-blocking variant of pick_best_resources."""
+    if not raw_places:
         return []
+    if RESOURCE_SELECTION_MODE == "ranker":
+        return ranked_selection(responses, assessment, raw_places)
+
+    candidates = _selection_candidates(responses, assessment, raw_places)
+    prompt = _build_selection_prompt(responses, assessment, candidates)
+
+    try:
+        return _parse_selections(await llm_gateway.agenerate(prompt, template=SELECTION_PROMPT), candidates)
+    except Exception as e:
+        print(f"Gemini Selection Error: {e}")
+        return ranked_selection(responses, assessment, candidates)
@@ -1,24 +1,42 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import config  # noqa: F401 - loads .env once, before any module reads its settings
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from exercisesToolbox import generate_exercise_toolbox
-from sqlmodel import Session, select, create_engine, SQLModel
+from sqlmodel import select
+from sqlalchemy import delete, update
 from models import User, Assessment
-from schemas import UserAssessmentInput, FinalPlan, AssessmentScores, RegisterRequest
-from classify import classify_user_text
-from locationsFinder import get_nearby_resources, pick_best_resources
-from auth import get_password_hash, create_access_token, verify_password, get_current_user
+from database import new_session, db_stats
+from assessmentWriter import assessment_writer, build_assessment
+from schemas import UserAssessmentInput, FinalPlan, RegisterRequest, PasswordChangeRequest, AssessmentPage
+from archive import delete_user_rows
+from history import history_page, assessment_detail, HISTORY_PAGE_SIZE, HISTORY_PAGE_MAX
+from pipeline import build_plan, plan_events
+from locationsFinder import generate_resource_list
+from placesCache import places_cache
+from classifyCache import classification_cache
+from localClassifier import local_classifier
+from idempotency import plan_flight, request_key, intake_digest, IdempotencyConflict, IDEMPOTENCY_HEADER
+from llmGateway import llm_gateway
+from circuitBreaker import breaker_stats
+from contextlib import asynccontextmanager
+from auth import issue_token, get_current_principal, get_current_user, invalidate_user
+from passwordHasher import password_hasher, HashingBusy
+from authCache import Principal, principal_cache, revocations
 from fastapi.security import OAuth2PasswordRequestForm
-import os
-from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+import json
+from typing import Optional
+import lifecycle
 
-# Load environment variables
-load_dotenv()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients, DB schema and optional warm-up (see lifecycle.py)
+    await lifecycle.startup()
+    yield
+    await lifecycle.shutdown()
 
-# Database Setup (SQLite for demo)
-engine = create_engine("sqlite:///database.db")
-SQLModel.metadata.create_all(engine)
-
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS Configuration - Allow frontend to connect
 app.add_middleware(
@@ -29,150 +47,227 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+@app.get("/api/health")
+def health():
+    """Liveness plus upstream cache counters."""
+    return {
+        "status": "ok",
+        "llm": llm_gateway.stats(),
+        "breakers": breaker_stats(),
+        "places_cache": places_cache.stats(),
+        "classification_cache": classification_cache.stats(),
+        "local_classifier": local_classifier.stats(),
+        "plan_requests": plan_flight.stats(),
+        "database": db_stats(),
+        "assessment_writer": assessment_writer.stats(),
+        "auth_cache": principal_cache.stats(),
+        "startup": lifecycle.startup_stats(),
+        "password_hashing": password_hasher.stats(),
+    }
+
+HASHING_BUSY = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many sign-in attempts right now, please retry shortly",
+    headers={"Retry-After": "1"},
+)
+
+async def verify_or_busy(password: str, hashed: str):
+    try:
+        return await password_hasher.verify(password, hashed)
+    except HashingBusy:
+        raise HASHING_BUSY
+
+async def hash_or_busy(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusy:
+        raise HASHING_BUSY
+
 @app.post("/api/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    with Session(engine) as session:
-        # 1. Find User
-        user = session.exec(select(User).where(User.email == form_data.username)).first()
-        
-        # 2. Validate Password
-        if not user or not verify_password(form_data.password, user.hashed_password):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect email or password",
-                headers={"WWW-Authenticate": "Bearer"},
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    # 1. Find User (the session closes before hashing, so a login burst can't tie up the DB pool)
+    async with new_session() as session:
+        user = (await session.exec(select(User).where(User.email == form_data.username))).first()
+
+    # 2. Validate Password (on the dedicated bcrypt pool)
+    ok, new_hash = await verify_or_busy(form_data.password, user.hashed_password) if user else (False, None)
+    if not ok:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Stored with an outdated BCRYPT_ROUNDS - upgrade it now that we have the plain password,
+    # unless the password changed while we were hashing
+    if new_hash:
+        async with new_session() as session:
+            await session.execute(
+                update(User).where(User.id == user.id, User.hashed_password == user.hashed_password)
+                .values(hashed_password=new_hash)
             )
-            
-        # 3. Generate Token
-        access_token = create_access_token(data={"sub": user.email})
-        return {"access_token": access_token, "token_type": "bearer"}
+            await session.commit()
+
+    # 3. Generate Token
+    access_token = issue_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/register")
-def register(request: RegisterRequest):
-    with Session(engine) as session:
-        existing_user = session.exec(select(User).where(User.email == request.email)).first()
+async def register(request: RegisterRequest):
+    hashed_password = await hash_or_busy(request.password)
+    async with new_session() as session:
+        existing_user = (await session.exec(select(User).where(User.email == request.email))).first()
         if existing_user:
             raise HTTPException(status_code=400, detail="Email taken")
 
-        new_user = User(
-            email=request.email,
-            hashed_password=get_password_hash(request.password)
-        )
+        new_user = User(email=request.email, hashed_password=hashed_password)
         session.add(new_user)
-        session.commit()
-        session.refresh(new_user)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent registration for the same email
+            raise HTTPException(status_code=400, detail="Email taken")
+
+    access_token = issue_token(new_user)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@app.post("/api/me/password")
+async def change_password(request: PasswordChangeRequest, current_user: User = Depends(get_current_user)):
+    """Sets a new password; every token issued before now stops working. Returns a fresh token."""
+    ok, _ = await verify_or_busy(request.current_password, current_user.hashed_password)
+    if not ok:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect password")
+
+    hashed_password = await hash_or_busy(request.new_password)
+    async with new_session() as session:
+        user = await session.get(User, current_user.id)
+        user.hashed_password = hashed_password
+        session.add(user)
+        await revocations.revoke(session, user.id)
+        await session.commit()
+    invalidate_user(current_user.id)
 
-        access_token = create_access_token(data={"sub": new_user.email})
-        return {"access_token": access_token, "token_type": "bearer"}
+    access_token = issue_token(current_user)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@app.delete("/api/me")
+async def delete_account(current_user: Principal = Depends(get_current_principal)):
+    """Deletes the account and all of its assessments, including archived ones."""
+    await assessment_writer.flush(current_user.id)
+    async with new_session() as session:
+        await session.execute(delete(Assessment).where(Assessment.user_id == current_user.id))
+        user = await session.get(User, current_user.id)
+        if user is not None:
+            await session.delete(user)
+        await revocations.revoke(session, current_user.id)
+        await session.commit()
+    invalidate_user(current_user.id)
+    await delete_user_rows(current_user.id)
+    # Plan components only this account used are left to the offline `planStore.py gc` sweep
+    return {"deleted": True}
 
 # --- PROTECTED ROUTE EXAMPLE ---
 # Only accessible if the request has a valid Bearer token
-@app.get("/api/me/assessments")
-def read_my_assessments(current_user: User = Depends(get_current_user)):
+@app.get("/api/me/assessments", response_model=AssessmentPage)
+async def read_my_assessments(
+    cursor: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_PAGE_MAX),
+    current_user: Principal = Depends(get_current_principal),
+):
     """
-    Returns all past assessments for the currently logged-in user.
+    One page of the logged-in user's past assessments, newest first (summary fields only).
+    Pass next_cursor back as ?cursor= for older ones; details come from /api/me/assessments/{id}.
     """
-    with Session(engine) as session:
-        assessments = session.exec(
-            select(Assessment)
-            .where(Assessment.user_id == current_user.id)
-            .order_by(Assessment.created_at.desc())
-        ).all()
+    # Read-your-writes: commit this user's queued rows first
+    await assessment_writer.flush(current_user.id)
+    try:
+        history, next_cursor = await history_page(current_user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    return {
-        "email": current_user.email,
-        "history": assessments
-    }
+    return AssessmentPage(email=current_user.email, history=history, next_cursor=next_cursor)
+
+@app.get("/api/me/assessments/{assessment_id}")
+async def read_my_assessment(assessment_id: int, current_user: Principal = Depends(get_current_principal)):
+    """Full record of one past assessment, including the stored plan."""
+    await assessment_writer.flush(current_user.id)
+    assessment = await assessment_detail(current_user.id, assessment_id)
+    if assessment is None:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    return assessment
+
+async def save_assessment(user_id: int, data: UserAssessmentInput, plan: FinalPlan):
+    """Queues one assessment row for the write-behind writer (see assessmentWriter.py)."""
+    await assessment_writer.submit(build_assessment(user_id, data, plan))
 
 # --- STEP A: The "Magic" Endpoint (Login Required) ---
 @app.post("/api/generate-plan", response_model=FinalPlan)
 async def generate_plan(
     data: UserAssessmentInput,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
 ):
-    # Step 1: Get classification scores from Gemini (includes personalized_note)
-    scores_dict = classify_user_text(data)
-    scores = AssessmentScores(**scores_dict)
-    
-    # Step 2: Generate static resource list (helplines, crisis lines, etc.)
-    from locationsFinder import generate_resource_list
-    static_resources = generate_resource_list(scores)
-    print(f"📞 Static resources count: {len(static_resources)}")
-    
-    # Step 3: Get nearby resources from Google Maps (if location available)
-    raw_places = []
-    if data.latitude and data.longitude:
-        print(f"📍 Location provided: {data.latitude}, {data.longitude}")
-        raw_places = get_nearby_resources(data, scores)
-        print(f"🗺️ Google Maps returned {len(raw_places)} places")
-    else:
-        print(f"⚠️ No location provided - skipping Google Maps search")
-    
-    # Step 4: Use LLM to pick the best local resources based on user needs
-    local_resources = []
-    if raw_places:
-        local_resources = pick_best_resources(data, scores, raw_places)
-        print(f"🤖 Gemini selected {len(local_resources)} local resources")
-    else:
-        print(f"⚠️ No raw places to filter - skipping Gemini selection")
-    
-    # Step 5: Combine static + local resources
-    pathway = static_resources + local_resources
-    
-    # Debug: Print what we're sending
-    print(f"\n{'='*60}")
-    print(f"📤 SENDING TO FRONTEND:")
-    print(f"{'='*60}")
-    print(f"Issue Type: {scores.issue_type}")
-    print(f"Severity: {scores.severity_score}/4")
-    print(f"Urgency: {scores.urgency}")
-    print(f"Static resources: {len(static_resources)}")
-    print(f"Local resources: {len(local_resources)}")
-    print(f"Total Resources: {len(pathway)}")
-    for i, res in enumerate(pathway[:5], 1):
-        print(f"  {i}. {res.get('name')} ({res.get('type')}) - {res.get('data')}")
-    if len(pathway) > 5:
-        print(f"  ... and {len(pathway) - 5} more")
-    print(f"{'='*60}\n")
-
-    exercises = generate_exercise_toolbox(scores)
-    print(f"🧘 Generated {len(exercises)} exercises")
-    
-    # Return complete plan (personalized_note is in scores)
-    plan = FinalPlan(
-        scores=scores,
-        recommended_pathway=pathway,
-        exercises=exercises
-    )
+    async def compute():
+        # Classify, then fetch local resources and exercises concurrently (see pipeline.py)
+        plan = await build_plan(data, current_user.id)
+        await save_assessment(current_user.id, data, plan)
+        return plan
 
-    with Session(engine) as session:
-        new_assessment = Assessment(
-            user_id=current_user.id,
-
-            # The Raw Text - Matches UserAssessmentInput
-            raw_primary_concern=data.primary_concern,
-            raw_distress=data.answer_distress,
-            raw_functioning=data.answer_functioning,
-            raw_urgency=data.answer_urgency,
-            raw_safety=data.answer_safety,
-            raw_constraints=data.answer_constraints,
-            latitude=data.latitude,
-            longitude=data.longitude,
-
-            # The Calculated Scores - Matches AssessmentScores
-            issue_type=scores.issue_type,
-            urgency=scores.urgency,
-            severity_score=scores.severity_score,
-            needs_immediate_resources=scores.needs_immediate_resources,
-            confidence=scores.confidence,
-            reasoning=scores.reasoning,
-            personalized_note=scores.personalized_note,
-
-            # The Full Recommendation
-            full_plan_json=plan.dict()
-        )
-        session.add(new_assessment)
-        session.commit()
+    # Retries (same Idempotency-Key, or same user + intake) share one run and one saved row
+    key = request_key(current_user.id, data, request.headers.get(IDEMPOTENCY_HEADER))
+    try:
+        plan, outcome = await plan_flight.run(key, compute, intake_digest(data))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if outcome != "computed":
+        print(f"🔁 generate-plan {outcome} for user {current_user.id}")
+        response.headers["Idempotent-Replayed"] = "true"
 
     return plan
 
+# --- STEP A (streaming): same pipeline, one event per finished stage ---
+def encode_event(event: dict, sse: bool) -> str:
+    payload = json.dumps(jsonable_encoder(event), ensure_ascii=False)
+    if sse:
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+@app.post("/api/generate-plan/stream")
+async def generate_plan_stream(
+    data: UserAssessmentInput,
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Streams the plan as NDJSON (or SSE when the client accepts text/event-stream).
+    The scores + static safety net (incl. 9-1-1 / 9-8-8) arrive right after classification;
+    local facilities and exercises follow as they finish, then a final "complete" event.
+    """
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    key = request_key(current_user.id, data, request.headers.get(IDEMPOTENCY_HEADER))
+    body = intake_digest(data)
+    try:
+        plan_flight.check(key, body)  # before the 200 goes out
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def event_stream():
+        # A retry of a finished request replays the stored plan without re-running anything
+        stored = plan_flight.replay(key)
+        if stored is not None:
+            static_resources = generate_resource_list(stored.scores)
+            yield encode_event({"event": "scores", "scores": stored.scores, "static_resources": static_resources}, sse)
+            yield encode_event({"event": "complete", "plan": stored}, sse)
+            return
+        async for event in plan_events(data, current_user.id):
+            yield encode_event(event, sse)
+            if event["event"] == "complete":
+                await save_assessment(current_user.id, data, event["plan"])
+                plan_flight.remember(key, event["plan"], body)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,6 @@
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship, Column
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Index, LargeBinary
 from datetime import datetime
 
 class User(SQLModel, table=True):
@@ -11,6 +11,12 @@ class User(SQLModel, table=True):
     assessments: List["Assessment"] = Relationship(back_populates="user")
 
 class Assessment(SQLModel, table=True):
+    # Covers the history listing: the user's rows in (created_at, id) order plus the
+    # summary columns, so a page is read from the index without touching the wide rows
+    __table_args__ = (
+        Index("ix_assessment_history", "user_id", "created_at", "id", "issue_type", "urgency", "severity_score"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -33,8 +39,33 @@ class Assessment(SQLModel, table=True):
     confidence: float
     reasoning: str
     personalized_note: str
+    # Tier that produced the scores; the local classifier trains on "gemini" rows only
+    classification_source: str = Field(default="unknown", sa_column_kwargs={"server_default": "unknown"})
     
     # 3. The Full Output (Stored as JSON for flexibility)
     full_plan_json: dict = Field(default={}, sa_column=Column(JSON)) 
 
-    user: Optional[User] = Relationship(back_populates="assessments")
\ No newline at end of file
+    user: Optional[User] = Relationship(back_populates="assessments")
+
+class PlanBlob(SQLModel, table=True):
+    # One shared copy of a plan component (a resource, an exercise list), keyed by the
+    # sha256 of its canonical JSON; Assessment.full_plan_json keeps only the hashes
+    hash: str = Field(primary_key=True, max_length=64)
+    codec: str = "raw"  # "raw" or "zlib"
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    size: int  # uncompressed bytes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Bumped whenever a new plan references the blob; gc never sweeps blobs touched after its mark
+    last_used_at: Optional[datetime] = None
+
+class ArchivedMonth(SQLModel, table=True):
+    # Which monthly archive partitions hold rows of a user (archive.py), so history
+    # reads only open those - a user who was never archived opens none
+    user_id: int = Field(primary_key=True)
+    month: str = Field(primary_key=True, max_length=7)  # "YYYY-MM"
+
+class TokenRevocation(SQLModel, table=True):
+    # Tokens for this user issued before revoked_before (epoch time) are rejected;
+    # written on password change and account deletion
+    user_id: int = Field(primary_key=True)
+    revoked_before: float = Field(index=True)  # incremental refresh and pruning range on it
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from passlib.context import CryptContext
+
+# --- Password hashing on its own bounded pool ---
+# bcrypt is deliberately slow CPU work. Running it in FastAPI's shared threadpool lets a
+# login burst starve every other endpoint, so it gets a dedicated pool of HASH_WORKERS
+# threads (bcrypt releases the GIL while hashing). At most HASH_MAX_WAITING calls may
+# queue for a worker; beyond that, callers get HashingBusy (503) straight away instead
+# of piling up behind a credential-stuffing burst.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_WAITING = int(os.getenv("HASH_MAX_WAITING", "32"))
+
+# Hashes with a different cost factor still verify, and are flagged for rehash on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class HashingBusy(Exception):
+    """Too many password checks already waiting for a worker."""
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, max_waiting: int = HASH_MAX_WAITING, context: CryptContext = pwd_context):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.context = context
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_s = 0.0
+        self.work_s = 0.0
+
+    async def _submit(self, fn: Callable, *args):
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise HashingBusy(f"{self.waiting} password checks already queued")
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+        queued_at = time.perf_counter()
+
+        def work():
+            started = time.perf_counter()
+            with self._lock:
+                self.waiting -= 1
+                self.running += 1
+                self.wait_s += started - queued_at
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.work_s += time.perf_counter() - started
+
+        future = self._executor.submit(work)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancelled():  # never reached a worker
+                with self._lock:
+                    self.waiting -= 1
+            raise
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(matches, new_hash). new_hash is set when the stored hash uses an outdated cost factor."""
+        ok, new_hash = await self._submit(self.context.verify_and_update, password, hashed)
+        if ok and new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return ok, new_hash
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            done = self.completed
+            return {
+                "workers": self.workers,
+                "rounds": BCRYPT_ROUNDS,
+                "running": self.running,
+                "waiting": self.waiting,
+                "peak_waiting": self.peak_waiting,
+                "completed": done,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "mean_wait_ms": round(self.wait_s / done * 1000, 1) if done else 0.0,
+                "mean_hash_ms": round(self.work_s / done * 1000, 1) if done else 0.0,
+            }
+
+
+password_hasher = PasswordHasher()
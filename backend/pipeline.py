@@ -0,0 +1,165 @@
+import asyncio
+from schemas import UserAssessmentInput, AssessmentScores, FinalPlan
+from typing import Optional
+from classify import classify_user_text_async, classify_with_gemini_async, classify_with_toolbox_async, use_combined_call, UNAVAILABLE_SCORES
+from crisisDetector import detect_crisis, merge_crisis_enrichment
+from locationsFinder import generate_resource_list, get_nearby_resources_async, pick_best_resources_async, ranked_selection
+from exercisesToolbox import generate_exercise_toolbox_async, fallback_toolbox
+from deadline import Deadline
+from prompts import start_prompt_trace
+
+# --- Async execution model for /api/generate-plan ---
+# classify ──┬── places search ── Gemini selection ──┬── FinalPlan
+#            └── exercise toolbox ───────────────────┘
+# Everything after classification only needs the scores, so the two branches
+# run concurrently and wall-clock time is classify + max(places→pick, exercises).
+# plan_events() exposes the same pipeline stage by stage for the streaming endpoint.
+# Every stage runs under a slice of one per-request Deadline (see deadline.py) and
+# falls back to a cheap answer instead of making the user wait on a slow upstream.
+
+TIMED_OUT_SCORES = {**UNAVAILABLE_SCORES, "reasoning": "Classification timed out - default routing applied."}
+
+
+async def find_local_resources(data: UserAssessmentInput, scores: AssessmentScores, deadline: Optional[Deadline] = None) -> list:
+    """Places search followed by the Gemini pick. Empty when no location was shared."""
+    deadline = deadline or Deadline()
+    if not (data.latitude and data.longitude):
+        print(f"⚠️ No location provided - skipping Google Maps search")
+        return []
+
+    print(f"📍 Location provided: {data.latitude}, {data.longitude}")
+    # Out of time -> static resources only
+    raw_places = await deadline.run("places", get_nearby_resources_async(data, scores), lambda: [])
+    print(f"🗺️ Google Maps returned {len(raw_places)} places")
+
+    if not raw_places:
+        print(f"⚠️ No raw places to filter - skipping Gemini selection")
+        return []
+
+    # Out of time -> the deterministic ranker's top 3 instead of Gemini's
+    local_resources = await deadline.run(
+        "selection",
+        pick_best_resources_async(data, scores, raw_places),
+        lambda: ranked_selection(data, scores, raw_places),
+    )
+    print(f"🤖 Gemini selected {len(local_resources)} local resources")
+    return local_resources
+
+
+def log_plan(plan: FinalPlan, static_count: int, local_count: int):
+    """Debug summary of what is about to be sent to the frontend."""
+    scores = plan.scores
+    pathway = plan.recommended_pathway
+    print(f"\n{'='*60}")
+    print(f"📤 SENDING TO FRONTEND:")
+    print(f"{'='*60}")
+    print(f"Issue Type: {scores.issue_type}")
+    print(f"Severity: {scores.severity_score}/4")
+    print(f"Urgency: {scores.urgency}")
+    print(f"Static resources: {static_count}")
+    print(f"Local resources: {local_count}")
+    print(f"Total Resources: {len(pathway)}")
+    for i, res in enumerate(pathway[:5], 1):
+        print(f"  {i}. {res.get('name')} ({res.get('type')}) - {res.get('data')}")
+    if len(pathway) > 5:
+        print(f"  ... and {len(pathway) - 5} more")
+    print(f"🧘 Generated {len(plan.exercises)} exercises")
+    if plan.degraded_stages:
+        print(f"⏱️ Degraded stages: {', '.join(plan.degraded_stages)}")
+    print(f"{'='*60}\n")
+
+
+async def _ready(value):
+    return value
+
+
+async def plan_events(data: UserAssessmentInput, bucket_key, deadline: Optional[Deadline] = None, enrich: bool = True):
+    """
+    Runs the pipeline and yields each stage as soon as it finishes:
+      scores          -> AssessmentScores + static safety net (first useful content)
+      scores_enriched -> crisis fast-path only: same routing, LLM-written reasoning/note
+      local_resources -> Gemini-picked nearby facilities
+      exercises       -> coping toolbox
+      complete        -> the assembled FinalPlan (degraded_stages lists any fallbacks used)
+    bucket_key (the user id) picks the A/B arm: the combined arm asks Gemini for scores and
+    exercises in one call (see COMBINED_CALL_RATIO).
+    enrich=False skips scores_enriched, so nothing waits on the crisis wording call.
+    """
+    deadline = deadline or Deadline()
+    prompt_versions = start_prompt_trace()
+    combined = use_combined_call(bucket_key)
+    combined_exercises = None
+    # Step 1: Classification gates everything else. Explicit crisis language is
+    # answered deterministically and Gemini only enriches the wording in the background.
+    crisis = detect_crisis(data)
+    if crisis:
+        print(f"🚨 Crisis fast-path triggered")
+        scores = AssessmentScores(**crisis)
+    elif combined:
+        result, combined_exercises = await deadline.run(
+            "classify", classify_with_toolbox_async(data), lambda: (dict(TIMED_OUT_SCORES), None)
+        )
+        scores = AssessmentScores(**result)
+    else:
+        scores = AssessmentScores(**await deadline.run(
+            "classify", classify_user_text_async(data), lambda: dict(TIMED_OUT_SCORES)
+        ))
+
+    # Step 2: Static safety net is pure CPU and available immediately
+    static_resources = generate_resource_list(scores)
+    print(f"📞 Static resources count: {len(static_resources)}")
+    yield {"event": "scores", "scores": scores, "static_resources": static_resources}
+
+    # Step 3: Local facilities and exercises only depend on the scores
+    # (in combined mode the exercises usually came back with them)
+    if combined_exercises:
+        exercises = _ready(combined_exercises)
+    else:
+        exercises = deadline.run("exercises", generate_exercise_toolbox_async(scores), lambda: fallback_toolbox(scores))
+    tasks = {
+        asyncio.create_task(find_local_resources(data, scores, deadline)): "local_resources",
+        asyncio.create_task(exercises): "exercises",
+    }
+    if crisis and enrich:
+        # Nice-to-have wording only: dropped silently if it doesn't fit in the deadline
+        enrichment = asyncio.wait_for(classify_with_gemini_async(data), timeout=deadline.remaining())
+        tasks[asyncio.create_task(enrichment)] = "scores_enriched"
+    results = {}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                if name == "scores_enriched":
+                    if task.exception() is not None:
+                        print(f"⏱️ Crisis enrichment skipped ({type(task.exception()).__name__})")
+                        continue
+                    scores = AssessmentScores(**merge_crisis_enrichment(crisis, task.result()))
+                    yield {"event": name, "scores": scores}
+                    continue
+                results[name] = task.result()
+                yield {"event": name, name: results[name]}
+    finally:
+        # Client went away mid-stream - don't leave upstream calls running
+        for task in tasks:
+            task.cancel()
+
+    plan = FinalPlan(
+        scores=scores,
+        recommended_pathway=static_resources + results["local_resources"],
+        exercises=results["exercises"],
+        degraded_stages=deadline.degraded,
+        prompt_versions=dict(prompt_versions),
+    )
+    log_plan(plan, len(static_resources), len(results["local_resources"]))
+    yield {"event": "complete", "plan": plan}
+
+
+async def build_plan(data: UserAssessmentInput, bucket_key) -> FinalPlan:
+    """Runs the full triage pipeline without blocking the event loop."""
+    # The crisis wording enrichment only pays off on the stream; a one-shot response
+    # shouldn't wait for it
+    async for event in plan_events(data, bucket_key, enrich=False):
+        if event["event"] == "complete":
+            return event["plan"]
@@ -0,0 +1,156 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# --- Geo-tiled cache for Places Nearby Search ---
+# Requests are bucketed by geohash cell + keyword. A miss fetches a superset for the
+# whole cell (cell centre, radius widened by the cell's half-diagonal), so every
+# coordinate inside the cell can be answered from it after re-filtering by true distance.
+
+PLACES_CACHE_TTL_S = float(os.getenv("PLACES_CACHE_TTL_S", "3600"))
+PLACES_CACHE_MAX_ENTRIES = int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "2048"))
+PLACES_CACHE_PRECISION = int(os.getenv("PLACES_CACHE_PRECISION", "6"))  # ~1.2km x 0.6km cells
+
+# Only the fields the backend reads are kept, which bounds memory per entry
+CACHED_PLACE_FIELDS = (
+    "place_id", "name", "vicinity", "geometry", "rating", "user_ratings_total",
+    "opening_hours", "types", "business_status", "price_level",
+)
+
+EARTH_RADIUS_M = 6371000.0
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = PLACES_CACHE_PRECISION) -> str:
+    """Standard base32 geohash of a coordinate."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(cell: str) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in cell:
+        idx = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (idx >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def cell_query(cell: str, radius_m: float) -> Tuple[float, float, float]:
+    """Centre of the cell and a radius that covers radius_m around any point inside it."""
+    min_lat, max_lat, min_lng, max_lng = geohash_bounds(cell)
+    c_lat, c_lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    half_diagonal = haversine_m(c_lat, c_lng, max_lat, max_lng)
+    return c_lat, c_lng, radius_m + half_diagonal
+
+
+def within_radius(places: list, lat: float, lng: float, radius_m: float) -> list:
+    """Keeps places whose true distance from (lat, lng) is within radius_m."""
+    kept = []
+    for p in places:
+        loc = p.get("geometry", {}).get("location", {})
+        if loc.get("lat") is None or loc.get("lng") is None:
+            continue
+        if haversine_m(lat, lng, loc["lat"], loc["lng"]) <= radius_m:
+            kept.append(p)
+    return kept
+
+
+def slim_place(place: dict) -> dict:
+    return {k: place[k] for k in CACHED_PLACE_FIELDS if k in place}
+
+
+class PlacesCache:
+    """Thread-safe TTL + LRU cache of Places results keyed by (geohash cell, keyword)."""
+
+    def __init__(self, max_entries: int = PLACES_CACHE_MAX_ENTRIES, ttl_s: float = PLACES_CACHE_TTL_S, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, cell: str, keyword: str) -> Optional[list]:
+        key = (cell, keyword.lower())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, places = entry
+            if self.clock() - stored_at > self.ttl_s:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return places
+
+    def put(self, cell: str, keyword: str, places: list):
+        key = (cell, keyword.lower())
+        with self._lock:
+            self._entries[key] = (self.clock(), [slim_place(p) for p in places])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+places_cache = PlacesCache()
@@ -0,0 +1,279 @@
+"""
+Content-addressed storage for Assessment.full_plan_json.
+
+The shared parts of a plan (each recommended resource, the exercise list) are stored once
+in PlanBlob under the sha256 of their canonical JSON; the row keeps a small manifest with
+the hashes plus the per-user parts (scores, degraded stages, prompt versions).
+
+Convert rows written before this existed, then reclaim the space:
+    python planStore.py migrate
+    python planStore.py stats
+
+Blobs nothing references any more (rows archived or deleted with their account) are
+removed by an offline mark-and-sweep pass - run it from cron; the archive job runs it too:
+    python planStore.py gc
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, text
+from sqlmodel import select
+import database
+from models import Assessment, PlanBlob
+
+MANIFEST_VERSION = 1
+MANIFEST_KEY = "_manifest"  # marks a stored manifest; legacy rows hold the plan itself
+PLAN_BLOB_COMPRESS_MIN = int(os.getenv("PLAN_BLOB_COMPRESS_MIN", "256"))
+PLAN_BLOB_CACHE_ENTRIES = int(os.getenv("PLAN_BLOB_CACHE_ENTRIES", "2048"))
+# Blobs touched this recently are never swept. store_plans stamps last_used_at before the
+# writer commits the row that references the blob, so this must be far above commit latency.
+PLAN_BLOB_GC_GRACE_S = float(os.getenv("PLAN_BLOB_GC_GRACE_S", "3600"))
+
+
+def canonical_json(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def encode_blob(value) -> Tuple[str, str, bytes, int]:
+    """(hash, codec, data, size). zlib only when it actually saves space."""
+    raw = canonical_json(value)
+    digest = hashlib.sha256(raw).hexdigest()
+    if len(raw) >= PLAN_BLOB_COMPRESS_MIN:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return digest, "zlib", packed, len(raw)
+    return digest, "raw", raw, len(raw)
+
+
+def decode_blob(codec: str, data: bytes):
+    return json.loads(zlib.decompress(data) if codec == "zlib" else data)
+
+
+def is_manifest(stored) -> bool:
+    return isinstance(stored, dict) and MANIFEST_KEY in stored
+
+
+def split_plan(plan: Dict) -> Tuple[Dict, Dict[str, Tuple[str, bytes, int]]]:
+    """(manifest, {hash: (codec, data, size)}) for one FinalPlan dict."""
+    blobs = {}
+
+    def ref(value) -> str:
+        digest, codec, data, size = encode_blob(value)
+        blobs[digest] = (codec, data, size)
+        return digest
+
+    manifest = {key: value for key, value in plan.items() if key not in ("recommended_pathway", "exercises")}
+    manifest[MANIFEST_KEY] = MANIFEST_VERSION
+    # Resources one by one: the static helplines repeat across plans even when the mix differs
+    manifest["recommended_pathway"] = [ref(item) for item in plan.get("recommended_pathway", [])]
+    manifest["exercises"] = ref(plan.get("exercises", []))
+    return manifest, blobs
+
+
+def join_plan(manifest: Dict, blobs: Dict[str, object]) -> Dict:
+    """Missing blobs (swept by a GC that raced a writer) are left out rather than failing the read."""
+    plan = {key: value for key, value in manifest.items() if key != MANIFEST_KEY}
+    missing = [digest for digest in _manifest_hashes(manifest) if digest not in blobs]
+    if missing:
+        print(f"⚠️ Plan references {len(missing)} missing blob(s) - returning it without them")
+    plan["recommended_pathway"] = [blobs[digest] for digest in manifest["recommended_pathway"] if digest in blobs]
+    plan["exercises"] = blobs.get(manifest["exercises"], [])
+    return plan
+
+
+def _manifest_hashes(manifest: Dict) -> List[str]:
+    return list(manifest["recommended_pathway"]) + [manifest["exercises"]]
+
+
+class BlobCache:
+    """Decoded blobs are immutable, so hot ones (the static helplines) stay in memory."""
+
+    def __init__(self, max_entries: int = PLAN_BLOB_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, object]" = OrderedDict()
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, object]:
+        found = {}
+        with self._lock:
+            for digest in hashes:
+                if digest in self._items:
+                    self._items.move_to_end(digest)
+                    found[digest] = self._items[digest]
+        return found
+
+    def put(self, digest: str, value):
+        with self._lock:
+            self._items[digest] = value
+            self._items.move_to_end(digest)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard(self, hashes: Iterable[str]):
+        with self._lock:
+            for digest in hashes:
+                self._items.pop(digest, None)
+
+
+blob_cache = BlobCache()
+
+
+def _upsert(dialect: str, values: List[Dict]):
+    """INSERT ... ON CONFLICT - two writers may store the same blob; an existing one is just touched."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(PlanBlob).values(values)
+    return stmt.on_conflict_do_update(index_elements=["hash"], set_={"last_used_at": stmt.excluded.last_used_at})
+
+
+async def store_plans(session, plans: List[Dict]) -> List[Dict]:
+    """Writes the blobs of several plans (inside the caller's transaction); returns their manifests."""
+    manifests, blobs = [], {}
+    for plan in plans:
+        manifest, plan_blobs = split_plan(plan)
+        manifests.append(manifest)
+        blobs.update(plan_blobs)
+    if blobs:
+        now = datetime.utcnow()
+        await session.execute(_upsert(database.engine.dialect.name, [
+            {"hash": digest, "codec": codec, "data": data, "size": size, "created_at": now, "last_used_at": now}
+            for digest, (codec, data, size) in blobs.items()
+        ]))
+    return manifests
+
+
+def plan_hashes(stored_plans: Iterable[Dict]) -> Set[str]:
+    """Blob hashes referenced by stored full_plan_json values (legacy inline plans have none)."""
+    return {digest for stored in stored_plans if is_manifest(stored) for digest in _manifest_hashes(stored)}
+
+
+async def load_plans(session, stored_plans: List[Dict]) -> List[Dict]:
+    """Rebuilds full plans from manifests; legacy (inline) plans pass through unchanged."""
+    wanted = plan_hashes(stored_plans)
+    blobs = blob_cache.get_many(wanted)
+    missing = wanted - blobs.keys()
+    if missing:
+        rows = (await session.exec(select(PlanBlob).where(PlanBlob.hash.in_(missing)))).all()
+        for row in rows:
+            blobs[row.hash] = decode_blob(row.codec, row.data)
+            blob_cache.put(row.hash, blobs[row.hash])
+    return [join_plan(stored, blobs) if is_manifest(stored) else stored for stored in stored_plans]
+
+
+async def load_plan(session, stored: Dict) -> Dict:
+    return (await load_plans(session, [stored]))[0]
+
+
+async def migrate(batch_size: int = 200) -> int:
+    """Rewrites inline full_plan_json rows as manifests. Safe to re-run."""
+    converted, last_id = 0, 0
+    while True:
+        async with database.new_session() as session:
+            rows = (await session.exec(
+                select(Assessment).where(Assessment.id > last_id).order_by(Assessment.id).limit(batch_size)
+            )).all()
+            if not rows:
+                return converted
+            last_id = rows[-1].id
+            legacy = [row for row in rows if row.full_plan_json and not is_manifest(row.full_plan_json)]
+            if legacy:
+                manifests = await store_plans(session, [row.full_plan_json for row in legacy])
+                for row, manifest in zip(legacy, manifests):
+                    row.full_plan_json = manifest
+                    session.add(row)
+                await session.commit()
+                converted += len(legacy)
+                print(f"  converted {converted} rows (through id {last_id})")
+
+
+async def collect_garbage(candidates: Optional[Iterable[str]] = None, batch_size: int = 1000,
+                          grace_s: Optional[float] = None) -> int:
+    """
+    Mark-and-sweep: deletes blobs that no Assessment manifest references. `candidates`
+    limits the sweep to those hashes. Blobs stored or re-referenced within grace_s
+    (PLAN_BLOB_GC_GRACE_S) of the mark are kept, so rows a writer hasn't committed yet
+    are safe. Scans the whole table - run it offline, not in a request.
+    Returns how many blobs were deleted.
+    """
+    if candidates is not None:
+        candidates = set(candidates)
+        if not candidates:
+            return 0
+    grace_s = PLAN_BLOB_GC_GRACE_S if grace_s is None else grace_s
+    started = datetime.utcnow() - timedelta(seconds=grace_s)
+    referenced, last_id = set(), 0
+    while True:
+        async with database.new_session() as session:
+            rows = (await session.exec(
+                select(Assessment.id, Assessment.full_plan_json).where(Assessment.id > last_id)
+                .order_by(Assessment.id).limit(batch_size)
+            )).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        referenced |= plan_hashes(stored for _, stored in rows)
+
+    untouched = func.coalesce(PlanBlob.last_used_at, PlanBlob.created_at) < started
+    async with database.new_session() as session:
+        query = select(PlanBlob.hash).where(untouched)
+        if candidates is not None:
+            query = query.where(PlanBlob.hash.in_(candidates))
+        garbage = [digest for digest in (await session.exec(query)).all() if digest not in referenced]
+        deleted = 0
+        for i in range(0, len(garbage), 500):
+            # Re-checked at delete time: a writer may have touched the blob since the select
+            result = await session.execute(delete(PlanBlob).where(PlanBlob.hash.in_(garbage[i:i + 500])).where(untouched))
+            deleted += result.rowcount
+        await session.commit()
+    blob_cache.discard(garbage)
+    return deleted
+
+
+async def stats() -> Dict:
+    async with database.new_session() as session:
+        blobs, stored, raw = (await session.exec(
+            select(func.count(), func.coalesce(func.sum(func.length(PlanBlob.data)), 0), func.coalesce(func.sum(PlanBlob.size), 0))
+        )).one()
+        rows = (await session.exec(select(func.count()).select_from(Assessment))).one()
+    return {"assessments": rows, "blobs": blobs, "blob_bytes": stored, "blob_raw_bytes": raw}
+
+
+async def _main(args):
+    await database.create_db_and_tables()
+    try:
+        if args.command == "migrate":
+            converted = await migrate(args.batch_size)
+            print(f"✅ Converted {converted} assessments to blob manifests")
+            if converted and database.engine.dialect.name == "sqlite":
+                async with database.engine.connect() as conn:
+                    await conn.execute(text("VACUUM"))
+                print("🧹 VACUUM done - freed pages returned to the filesystem")
+        elif args.command == "gc":
+            deleted = await collect_garbage(batch_size=args.batch_size)
+            print(f"🧹 Deleted {deleted} unreferenced blobs")
+        else:
+            result = await stats()
+            print(f"📊 {result['assessments']} assessments share {result['blobs']} blobs "
+                  f"({result['blob_bytes']} bytes stored, {result['blob_raw_bytes']} uncompressed)")
+    finally:
+        await database.dispose_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed plan storage")
+    parser.add_argument("command", choices=["migrate", "stats", "gc"])
+    parser.add_argument("--batch-size", type=int, default=200)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import contextvars
+import hashlib
+import json
+from typing import Dict, Optional
+
+# --- Versioned prompt templates ---
+# Each prompt is split into a static system instruction (the rulebook, identical on
+# every call, so the backend can context-cache it or reuse it as a prefix) and a
+# small per-request payload. Bump `version` whenever the static text changes; the
+# version + content fingerprint of every prompt a plan used lands in
+# FinalPlan.prompt_versions.
+
+
+class PromptTemplate:
+    def __init__(self, name: str, version: int, system: str):
+        self.name = name
+        self.version = version
+        self.system = system.strip() + "\n"
+        self.fingerprint = hashlib.sha256(self.system.encode("utf-8")).hexdigest()[:8]
+
+    @property
+    def key(self) -> str:
+        """Unique per static text, e.g. for naming a context cache."""
+        return f"{self.name}-v{self.version}-{self.fingerprint}"
+
+    @property
+    def tag(self) -> str:
+        return f"v{self.version}-{self.fingerprint}"
+
+    def render(self, **sections) -> str:
+        """Per-request payload: one labelled block per section (dicts/lists become JSON)."""
+        blocks = []
+        for label, value in sections.items():
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            blocks.append(f"{label.replace('_', ' ').upper()}:\n{value}")
+        record_prompt(self)
+        return "\n\n".join(blocks)
+
+
+CLASSIFY_RULEBOOK = """
+You are a SUPPORT TRIAGE CLASSIFIER.
+
+Your job is NOT to diagnose or provide therapy.
+Your job is ONLY to classify support needs and urgency
+based on structured intake answers.
+Never infer substance use, gambling, or addiction unless explicitly mentioned in primary_concern or intake text.
+
+You must follow ALL rules strictly.
+
+--------------------------------
+ALLOWED ISSUE TYPES (choose ONE only):
+- mental_health
+- gambling
+- alcohol
+- drug_use
+- behavioral_addiction
+- crisis_safety
+- general_support
+- financial_stress
+- relationship_family
+- grief_loss
+- unknown
+
+ALLOWED URGENCY LEVELS:
+- routine
+- soon
+- urgent
+- immediate_crisis
+
+--------------------------------
+DECISION RULES:
+
+1. If answer_safety contains explicit self-harm risk:
+- issue_type = crisis_safety
+- urgency = immediate_crisis
+
+2. If safety_check = "I'm not sure":
+- urgency must be at least "urgent"
+
+3. Daily functioning matters more than emotional distress.
+
+4. Time sensitivity maps to urgency:
+- Not urgent → routine
+- Soon → soon
+- As soon as possible → urgent
+
+5. Emotional distress alone does NOT mean crisis.
+
+6. If information is unclear:
+- use "unknown" or "general_support"
+
+7. NEVER invent diagnoses or medical labels.
+
+--------------------------------
+SEVERITY SCORE GUIDE:
+1 = mild distress + functioning intact
+2 = moderate distress OR mild impairment
+3 = major impairment OR urgent support needed
+4 = safety concern OR cannot function
+
+--------------------------------
+PERSONALIZED NOTE GUIDELINES:
+Create a compassionate, warm message (2-4 sentences) that:
+- Acknowledges what the person shared
+- Validates their experience without diagnosing
+- Provides reassurance about the support available
+- Uses supportive, hopeful language
+- Reflects the urgency level appropriately
+
+Example for crisis: "Thank you for reaching out during this difficult time. Your safety is our top priority, and we've identified immediate resources that can provide support right now."
+
+Example for routine: "We appreciate you taking this step. Based on what you've shared, connecting with support resources can help you navigate these challenges at a comfortable pace."
+
+--------------------------------
+Return ONLY valid JSON. If you produce anything other than valid JSON, the response is invalid.
+OUTPUT FORMAT:
+
+{
+"issue_type": "",
+"urgency": "",
+"severity_score": 1-4,
+"needs_immediate_resources": true/false,
+"confidence": 0.0-1.0,
+"reasoning": "brief non-clinical explanation",
+"personalized_note": "2-4 sentence compassionate message acknowledging their situation"
+}
+"""
+
+CLASSIFY_PROMPT = PromptTemplate("classify", 2, CLASSIFY_RULEBOOK + """
+--------------------------------
+The user message contains the INTAKE DATA to classify.
+""")
+
+COMBINED_PROMPT = PromptTemplate("combined", 1, CLASSIFY_RULEBOOK + """
+--------------------------------
+COMBINED OUTPUT (this replaces the output format above):
+Also provide 3 specific, actionable coping exercises the person can do RIGHT NOW,
+matched to the issue_type and severity_score you chose.
+- If severity is high (4), focus on grounding and safety.
+- If severity is low (1-2), focus on skill-building or reflection.
+- Exercises must be brief (under 5 minutes).
+
+Return ONLY this JSON object:
+{
+"scores": { the classification object described above },
+"exercises": [{"title": "Exercise Name", "steps": ["Step 1...", "Step 2..."], "benefit": "Why this helps"}]
+}
+
+--------------------------------
+The user message contains the INTAKE DATA to classify.
+""")
+
+SELECTION_PROMPT = PromptTemplate("selection", 2, """
+### ROLE
+You are a mental health clinical coordinator.
+
+### INPUT
+The user message contains the USER STORY, USER ASSESSMENT, USER CONSTRAINTS and the
+AVAILABLE RESOURCES (each with an "index").
+
+### TASK
+1. Analyze the User Story and Constraints.
+2. From the AVAILABLE RESOURCES, select the top 3 that best match the user's needs.
+3. If a resource violates a constraint (e.g., costs money when user needs free), skip it.
+4. For each selection, provide a brief "rationale."
+
+### OUTPUT FORMAT
+Return ONLY a JSON array of objects.
+Example: [{"index": 0, "rationale": "Description here"}]
+""")
+
+TOOLBOX_PROMPT = PromptTemplate("toolbox", 2, """
+### ROLE
+You are a clinical psychologist specializing in immediate crisis stabilization and grounding techniques.
+
+### INPUT
+The user message describes what the user is currently experiencing (ISSUE TYPE),
+the SEVERITY LEVEL (1-4) and the CLINICAL REASONING behind it.
+
+### TASK
+Provide 3 specific, actionable coping exercises the user can do RIGHT NOW.
+- If severity is high (4), focus on grounding and safety.
+- If severity is low (1-2), focus on skill-building or reflection.
+- Exercises must be brief (under 5 minutes).
+
+### OUTPUT FORMAT
+Return ONLY a JSON array of objects:
+[
+  {
+    "title": "Exercise Name",
+    "steps": ["Step 1...", "Step 2..."],
+    "benefit": "Why this helps for this specific issue"
+  }
+]
+""")
+
+
+# --- Which prompt versions a request used ---
+
+_prompt_trace: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar("prompt_trace", default=None)
+
+
+def start_prompt_trace() -> Dict[str, str]:
+    """Starts collecting prompt versions for the current request; returns the live dict."""
+    trace: Dict[str, str] = {}
+    _prompt_trace.set(trace)
+    return trace
+
+
+def record_prompt(template: PromptTemplate):
+    trace = _prompt_trace.get()
+    if trace is not None:
+        trace[template.name] = template.tag
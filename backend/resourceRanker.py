@@ -0,0 +1,182 @@
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from schemas import UserAssessmentInput
+
+# --- Vectorized pre-ranker for local facilities ---
+# Scores every candidate place in one batched NumPy pass: distance, review-weighted
+# rating, open-now and matches against the user's constraints (cost, transit, language).
+# Used to trim the Gemini selection prompt, or on its own as an LLM-free selector.
+
+EARTH_RADIUS_KM = 6371.0
+PRIOR_RATING = 3.5     # assumed rating for places with few or no reviews
+PRIOR_REVIEWS = 10.0   # how many reviews the prior is worth
+
+WEIGHTS = {
+    "rating": 1.0,
+    "reviews": 0.35,
+    "open_now": 0.4,
+    "distance": 1.2,
+    "cost": 1.0,
+    "language": 1.5,
+    "keyword": 0.6,
+}
+
+FREE_TERMS = re.compile(r"\b(free|no cost|afford|cheap|low[- ]cost|money|budget|expensive|high[- ]cost|insurance)\b")
+TRANSIT_TERMS = re.compile(r"\b(bus|transit|walk(?:ing)?|no car|don'?t have a car|can'?t drive|transportation)\b")
+FREE_PLACE_TERMS = re.compile(r"\b(community|public|free|non[- ]?profit|hospital|health centre|health center|cmha)\b")
+
+LANGUAGES = {
+    "fr": ("french", "français", "francais", "francophone"),
+    "es": ("spanish", "español", "espanol"),
+    "ar": ("arabic",),
+    "zh": ("mandarin", "cantonese", "chinese"),
+    "pa": ("punjabi",),
+    "hi": ("hindi",),
+    "ur": ("urdu",),
+    "tl": ("tagalog", "filipino"),
+    "pt": ("portuguese",),
+    "fa": ("farsi", "persian"),
+    "so": ("somali",),
+    "asl": ("asl", "sign language"),
+}
+
+
+def parse_constraints(text: str) -> Dict:
+    """Pulls the rankable needs out of answer_constraints."""
+    text = (text or "").lower()
+    languages = [code for code, names in LANGUAGES.items() if any(n in text for n in names)]
+    return {
+        "wants_free": bool(FREE_TERMS.search(text)),
+        "needs_transit": bool(TRANSIT_TERMS.search(text)),
+        "languages": languages,
+    }
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    p1, p2 = np.radians(lat), np.radians(lats)
+    dp, dl = p2 - p1, np.radians(lngs - lng)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _features(places: list, constraints: Dict, issue_keyword: str) -> Dict[str, np.ndarray]:
+    n = len(places)
+    lats = np.full(n, np.nan)
+    lngs = np.full(n, np.nan)
+    ratings = np.full(n, np.nan)
+    reviews = np.zeros(n)
+    open_now = np.zeros(n)
+    cost = np.zeros(n)
+    language = np.zeros(n)
+    keyword = np.zeros(n)
+    keyword_terms = [t for t in issue_keyword.lower().split() if len(t) > 3]
+
+    for i, p in enumerate(places):
+        loc = p.get("geometry", {}).get("location", {})
+        if loc.get("lat") is not None and loc.get("lng") is not None:
+            lats[i], lngs[i] = loc["lat"], loc["lng"]
+        if p.get("rating") is not None:
+            ratings[i] = p["rating"]
+        reviews[i] = p.get("user_ratings_total") or 0
+        is_open = (p.get("opening_hours") or {}).get("open_now")
+        open_now[i] = 1.0 if is_open is True else (-1.0 if is_open is False else 0.0)
+
+        text = " ".join([p.get("name") or "", " ".join(p.get("types") or []), " ".join(p.get("categories") or [])]).lower()
+        place_cost = (p.get("cost") or "").lower()
+        if place_cost in ("free", "sliding", "subsidized") or FREE_PLACE_TERMS.search(text) or p.get("price_level") == 0:
+            cost[i] = 1.0
+        elif place_cost in ("private", "paid") or (p.get("price_level") or 0) >= 2:
+            cost[i] = -1.0
+
+        if constraints["languages"]:
+            offered = set(p.get("languages") or [])
+            names = [name for code in constraints["languages"] for name in LANGUAGES[code]]
+            if offered & set(constraints["languages"]) or any(name in text for name in names):
+                language[i] = 1.0
+
+        if keyword_terms and any(term in text for term in keyword_terms):
+            keyword[i] = 1.0
+
+    return {
+        "lats": lats, "lngs": lngs, "ratings": ratings, "reviews": reviews,
+        "open_now": open_now, "cost": cost, "language": language, "keyword": keyword,
+    }
+
+
+def score_places(responses: UserAssessmentInput, places: list, issue_keyword: str = "") -> Tuple[np.ndarray, Dict]:
+    """Returns (scores, features) for every candidate, higher is better."""
+    constraints = parse_constraints(responses.answer_constraints)
+    f = _features(places, constraints, issue_keyword)
+
+    # Review-weighted rating: few reviews pull towards the prior
+    ratings = np.nan_to_num(f["ratings"], nan=PRIOR_RATING)
+    adjusted = (ratings * f["reviews"] + PRIOR_RATING * PRIOR_REVIEWS) / (f["reviews"] + PRIOR_REVIEWS)
+
+    if responses.latitude is not None and responses.longitude is not None:
+        distance = haversine_km(responses.latitude, responses.longitude, f["lats"], f["lngs"])
+    else:
+        distance = np.full(len(places), np.nan)
+    f["distance_km"] = distance
+    # Transit/walking users care more about proximity
+    scale_km = 1.5 if constraints["needs_transit"] else 4.0
+    closeness = np.nan_to_num(np.exp(-distance / scale_km), nan=0.0)
+
+    scores = (
+        WEIGHTS["rating"] * (adjusted - PRIOR_RATING)
+        + WEIGHTS["reviews"] * np.log1p(f["reviews"]) / np.log1p(1000)
+        + WEIGHTS["open_now"] * f["open_now"]
+        + WEIGHTS["distance"] * closeness * (2.0 if constraints["needs_transit"] else 1.0)
+        + WEIGHTS["cost"] * f["cost"] * (1.0 if constraints["wants_free"] else 0.25)
+        + WEIGHTS["language"] * f["language"]
+        + WEIGHTS["keyword"] * f["keyword"]
+    )
+    f["constraints"] = constraints
+    f["adjusted_rating"] = adjusted
+    return scores, f
+
+
+def _order(scores: np.ndarray, f: Dict) -> np.ndarray:
+    """Deterministic ranking: score descending, ties broken by distance then input order."""
+    distance = np.nan_to_num(f["distance_km"], nan=np.inf)
+    return np.lexsort((np.arange(len(scores)), distance, -scores))
+
+
+def top_indices(responses: UserAssessmentInput, places: list, k: int, issue_keyword: str = "") -> List[int]:
+    """Indices of the k best candidates, e.g. to trim the Gemini prompt."""
+    if not places:
+        return []
+    scores, f = score_places(responses, places, issue_keyword)
+    return [int(i) for i in _order(scores, f)[:k]]
+
+
+def rationale(place: dict, i: int, f: Dict) -> str:
+    """Templated explanation built from the features that drove the score."""
+    reasons = []
+    distance = f["distance_km"][i]
+    if not np.isnan(distance):
+        reasons.append(f"{distance:.1f} km away")
+    if place.get("rating") is not None and f["reviews"][i]:
+        reasons.append(f"rated {place['rating']}/5 from {int(f['reviews'][i])} reviews")
+    if f["open_now"][i] > 0:
+        reasons.append("open now")
+    if f["constraints"]["wants_free"] and f["cost"][i] > 0:
+        reasons.append("likely free or low-cost")
+    if f["language"][i] > 0:
+        reasons.append("offers services in your preferred language")
+    if f["constraints"]["needs_transit"] and not np.isnan(distance) and distance <= 2.0:
+        reasons.append("close enough to reach by bus or on foot")
+    if f["keyword"][i] > 0:
+        reasons.append("specializes in this kind of support")
+    if not reasons:
+        return "Nearby support option that matches your needs."
+    text = ", ".join(reasons)
+    return text[0].upper() + text[1:] + "."
+
+
+def rank_resources(responses: UserAssessmentInput, places: list, k: int = 3, issue_keyword: str = "") -> List[Tuple[int, str]]:
+    """LLM-free selection: [(index, rationale), ...] for the top-k places."""
+    if not places:
+        return []
+    scores, f = score_places(responses, places, issue_keyword)
+    return [(int(i), rationale(places[i], i, f)) for i in _order(scores, f)[:k]]
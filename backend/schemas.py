@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 
 # --- INPUT: What the frontend sends ---
 class UserAssessmentInput(BaseModel):
@@ -23,14 +24,35 @@ class AssessmentScores(BaseModel):
     confidence: float
     reasoning: str
     personalized_note: str
+    # Which tier produced the labels: gemini, cache, local, crisis or fallback
+    source: str = "unknown"
 
 # --- OUTPUT: The Final Plan (The Recommendation) ---
 class FinalPlan(BaseModel):
     scores: AssessmentScores
     recommended_pathway: List[dict] # [{"name": "Crisis Line", "type": "Phone", "desc": "...", "data": "..."}, ]
     exercises: List[dict[str, Any]] = []
+    degraded_stages: List[str] = []  # stages that hit the deadline and used their fallback
+    prompt_versions: Dict[str, str] = {}  # prompt name -> version tag actually sent to the LLM
 
 # --- AUTH: Register Payload ---
 class RegisterRequest(BaseModel):
     email: str
-    password: str
\ No newline at end of file
+    password: str
+
+class PasswordChangeRequest(BaseModel):
+    current_password: str
+    new_password: str
+
+# --- HISTORY: One page of the assessment list (summary columns only) ---
+class AssessmentSummary(BaseModel):
+    id: int
+    created_at: datetime
+    issue_type: str
+    urgency: str
+    severity_score: int
+
+class AssessmentPage(BaseModel):
+    email: str
+    history: List[AssessmentSummary]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next (older) page
@@ -0,0 +1,174 @@
+"""
+Tests for hot/cold archival of old assessments.
+Run with: python test_archive.py
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlmodel import select
+import archive
+import database
+import history
+import planStore
+from assessmentWriter import AssessmentWriter, build_assessment
+from models import Assessment, User
+from test_plan_store import blob_count, make_plan
+from test_classify_cache import make_input
+
+NOW = datetime.utcnow()
+
+
+async def seed(name, ages_days):
+    """User 1 gets one assessment per age (in days); user 2 gets a few of the same ages."""
+    tmp = tempfile.mkdtemp()
+    archive.ARCHIVE_DIR = os.path.join(tmp, "archive")
+    database.configure(f"sqlite:///{os.path.join(tmp, name)}")
+    await database.create_db_and_tables()
+    async with database.new_session() as session:
+        session.add_all([User(email=f"{n}@b.ca", hashed_password="x") for n in ("one", "two")])
+        await session.commit()
+    writer = AssessmentWriter()
+    for user_id, ages in ((1, ages_days), (2, ages_days[:3])):
+        for i, age in enumerate(ages):
+            row = build_assessment(user_id, make_input(), make_plan(i))
+            row["created_at"] = NOW - timedelta(days=age, minutes=i)
+            await writer.submit(row)
+    await writer.stop()
+
+
+async def hot_count():
+    async with database.new_session() as session:
+        return (await session.exec(select(func.count()).select_from(Assessment))).one()
+
+
+async def close():
+    await archive.dispose_archives()
+    await database.dispose_db()
+
+
+def test_old_rows_move_to_monthly_partitions():
+    ages = [1, 5, 20, 200, 230, 260, 300, 400]
+
+    async def scenario():
+        await seed("move.db", ages)
+        blobs_before = await blob_count()
+        grace, planStore.PLAN_BLOB_GC_GRACE_S = planStore.PLAN_BLOB_GC_GRACE_S, 0  # the seeded blobs are brand new
+        try:
+            moved = await archive.run(older_than_days=180, batch_size=3)
+        finally:
+            planStore.PLAN_BLOB_GC_GRACE_S = grace
+        again = await archive.run(older_than_days=180)
+        result = moved, again, await hot_count(), archive.partitions(), blobs_before - await blob_count()
+        await close()
+        return result
+
+    moved, again, hot, months, swept = asyncio.run(scenario())
+    print(f"🗃️ moved {moved} rows into {months}")
+    assert moved == 5 and again == 0 and hot == 3 + 3
+    assert swept == 5  # the archived rows' own clinics; archives keep the full plan inline
+    assert len(months) >= 4 and months == sorted(months, reverse=True)
+
+
+def test_history_fans_out_past_the_hot_window():
+    ages = [1, 2, 3, 200, 201, 230, 260, 300, 400]
+
+    async def scenario():
+        await seed("fanout.db", ages)
+        before, _ = await history.history_page(1, limit=100)
+        await archive.run(older_than_days=180)
+
+        opened = []
+        original = history.archive_page
+
+        async def tracking_page(*args, **kwargs):
+            opened.append(args)
+            return await original(*args, **kwargs)
+
+        history.archive_page = tracking_page
+        try:
+            first, cursor = await history.history_page(1, limit=2)
+            reads_on_first_page = len(opened)
+            seen = list(first)
+            while cursor:
+                page, cursor = await history.history_page(1, limit=2, cursor=cursor)
+                seen.extend(page)
+        finally:
+            history.archive_page = original
+
+        archived = await history.assessment_detail(1, seen[-1].id)
+        other_user = await history.assessment_detail(2, seen[-1].id)
+        await close()
+        return before, seen, reads_on_first_page, archived, other_user
+
+    before, seen, reads_on_first_page, archived, other_user = asyncio.run(scenario())
+    assert reads_on_first_page == 0  # the hot window alone answers the first page
+    assert [(s.id, s.created_at) for s in seen] == [(s.id, s.created_at) for s in before]
+    assert archived["full_plan_json"] == make_plan(len(ages) - 1).dict()
+    assert other_user is None
+
+
+def test_only_the_users_own_partitions_are_opened():
+    ages = [1, 2, 3, 200, 230, 260, 300]
+
+    async def scenario():
+        await seed("index.db", ages)
+        await archive.run(older_than_days=180)
+        opened = []
+        original = archive._engine
+
+        async def tracking_engine(month, create=False):
+            opened.append(month)
+            return await original(month, create)
+
+        archive._engine = tracking_engine
+        try:
+            light, _ = await history.history_page(2, limit=100)  # user 2's rows are all hot
+            light_opened = list(opened)
+            heavy, _ = await history.history_page(1, limit=100)
+        finally:
+            archive._engine = original
+        months = await archive.archived_months(1)
+        pool = archive._engines[months[0]].pool.size()
+        await close()
+        return light, light_opened, heavy, opened, months, pool
+
+    light, light_opened, heavy, opened, months, pool = asyncio.run(scenario())
+    assert len(light) == 3 and light_opened == []
+    assert len(heavy) == len(ages) and opened == months  # one visit per month holding user 1's rows
+    assert pool == archive.ARCHIVE_POOL_SIZE
+
+
+def test_interrupted_run_resumes_without_duplicates():
+    def crash(*args):
+        raise RuntimeError("killed between copy and delete")
+
+    async def scenario():
+        await seed("resume.db", [200, 210, 220])
+        # Crash after the archive copy is committed but before the hot rows are deleted
+        original = archive.delete
+        archive.delete = crash
+        try:
+            await archive.run(older_than_days=180)
+        except RuntimeError:
+            pass
+        finally:
+            archive.delete = original
+        assert await hot_count() == 6  # nothing lost, nothing half-moved
+        moved = await archive.run(older_than_days=180)
+        listed, _ = await history.history_page(1, limit=10)
+        await close()
+        return moved, listed
+
+    moved, listed = asyncio.run(scenario())
+    assert moved == 6
+    assert len(listed) == 3 and len({s.id for s in listed}) == 3
+
+
+if __name__ == "__main__":
+    test_old_rows_move_to_monthly_partitions()
+    test_history_fans_out_past_the_hot_window()
+    test_only_the_users_own_partitions_are_opened()
+    test_interrupted_run_resumes_without_duplicates()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,185 @@
+"""
+Tests for the write-behind assessment writer.
+Run with: python test_assessment_writer.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+from sqlalchemy import func, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import select
+import assessmentWriter
+import database
+from assessmentWriter import AssessmentWriter, build_assessment
+from models import Assessment, User
+from test_idempotency import make_plan
+from test_classify_cache import make_input
+
+DB_DIR = tempfile.mkdtemp()
+
+
+async def fresh_db(name):
+    database.configure(f"sqlite:///{os.path.join(DB_DIR, name)}")
+    await database.create_db_and_tables()
+    async with database.new_session() as session:
+        session.add(User(email=f"{name}@b.ca", hashed_password="x"))
+        await session.commit()
+
+
+async def count_rows():
+    async with database.new_session() as session:
+        return (await session.exec(select(func.count()).select_from(Assessment))).one()
+
+
+def row(i=0, user_id=1):
+    return build_assessment(user_id, make_input(primary_concern=f"Concern {i}"), make_plan(f"plan {i}"))
+
+
+def test_concurrent_submits_are_group_committed():
+    async def scenario():
+        await fresh_db("batch.db")
+        writer = AssessmentWriter(batch_max=50)
+        start = time.perf_counter()
+        await asyncio.gather(*[writer.submit(row(i)) for i in range(200)])
+        await writer.stop()
+        elapsed = time.perf_counter() - start
+        total = await count_rows()
+        await database.dispose_db()
+        return writer.stats(), total, elapsed
+
+    stats, total, elapsed = asyncio.run(scenario())
+    print(f"📦 {stats['written']} rows in {stats['batches']} commits ({elapsed * 1000:.0f}ms)")
+    assert total == 200 and stats["written"] == 200
+    assert stats["batches"] <= 10 and stats["largest_batch"] == 50
+
+
+def test_lock_contention_is_retried():
+    class FlakyWriter(AssessmentWriter):
+        locked = 2
+
+        async def _commit(self, rows):
+            if self.locked:
+                self.locked -= 1
+                raise OperationalError("INSERT", {}, Exception("database is locked"))
+            await super()._commit(rows)
+
+    async def scenario():
+        await fresh_db("locked.db")
+        writer = FlakyWriter()
+        await writer.submit(row())
+        await writer.stop()
+        total = await count_rows()
+        await database.dispose_db()
+        return writer.stats(), total
+
+    stats, total = asyncio.run(scenario())
+    assert total == 1 and stats["lock_retries"] == 2 and stats["failed"] == 0
+
+
+def test_bad_row_does_not_sink_its_batch():
+    async def scenario():
+        await fresh_db("poison.db")
+        writer = AssessmentWriter()
+        bad = row(99)
+        bad["issue_type"] = None  # NOT NULL column
+        await asyncio.gather(writer.submit(row(1)), writer.submit(bad), writer.submit(row(2)))
+        await writer.stop()
+        total = await count_rows()
+        await database.dispose_db()
+        return writer.stats(), total
+
+    stats, total = asyncio.run(scenario())
+    assert total == 2 and stats["failed"] == 1
+
+
+def test_full_queue_applies_backpressure():
+    class SlowWriter(AssessmentWriter):
+        async def _commit(self, rows):
+            await asyncio.sleep(0.05)
+            await super()._commit(rows)
+
+    async def scenario():
+        await fresh_db("bounded.db")
+        writer = SlowWriter(queue_max=2, batch_max=1)
+        peak = 0
+
+        async def submit(i):
+            nonlocal peak
+            await writer.submit(row(i))
+            peak = max(peak, writer.stats()["queued"])
+
+        await asyncio.gather(*[submit(i) for i in range(6)])
+        await writer.stop()
+        total = await count_rows()
+        await database.dispose_db()
+        return peak, total
+
+    peak, total = asyncio.run(scenario())
+    assert peak <= 2 and total == 6
+
+
+def test_flush_waits_only_for_own_rows():
+    class GatedWriter(AssessmentWriter):
+        async def _commit(self, rows):
+            if any(r["user_id"] == 2 for r in rows):
+                await self.gate.wait()  # another user's write stuck behind a slow commit
+            await super()._commit(rows)
+
+    async def scenario():
+        await fresh_db("per_user.db")
+        async with database.new_session() as session:
+            session.add(User(email="other@b.ca", hashed_password="x"))
+            await session.commit()
+        writer = GatedWriter(batch_max=1)
+        writer.gate = asyncio.Event()
+        await writer.submit(row(1, user_id=1))
+        await writer.flush(1)
+        await writer.submit(row(2, user_id=2))
+        await writer.submit(row(3, user_id=2))
+        # User 1 has nothing outstanding, so their flush doesn't wait on user 2
+        await asyncio.wait_for(writer.flush(1), 1.0)
+        waiting = asyncio.create_task(writer.flush(2))
+        await asyncio.sleep(0.05)
+        blocked = not waiting.done()
+        writer.gate.set()
+        await asyncio.wait_for(waiting, 5.0)
+        total = await count_rows()
+        await writer.stop()
+        await database.dispose_db()
+        return blocked, total
+
+    blocked, total = asyncio.run(scenario())
+    assert blocked  # user 2's own flush does wait for their rows
+    assert total == 3
+
+
+def test_durability_override_does_not_leak_into_pool():
+    async def scenario():
+        await fresh_db("pragma.db")
+        await database.dispose_db()  # start from an empty pool: one connection gets reused
+        writer = AssessmentWriter()
+        await writer.submit(row())
+        await writer.stop()
+        async with database.engine.connect() as conn:
+            level = (await conn.execute(text("PRAGMA synchronous"))).scalar()
+        await database.dispose_db()
+        return level
+
+    original = assessmentWriter.ASSESSMENT_SYNC
+    assessmentWriter.ASSESSMENT_SYNC = "FULL"
+    try:
+        level = asyncio.run(scenario())
+    finally:
+        assessmentWriter.ASSESSMENT_SYNC = original
+    assert level == 1  # NORMAL, as set by the connect hook - not the writer's FULL
+
+
+if __name__ == "__main__":
+    test_concurrent_submits_are_group_committed()
+    test_lock_contention_is_retried()
+    test_bad_row_does_not_sink_its_batch()
+    test_full_queue_applies_backpressure()
+    test_flush_waits_only_for_own_rows()
+    test_durability_override_does_not_leak_into_pool()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,212 @@
+"""
+Tests for cached token verification and revocation.
+Run with: python test_auth_cache.py
+"""
+import asyncio
+import os
+import tempfile
+import httpx
+import auth
+import authCache
+import database
+import main
+import planStore
+from sqlmodel import select
+from assessmentWriter import build_assessment
+from authCache import Principal, PrincipalCache, RevocationList, principal_cache, revocations
+from models import TokenRevocation
+from test_classify_cache import make_input
+from test_plan_store import blob_count, make_plan
+
+DB_DIR = tempfile.mkdtemp()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def use_temp_db(name):
+    database.configure(f"sqlite:///{os.path.join(DB_DIR, name)}")
+    principal_cache.clear()
+    revocations.clear()
+
+    async def setup():
+        await database.create_db_and_tables()
+        await database.dispose_db()
+
+    asyncio.run(setup())
+
+
+class CountingLookups:
+    """Counts user lookups that reach the database."""
+
+    def __enter__(self):
+        self.calls = 0
+        self.originals = auth.get_user_by_email, auth.get_user_by_id
+
+        def counting(fn):
+            async def wrapper(*args):
+                self.calls += 1
+                return await fn(*args)
+            return wrapper
+
+        auth.get_user_by_email, auth.get_user_by_id = (counting(fn) for fn in self.originals)
+        return self
+
+    def __exit__(self, *exc):
+        auth.get_user_by_email, auth.get_user_by_id = self.originals
+
+
+def test_cache_expiry_bounds_and_invalidation():
+    clock = Clock()
+    cache = PrincipalCache(ttl_s=60, max_entries=2, clock=clock)
+    cache.put("a", Principal(id=1, email="a"))
+    cache.put("b", Principal(id=1, email="a"), token_exp=clock.now + 10)  # token expires first
+    assert cache.get("a").id == 1 and cache.get("b").id == 1
+    clock.now += 11
+    assert cache.get("b") is None and cache.get("a") is not None
+    cache.put("c", Principal(id=2, email="c"))
+    cache.put("d", Principal(id=2, email="c"))
+    assert cache.get("a") is None  # evicted, bounded at 2
+    cache.invalidate_user(2)
+    assert cache.get("c") is None and cache.get("d") is None and cache.stats()["entries"] == 0
+
+
+def test_hot_path_skips_the_database():
+    use_temp_db("hot.db")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            token = (await client.post("/api/register", json={"email": "a@b.ca", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            with CountingLookups() as lookups:
+                for _ in range(20):
+                    assert (await client.get("/api/me/assessments", headers=headers)).status_code == 200
+            legacy = auth.create_access_token(data={"sub": "a@b.ca"})  # issued before the uid claim
+            with CountingLookups() as legacy_lookups:
+                for _ in range(5):
+                    r = await client.get("/api/me/assessments", headers={"Authorization": f"Bearer {legacy}"})
+                    assert r.status_code == 200 and r.json()["email"] == "a@b.ca"
+        await database.dispose_db()
+        return lookups.calls, legacy_lookups.calls
+
+    calls, legacy_calls = asyncio.run(scenario())
+    print(f"🔐 user lookups: {calls} for 20 uid-token requests, {legacy_calls} for 5 legacy-token requests")
+    assert calls == 0 and legacy_calls == 1
+
+
+def test_password_change_revokes_old_tokens():
+    use_temp_db("password.db")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            old = (await client.post("/api/register", json={"email": "a@b.ca", "password": "pw"})).json()["access_token"]
+            old_headers = {"Authorization": f"Bearer {old}"}
+            assert (await client.get("/api/me/assessments", headers=old_headers)).status_code == 200  # now cached
+
+            wrong = await client.post("/api/me/password", json={"current_password": "nope", "new_password": "x"}, headers=old_headers)
+            assert wrong.status_code == 401
+
+            r = await client.post("/api/me/password", json={"current_password": "pw", "new_password": "pw2"}, headers=old_headers)
+            new_headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+            statuses = [
+                (await client.get("/api/me/assessments", headers=old_headers)).status_code,
+                (await client.get("/api/me/assessments", headers=new_headers)).status_code,
+                (await client.post("/api/login", data={"username": "a@b.ca", "password": "pw"})).status_code,
+                (await client.post("/api/login", data={"username": "a@b.ca", "password": "pw2"})).status_code,
+            ]
+            # Another process only sees the revocation row, not our cache invalidation
+            revocations.clear()
+            principal_cache.clear()
+            statuses.append((await client.get("/api/me/assessments", headers=old_headers)).status_code)
+            # ...even when it already had the old token cached before the change
+            principal_cache.put(old, Principal(id=1, email="a@b.ca"), issued_at=0.0)
+            revocations.clear()
+            statuses.append((await client.get("/api/me/assessments", headers=old_headers)).status_code)
+        await database.dispose_db()
+        return statuses
+
+    assert asyncio.run(scenario()) == [401, 200, 401, 200, 401, 401]
+
+
+def test_account_deletion_revokes_and_removes_data():
+    use_temp_db("delete.db")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            token = (await client.post("/api/register", json={"email": "a@b.ca", "password": "pw"})).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            await main.assessment_writer.submit(build_assessment(1, make_input(), make_plan(1)))
+            assert (await client.get("/api/me/assessments", headers=headers)).json()["history"]
+            stored_blobs = await blob_count()
+            assert (await client.delete("/api/me", headers=headers)).status_code == 200
+            after = (await client.get("/api/me/assessments", headers=headers)).status_code
+            login = (await client.post("/api/login", data={"username": "a@b.ca", "password": "pw"})).status_code
+        await main.assessment_writer.stop()
+        kept = await blob_count()
+        # The offline sweep reclaims them once they are past the grace window
+        await planStore.collect_garbage(grace_s=0)
+        blobs = await blob_count()
+        await database.dispose_db()
+        return after, login, stored_blobs, kept, blobs
+
+    after, login, stored_blobs, kept, blobs = asyncio.run(scenario())
+    assert (after, login) == (401, 401)
+    assert stored_blobs > 0 and kept == stored_blobs  # deletion doesn't scan the blob table
+    assert blobs == 0  # nobody else references this account's plan parts
+
+
+def test_revocation_refresh_is_single_flight_incremental_and_pruned():
+    use_temp_db("revocations.db")
+    clock = Clock()
+    listing = RevocationList(refresh_s=30, retention_s=1800, prune_s=600, clock=clock)
+
+    async def add(user_id, revoked_before):
+        async with database.new_session() as session:
+            session.add(TokenRevocation(user_id=user_id, revoked_before=revoked_before))
+            await session.commit()
+
+    async def remaining():
+        async with database.new_session() as session:
+            return sorted(row.user_id for row in (await session.exec(select(TokenRevocation))).all())
+
+    async def scenario():
+        await add(1, clock.now - 5000)  # older than any token: pruned
+        await add(2, clock.now - 10)
+        # Twenty requests find the list cold at once: one load between them
+        results = await asyncio.gather(*(listing.is_revoked(2, clock.now - 20) for _ in range(20)))
+        assert all(results) and listing.loads == 1
+        assert await remaining() == [2] and 1 not in listing._revoked
+
+        await add(3, clock.now - 600)  # written long before the last load: outside the window
+        clock.now += 31
+        await add(4, clock.now - 1)
+        assert await listing.is_revoked(4, clock.now - 40)
+        assert listing.loads == 2 and 3 not in listing._revoked  # only recent rows were read
+
+        clock.now += 1795  # users 2 and 3 have outlived every token they could void
+        await listing.refresh()
+        assert 2 not in listing._revoked
+        result = await remaining()
+        await database.dispose_db()
+        return result
+
+    assert asyncio.run(scenario()) == [4]
+    assert authCache.AUTH_REVOCATION_RETENTION_S >= auth.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+if __name__ == "__main__":
+    test_cache_expiry_bounds_and_invalidation()
+    test_hot_path_skips_the_database()
+    test_password_change_revokes_old_tokens()
+    test_account_deletion_revokes_and_removes_data()
+    test_revocation_refresh_is_single_flight_incremental_and_pruned()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,168 @@
+"""
+Tests for the upstream circuit breakers.
+Run with: python test_circuit_breaker.py
+"""
+import asyncio
+import time
+import circuitBreaker
+import locationsFinder
+from circuitBreaker import CircuitBreaker, CircuitOpen, get_breaker, CLOSED, OPEN, HALF_OPEN
+from deadline import Deadline, STAGE_BUDGETS_S
+from llmGateway import LLMGateway, StubBackend, LLMUnavailable
+
+
+def make_breaker(now, **overrides):
+    options = dict(window_s=30, min_calls=4, error_rate=0.5, slow_call_s=1.0, slow_rate=0.75, open_s=10, probes=2)
+    options.update(overrides)
+    return CircuitBreaker("test", clock=lambda: now[0], **options)
+
+
+def rejected(breaker):
+    try:
+        breaker.before()
+        return False
+    except CircuitOpen:
+        return True
+
+
+def test_trips_on_error_rate_and_recovers_through_probes():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for ok in (True, False, True, False):
+        breaker.before()
+        breaker.success(0.1) if ok else breaker.failure()
+    assert breaker.state == OPEN
+    assert rejected(breaker)
+
+    now[0] = 11
+    breaker.before()                     # probe 1
+    breaker.before()                     # probe 2
+    assert breaker.state == HALF_OPEN
+    assert rejected(breaker)             # only two probes at a time
+    breaker.success(0.1)
+    breaker.success(0.1)
+    assert breaker.state == CLOSED
+    print(f"📊 {breaker.stats()}")
+    assert breaker.stats()["trips"] == 1 and breaker.stats()["rejected"] == 2
+
+
+def test_failed_probe_reopens():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for _ in range(4):
+        breaker.failure()
+    now[0] = 11
+    breaker.before()
+    breaker.failure()
+    assert breaker.state == OPEN and rejected(breaker)
+
+
+def test_trips_on_slow_calls():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for latency in (2.0, 2.0, 0.1, 2.0):
+        breaker.success(latency)
+    assert breaker.state == OPEN
+
+
+def test_old_failures_age_out():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for _ in range(3):
+        breaker.failure()
+    now[0] = 40
+    breaker.failure()
+    assert breaker.state == CLOSED
+
+
+def test_open_llm_breaker_answers_instantly():
+    calls = []
+
+    def down(model, prompt):
+        calls.append(prompt)
+        raise ConnectionError("upstream down")
+
+    gateway = LLMGateway(backend=StubBackend(down), retries=0)
+    breaker = get_breaker("llm:outage-test")
+    for _ in range(breaker.min_calls):
+        try:
+            gateway.generate("hi", model="outage-test")
+        except ConnectionError:
+            pass
+    assert breaker.state == OPEN
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(gateway.agenerate("hi", model="outage-test"))
+        assert False, "expected LLMUnavailable"
+    except LLMUnavailable:
+        pass
+    assert time.perf_counter() - start < 0.05
+    assert len(calls) == breaker.min_calls
+    assert gateway.stats()["short_circuited"] == 1
+
+
+def test_default_slow_threshold_is_below_every_stage_budget():
+    assert circuitBreaker.BREAKER_SLOW_CALL_S < min(STAGE_BUDGETS_S.values())
+
+
+def test_deadline_cancellations_trip_the_breaker():
+    budgets = dict(STAGE_BUDGETS_S)
+    gateway = LLMGateway(backend=StubBackend(latency_s=5), retries=0)
+    breaker = circuitBreaker._breakers["llm:deadline-test"] = CircuitBreaker("llm:deadline-test", min_calls=4, slow_call_s=0.05)
+
+    async def scenario():
+        # Every classify call outlives its stage budget and gets cancelled by the deadline
+        for _ in range(breaker.min_calls):
+            deadline = Deadline()
+            await deadline.run("classify", gateway.agenerate("hi", model="deadline-test"), lambda: None)
+            assert deadline.degraded == ["classify"]
+
+    STAGE_BUDGETS_S["classify"] = 0.1
+    try:
+        asyncio.run(scenario())
+    finally:
+        STAGE_BUDGETS_S.update(budgets)
+        circuitBreaker._breakers.pop("llm:deadline-test")
+    assert breaker.state == OPEN
+
+
+def test_early_cancellation_says_nothing():
+    now = [0.0]
+    breaker = make_breaker(now)
+    for _ in range(breaker.min_calls):
+        breaker.before()
+        breaker.cancelled(0.01)  # e.g. the client went away right after the call started
+    assert breaker.state == CLOSED and breaker.stats()["window_calls"] == 0
+
+
+def test_open_places_breaker_skips_fetch():
+    calls = []
+    original = locationsFinder.aget_json
+
+    async def fake_get(url, params):
+        calls.append(params)
+        return {"status": "OK", "results": [{"name": "Clinic"}]}
+
+    breaker = get_breaker("places")
+    locationsFinder.aget_json = fake_get
+    try:
+        breaker._trip(breaker.clock())
+        results, cacheable = asyncio.run(locationsFinder._fetch_places_async(44.2, -76.5, "counseling", 5000))
+        assert results == [] and not cacheable and calls == []
+    finally:
+        locationsFinder.aget_json = original
+        breaker.state = CLOSED
+
+
+if __name__ == "__main__":
+    test_trips_on_error_rate_and_recovers_through_probes()
+    test_failed_probe_reopens()
+    test_trips_on_slow_calls()
+    test_old_failures_age_out()
+    test_open_llm_breaker_answers_instantly()
+    test_default_slow_threshold_is_below_every_stage_budget()
+    test_deadline_cancellations_trip_the_breaker()
+    test_early_cancellation_says_nothing()
+    test_open_places_breaker_skips_fetch()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,119 @@
+"""
+Tests for the semantic classification cache.
+Run with: python test_classify_cache.py
+"""
+import asyncio
+import classify
+from classifyCache import SemanticCache, classification_cache, template_note
+from schemas import UserAssessmentInput
+
+SCORES = {
+    "issue_type": "academic_stress",
+    "urgency": "soon",
+    "severity_score": 2,
+    "confidence": 0.85,
+    "needs_immediate_resources": False,
+    "reasoning": "Exam pressure affecting sleep.",
+    "personalized_note": "Note written for the first student.",
+}
+
+
+def make_input(**overrides):
+    fields = {
+        "primary_concern": "Stress about my final exams",
+        "answer_distress": "I feel overwhelmed and anxious about exams and deadlines",
+        "answer_functioning": "I can't sleep well and I keep skipping meals",
+        "answer_urgency": "I would like help in the next few weeks",
+        "answer_safety": "I am safe",
+        "answer_constraints": "I don't have a car and need something free",
+    }
+    fields.update(overrides)
+    return UserAssessmentInput(**fields)
+
+
+def test_paraphrase_hits_and_gets_template_note():
+    cache = SemanticCache(max_entries=8)
+    cache.store(make_input(), SCORES)
+    hit = cache.lookup(make_input(answer_distress="I feel really overwhelmed and anxious about my exams and deadlines",
+                                  primary_concern="Stress about final exams"))
+    print(f"📊 {cache.stats()}")
+    assert hit is not None and hit["issue_type"] == "academic_stress"
+    assert hit["personalized_note"] == template_note("soon")
+    # Reasoning is rebuilt from this intake, never the neighbour's
+    assert hit["reasoning"] != SCORES["reasoning"]
+    assert "Stress about final exams" in hit["reasoning"]
+
+
+def test_dissimilar_intake_misses():
+    cache = SemanticCache(max_entries=8)
+    cache.store(make_input(), SCORES)
+    other = make_input(
+        primary_concern="Fighting with my partner",
+        answer_distress="We argue every night and I feel lonely",
+        answer_functioning="Work is fine but I am exhausted",
+    )
+    assert cache.lookup(other) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_crisis_and_uncertain_safety_never_cached():
+    cache = SemanticCache(max_entries=8)
+    cache.store(make_input(answer_safety="I want to kill myself"), SCORES)
+    cache.store(make_input(answer_safety="I'm not sure if I'm safe"), SCORES)
+    cache.store(make_input(), dict(SCORES, urgency="urgent"))
+    cache.store(make_input(), dict(SCORES, confidence=0.0))
+    assert cache.stats()["entries"] == 0
+
+    cache.store(make_input(), SCORES)
+    assert cache.lookup(make_input(answer_safety="I don't know if I am safe")) is None
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    now = [0.0]
+    cache = SemanticCache(max_entries=2, ttl_s=100, clock=lambda: now[0])
+    exams = make_input()
+    work = make_input(primary_concern="Burnout at work", answer_distress="My job drains me and my boss yells")
+    family = make_input(primary_concern="Family conflict", answer_distress="My parents fight constantly at home")
+    cache.store(exams, SCORES)
+    now[0] = 1
+    cache.store(work, dict(SCORES, issue_type="work_stress"))
+    now[0] = 2
+    assert cache.lookup(exams) is not None   # exams is now more recently used than work
+    cache.store(family, dict(SCORES, issue_type="family_conflict"))
+    assert cache.lookup(work) is None
+    assert cache.lookup(exams) is not None
+
+    now[0] = 200
+    assert cache.lookup(exams) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_classify_serves_repeat_from_cache():
+    calls = []
+
+    async def fake_gemini(input):
+        calls.append(input)
+        return dict(SCORES)
+
+    original = classify.classify_with_gemini_async
+    classify.classify_with_gemini_async = fake_gemini
+    classification_cache.clear()
+    try:
+        first = asyncio.run(classify.classify_user_text_async(make_input()))
+        second = asyncio.run(classify.classify_user_text_async(make_input(answer_safety="I'm safe")))
+        assert len(calls) == 1
+        assert first["personalized_note"] == SCORES["personalized_note"]
+        assert second["issue_type"] == "academic_stress"
+    finally:
+        classify.classify_with_gemini_async = original
+        classification_cache.clear()
+
+
+if __name__ == "__main__":
+    test_paraphrase_hits_and_gets_template_note()
+    test_dissimilar_intake_misses()
+    test_crisis_and_uncertain_safety_never_cached()
+    test_ttl_and_lru_eviction()
+    test_classify_serves_repeat_from_cache()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,110 @@
+"""
+Tests for lazy client construction and the startup/warm-up lifecycle.
+Run with: python test_cold_start.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import database
+import llmGateway
+import lifecycle
+from llmGateway import StubBackend, llm_gateway
+from passwordHasher import PasswordHasher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_import_builds_no_clients():
+    code = (
+        "import sys, main, database\n"
+        "from llmGateway import llm_gateway\n"
+        "print('genai', 'google.genai' in sys.modules)\n"
+        "print('backend', llm_gateway._backend is None)\n"
+        "print('engine', database._engine is None)\n"
+        "health = main.health()\n"  # a health probe before startup must not build the client either
+        "print('probe', health['llm']['available'], 'google.genai' in sys.modules)\n"
+    )
+    env = dict(os.environ, GEMINI_API_KEY="", GOOGLE_MAPS_API_KEY="")
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    # Nothing built and nothing printed: missing keys are reported by startup, not by import
+    assert result.stdout.splitlines() == ["genai False", "backend True", "engine True", "probe None False"], result.stdout
+
+
+def test_startup_warms_up_and_shutdown_releases():
+    tmp = tempfile.mkdtemp()
+    original_hasher, original_backend = lifecycle.password_hasher, llm_gateway._backend
+    lifecycle.password_hasher = PasswordHasher(workers=1)  # shutdown() is final for a hasher
+    llm_gateway.backend = StubBackend()
+    lifecycle.startup_timings.clear()
+    try:
+        database.configure(f"sqlite:///{tmp}/cold.db")
+
+        async def scenario():
+            await lifecycle.startup(warm=True)
+            warm = database.get_engine().pool.checkedin()
+            await lifecycle.shutdown()
+            return warm, database.get_engine().pool.checkedin()
+        warm, after = asyncio.run(scenario())
+        timings = lifecycle.startup_stats()["timings_ms"]
+    finally:
+        lifecycle.password_hasher = original_hasher
+        llm_gateway._backend = original_backend
+    for step in ("db_schema", "llm_client", "db_pool", "local_classifier", "exercise_library", "startup_total"):
+        assert step in timings, timings
+    assert warm >= 1  # warm connections were parked in the pool
+    assert after == 0  # and released on shutdown
+
+
+def test_startup_builds_llm_client_off_the_loop_without_warm_up():
+    tmp = tempfile.mkdtemp()
+    built_on = []
+
+    class RecordingBackend(StubBackend):
+        def __init__(self):
+            super().__init__()
+            built_on.append(threading.current_thread())
+
+    original_hasher, original_backend = lifecycle.password_hasher, llm_gateway._backend
+    original_factory = llmGateway.BACKENDS.get(llmGateway.LLM_BACKEND)
+    lifecycle.password_hasher = PasswordHasher(workers=1)
+    llmGateway.BACKENDS[llmGateway.LLM_BACKEND] = RecordingBackend
+    llm_gateway._backend = None
+    try:
+        database.configure(f"sqlite:///{tmp}/lazy.db")
+
+        async def scenario():
+            await lifecycle.startup(warm=False)
+            backend = llm_gateway._backend
+            await lifecycle.shutdown()
+            return backend
+        backend = asyncio.run(scenario())
+    finally:
+        lifecycle.password_hasher = original_hasher
+        llm_gateway._backend = original_backend
+        if original_factory is None:
+            del llmGateway.BACKENDS[llmGateway.LLM_BACKEND]
+        else:
+            llmGateway.BACKENDS[llmGateway.LLM_BACKEND] = original_factory
+    assert isinstance(backend, RecordingBackend)  # ready before the first request
+    assert built_on and built_on[0] is not threading.main_thread()  # and not on the event loop
+
+
+def test_warm_up_failures_are_skipped():
+    async def boom():
+        raise RuntimeError("upstream down")
+
+    lifecycle.startup_timings.pop("broken", None)
+    asyncio.run(lifecycle._timed("broken", boom()))
+    assert "broken" in lifecycle.startup_timings
+
+
+if __name__ == "__main__":
+    test_import_builds_no_clients()
+    test_startup_warms_up_and_shutdown_releases()
+    test_startup_builds_llm_client_off_the_loop_without_warm_up()
+    test_warm_up_failures_are_skipped()
+    print("ALL TESTS COMPLETED")
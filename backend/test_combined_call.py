@@ -0,0 +1,105 @@
+"""
+Tests for the combined classify + exercises Gemini call.
+Run with: python test_combined_call.py
+"""
+import asyncio
+import json
+import classify
+import pipeline
+from llmGateway import LLMGateway, StubBackend, STUB_SCORES, STUB_EXERCISES, stub_response
+from test_classify_cache import make_input
+
+
+def with_stub(responder, coro_fn, *args):
+    original = classify.llm_gateway, classify.CLASSIFY_CACHE_ENABLED, classify.LOCAL_CLASSIFIER_ENABLED
+    gateway = LLMGateway(backend=StubBackend(responder))
+    classify.llm_gateway = gateway
+    classify.CLASSIFY_CACHE_ENABLED = classify.LOCAL_CLASSIFIER_ENABLED = False
+    try:
+        return asyncio.run(coro_fn(*args)), gateway
+    finally:
+        classify.llm_gateway, classify.CLASSIFY_CACHE_ENABLED, classify.LOCAL_CLASSIFIER_ENABLED = original
+
+
+def test_parse_combined_validates_each_section():
+    good = json.dumps({"scores": STUB_SCORES, "exercises": STUB_EXERCISES})
+    scores, exercises = classify.parse_combined(good)
+    assert scores["issue_type"] == "general_support" and len(exercises) == 3
+
+    bad_scores = json.dumps({"scores": {**STUB_SCORES, "urgency": "whenever"}, "exercises": STUB_EXERCISES})
+    scores, exercises = classify.parse_combined(bad_scores)
+    assert scores is None and len(exercises) == 3
+
+    bad_exercises = json.dumps({"scores": STUB_SCORES, "exercises": [{"title": "No steps"}]})
+    scores, exercises = classify.parse_combined(bad_exercises)
+    assert scores is not None and exercises is None
+
+    assert classify.parse_combined("not json") == (None, None)
+
+
+def test_arm_assignment_is_stable_and_proportional():
+    original = classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE
+    classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE = 0.3, "llm"
+    try:
+        arms = [classify.use_combined_call(user_id) for user_id in range(2000)]
+        assert arms == [classify.use_combined_call(user_id) for user_id in range(2000)]
+        share = sum(arms) / len(arms)
+        print(f"🅰️🅱️ combined share: {share:.3f}")
+        assert 0.25 < share < 0.35
+    finally:
+        classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE = original
+    assert not classify.use_combined_call(1)
+
+
+def test_library_exercises_disable_the_combined_arm():
+    original = classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE
+    classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE = 1.0, "library"
+    try:
+        assert not any(classify.use_combined_call(user_id) for user_id in range(100))
+    finally:
+        classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE = original
+
+
+def test_one_round_trip_for_scores_and_exercises():
+    (scores, exercises), gateway = with_stub(stub_response, classify.classify_with_toolbox_async, make_input())
+    assert scores["confidence"] == 0.5 and exercises[0]["title"] == "Box Breathing"
+    assert gateway.stats()["calls"] == 1
+
+
+def test_malformed_scores_fall_back_to_classifier_call():
+    def responder(model, prompt):
+        if "COMBINED OUTPUT" in prompt:
+            return json.dumps({"scores": {"issue_type": "made_up"}, "exercises": STUB_EXERCISES})
+        return stub_response(model, prompt)
+
+    (scores, exercises), gateway = with_stub(responder, classify.classify_with_toolbox_async, make_input())
+    assert scores["issue_type"] == "general_support" and len(exercises) == 3
+    assert gateway.stats()["calls"] == 2
+
+
+def test_pipeline_uses_combined_exercises():
+    calls = []
+
+    async def no_separate_toolbox(scores):
+        calls.append(scores)
+        return []
+
+    original = pipeline.generate_exercise_toolbox_async, classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE
+    pipeline.generate_exercise_toolbox_async = no_separate_toolbox
+    classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE = 1.0, "llm"
+    try:
+        plan, _ = with_stub(stub_response, pipeline.build_plan, make_input(), 1)
+    finally:
+        pipeline.generate_exercise_toolbox_async, classify.COMBINED_CALL_RATIO, classify.EXERCISE_SOURCE = original
+    assert [e["title"] for e in plan.exercises] == [e["title"] for e in STUB_EXERCISES]
+    assert calls == []
+
+
+if __name__ == "__main__":
+    test_parse_combined_validates_each_section()
+    test_arm_assignment_is_stable_and_proportional()
+    test_library_exercises_disable_the_combined_arm()
+    test_one_round_trip_for_scores_and_exercises()
+    test_malformed_scores_fall_back_to_classifier_call()
+    test_pipeline_uses_combined_exercises()
+    print("ALL TESTS COMPLETED")
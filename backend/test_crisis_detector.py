@@ -0,0 +1,96 @@
+"""
+Tests for the deterministic crisis fast-path.
+Run with: python test_crisis_detector.py
+"""
+import time
+from schemas import UserAssessmentInput
+from crisisDetector import detect_crisis, find_crisis_phrases
+
+SAFE_ANSWERS = {
+    "primary_concern": "I've been feeling very anxious lately",
+    "answer_distress": "I feel overwhelmed and worried most days",
+    "answer_functioning": "I can still go to work but it's getting harder to focus",
+    "answer_urgency": "I'd like help soon but it's not an emergency",
+    "answer_safety": "I am safe, no thoughts of self-harm",
+    "answer_constraints": "I prefer online or phone support",
+}
+
+
+def make_input(**overrides):
+    return UserAssessmentInput(**{**SAFE_ANSWERS, **overrides})
+
+
+def test_explicit_crisis_language_is_detected():
+    cases = [
+        {"answer_safety": "I'm not sure I'm safe, having self-harm thoughts"},
+        {"primary_concern": "I'm having thoughts of hurting myself"},
+        {"answer_distress": "Honestly I want to kill myself"},
+        {"answer_safety": "I don't want to live anymore"},
+        {"answer_urgency": "I've been thinking about suicide every night"},
+    ]
+    for overrides in cases:
+        result = detect_crisis(make_input(**overrides))
+        print(f"🚨 {overrides} -> {result and result['urgency']}")
+        assert result is not None
+        assert result["issue_type"] == "crisis_safety"
+        assert result["urgency"] == "immediate_crisis"
+        assert result["severity_score"] == 4
+
+
+def test_negated_statements_are_not_crisis():
+    cases = [
+        {},
+        {"answer_safety": "I have no plans to hurt myself, but I feel very hopeless."},
+        {"answer_safety": "I'm safe and not suicidal"},
+        {"answer_safety": "I would never hurt myself"},
+        {"answer_safety": "Self-harm? Never."},
+        {"answer_safety": "Suicide isn't something I'd consider"},
+    ]
+    for overrides in cases:
+        phrases = find_crisis_phrases(make_input(**overrides))
+        print(f"✅ {overrides} -> {phrases}")
+        assert detect_crisis(make_input(**overrides)) is None
+
+
+def test_other_people_and_past_episodes_are_not_crisis():
+    cases = [
+        {"primary_concern": "My brother died by suicide last month"},
+        {"primary_concern": "I used to self-harm as a teen"},
+        {"primary_concern": "I'm worried about my daughter who is self-harming"},
+        {"answer_distress": "My friend said she is suicidal and I don't know how to help"},
+        {"answer_distress": "When I was younger I wanted to die, these days it's work stress"},
+    ]
+    for overrides in cases:
+        phrases = find_crisis_phrases(make_input(**overrides))
+        print(f"✅ {overrides} -> {phrases}")
+        assert detect_crisis(make_input(**overrides)) is None
+
+
+def test_present_first_person_still_detected_next_to_negatives():
+    cases = [
+        {"answer_safety": "I want to kill myself, no one cares"},
+        {"primary_concern": "My brother died by suicide last year, now I'm suicidal too"},
+        {"answer_safety": "Feeling suicidal most nights"},
+    ]
+    for overrides in cases:
+        assert detect_crisis(make_input(**overrides)) is not None, overrides
+
+
+def test_fast_path_is_microseconds():
+    intake = make_input(answer_safety="I'm not sure I'm safe, having self-harm thoughts")
+    runs = 1000
+    start = time.perf_counter()
+    for _ in range(runs):
+        detect_crisis(intake)
+    per_call_us = (time.perf_counter() - start) / runs * 1e6
+    print(f"⏱️ detect_crisis: {per_call_us:.1f}µs per intake")
+    assert per_call_us < 1000
+
+
+if __name__ == "__main__":
+    test_explicit_crisis_language_is_detected()
+    test_negated_statements_are_not_crisis()
+    test_other_people_and_past_episodes_are_not_crisis()
+    test_present_first_person_still_detected_next_to_negatives()
+    test_fast_path_is_microseconds()
+    print("ALL TESTS COMPLETED")
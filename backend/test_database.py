@@ -0,0 +1,117 @@
+"""
+Tests for the shared async database layer and the endpoints that use it.
+Run with: python test_database.py
+"""
+import asyncio
+import os
+import tempfile
+import httpx
+from sqlalchemy import text
+import database
+import main
+from test_idempotency import make_plan
+from test_classify_cache import make_input
+
+DB_DIR = tempfile.mkdtemp()
+
+
+def use_temp_db(name):
+    database.configure(f"sqlite:///{os.path.join(DB_DIR, name)}")
+
+    async def setup():
+        await database.create_db_and_tables()
+        await database.dispose_db()  # pooled connections belong to this event loop
+
+    asyncio.run(setup())
+
+
+def test_urls_map_to_async_drivers():
+    assert database.async_url("sqlite:///database.db") == "sqlite+aiosqlite:///database.db"
+    assert database.async_url("postgresql://u:p@db/care") == "postgresql+asyncpg://u:p@db/care"
+    assert database.async_url("postgres://u:p@db/care") == "postgresql+asyncpg://u:p@db/care"
+    assert database.async_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+def test_sqlite_runs_in_wal_mode_without_echo():
+    use_temp_db("wal.db")
+
+    async def pragmas():
+        async with database.engine.connect() as conn:
+            mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            busy = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        return mode, busy
+
+    mode, busy = asyncio.run(pragmas())
+    print(f"🗄️ journal_mode={mode}, busy_timeout={busy}ms")
+    assert mode == "wal" and busy == database.SQLITE_BUSY_TIMEOUT_MS
+    assert database.engine.echo is False
+    asyncio.run(database.dispose_db())
+
+
+def test_register_login_generate_and_history():
+    use_temp_db("api.db")
+
+    async def fake_build_plan(data, bucket_key):
+        return make_plan("saved")
+
+    original = main.build_plan
+    main.build_plan = fake_build_plan
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.post("/api/register", json={"email": "a@b.ca", "password": "pw123456"})
+            assert r.status_code == 200, r.text
+            assert (await client.post("/api/register", json={"email": "a@b.ca", "password": "x"})).status_code == 400
+            assert (await client.post("/api/login", data={"username": "a@b.ca", "password": "wrong"})).status_code == 401
+
+            r = await client.post("/api/login", data={"username": "a@b.ca", "password": "pw123456"})
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+            # Several users of the loop at once: auth lookups and writes share the pool
+            results = await asyncio.gather(*[
+                client.post("/api/generate-plan", json=make_input(primary_concern=f"Concern {i}").model_dump(), headers=headers)
+                for i in range(5)
+            ])
+            assert all(r.status_code == 200 for r in results)
+            # The same Idempotency-Key with different answers is refused, not replayed
+            keyed = {**headers, "Idempotency-Key": "retry-1"}
+            first = await client.post("/api/generate-plan", json=make_input(primary_concern="Concern 0").model_dump(), headers=keyed)
+            reused = await client.post("/api/generate-plan", json=make_input(primary_concern="Other").model_dump(), headers=keyed)
+            assert first.status_code == 200 and reused.status_code == 422, reused.text
+            history = (await client.get("/api/me/assessments", headers=headers)).json()
+            detail = (await client.get(f"/api/me/assessments/{history['history'][0]['id']}", headers=headers)).json()
+            return history, detail
+
+    try:
+        history, detail = asyncio.run(scenario())
+    finally:
+        main.build_plan = original
+        asyncio.run(database.dispose_db())
+    print(f"📚 {len(history['history'])} saved assessments for {history['email']}")
+    assert len(history["history"]) == 6
+    assert detail["full_plan_json"]["scores"]["personalized_note"] == "saved"
+
+
+def test_new_columns_are_added_to_existing_tables():
+    use_temp_db("legacy.db")
+
+    async def scenario():
+        async with database.engine.begin() as conn:
+            await conn.execute(text("ALTER TABLE assessment DROP COLUMN classification_source"))
+        await database.create_db_and_tables()
+        async with database.engine.connect() as conn:
+            columns = {row[1]: row for row in (await conn.execute(text("PRAGMA table_info(assessment)"))).all()}
+        await database.dispose_db()
+        return columns
+
+    columns = asyncio.run(scenario())
+    assert "classification_source" in columns
+    assert columns["classification_source"][4] == "'unknown'"  # older rows read as unknown
+
+
+if __name__ == "__main__":
+    test_urls_map_to_async_drivers()
+    test_sqlite_runs_in_wal_mode_without_echo()
+    test_register_login_generate_and_history()
+    test_new_columns_are_added_to_existing_tables()
+    print("ALL TESTS COMPLETED")
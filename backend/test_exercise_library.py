@@ -0,0 +1,92 @@
+"""
+Tests for the pre-generated exercise library.
+Run with: python test_exercise_library.py
+"""
+import os
+import tempfile
+import time
+import exercisesToolbox
+from exerciseLibrary import (ExerciseLibrary, build_seed_library, exercise_library, refresh_library, save_library,
+                             ISSUE_TYPES, SEVERITIES)
+from schemas import AssessmentScores
+
+
+def make_scores(issue_type, severity, reasoning=""):
+    return AssessmentScores(
+        issue_type=issue_type, urgency="soon", severity_score=severity, needs_immediate_resources=severity >= 4,
+        confidence=0.9, reasoning=reasoning, personalized_note="We're here to help."
+    )
+
+
+def test_seed_covers_every_combination():
+    library = build_seed_library()
+    for issue in ISSUE_TYPES:
+        for severity in SEVERITIES:
+            for variant in library["toolboxes"][f"{issue}:{severity}"]:
+                assert len(variant["exercise_ids"]) == 3
+                assert all(eid in library["exercises"] for eid in variant["exercise_ids"])
+
+
+def test_shipped_library_serves_without_llm():
+    def fail_llm(assessment):
+        raise AssertionError("library hit should not call Gemini")
+
+    original = exercisesToolbox.generate_exercise_toolbox_llm
+    exercisesToolbox.generate_exercise_toolbox_llm = fail_llm
+    try:
+        crisis = exercisesToolbox.generate_exercise_toolbox(make_scores("alcohol", 4))
+        print(f"🚨 severity 4: {[e['title'] for e in crisis]}")
+        assert crisis[0]["title"] == "Reach Out Right Now"
+
+        low_mood = exercisesToolbox.generate_exercise_toolbox(make_scores("mental_health", 2, "Feeling depressed and unmotivated"))
+        anxious = exercisesToolbox.generate_exercise_toolbox(make_scores("mental_health", 2, "Worries and panic before exams"))
+        print(f"🧘 low mood: {[e['title'] for e in low_mood]} / anxious: {[e['title'] for e in anxious]}")
+        assert low_mood != anxious
+        assert all({"title", "steps", "benefit"} <= set(e) for e in low_mood)
+    finally:
+        exercisesToolbox.generate_exercise_toolbox_llm = original
+
+
+def test_lookup_is_fast():
+    scores = make_scores("grief_loss", 3, "Recent loss of a parent")
+    exercise_library.get_toolbox(scores)
+    runs = 1000
+    start = time.perf_counter()
+    for _ in range(runs):
+        exercise_library.get_toolbox(scores)
+    per_call_us = (time.perf_counter() - start) / runs * 1e6
+    print(f"⏱️ get_toolbox: {per_call_us:.1f}µs")
+    assert per_call_us < 1000
+
+
+def test_refreshed_variant_can_be_selected():
+    generated = [
+        {"title": "Memory Box Ritual", "steps": ["Gather keepsakes"], "benefit": "Honours cherished memories"},
+        {"title": "Remembrance Walk", "steps": ["Walk a familiar route"], "benefit": "Gentle movement with remembrance"},
+    ]
+    path = os.path.join(tempfile.mkdtemp(), "library.json")
+    save_library(build_seed_library(), path)
+    original = exercisesToolbox.generate_exercise_toolbox_llm
+    exercisesToolbox.generate_exercise_toolbox_llm = lambda assessment: generated
+    try:
+        refresh_library(path, ["grief_loss"])
+    finally:
+        exercisesToolbox.generate_exercise_toolbox_llm = original
+
+    library = ExerciseLibrary(path)
+
+    def titles(reasoning, severity=2):
+        return [e["title"] for e in library.get_toolbox(make_scores("grief_loss", severity, reasoning))]
+    assert library.version == 2
+    assert titles("Wants a ritual to honour memories of their father") == ["Memory Box Ritual", "Remembrance Walk"]
+    assert titles("") == ["Memory Box Ritual", "Remembrance Walk"]  # ties go to the newest variant
+    assert titles("Recent loss, grief since mum died") != ["Memory Box Ritual", "Remembrance Walk"]  # seed fits better
+    assert titles("", severity=4)[0] == "Reach Out Right Now"  # crisis toolbox is never replaced
+
+
+if __name__ == "__main__":
+    test_seed_covers_every_combination()
+    test_shipped_library_serves_without_llm()
+    test_lookup_is_fast()
+    test_refreshed_variant_can_be_selected()
+    print("ALL TESTS COMPLETED")
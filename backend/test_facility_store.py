@@ -0,0 +1,91 @@
+"""
+Tests for the offline facility store.
+Run with: python test_facility_store.py
+"""
+import csv
+import os
+import tempfile
+import time
+import locationsFinder
+from facilityStore import FacilityStore, ingest
+from schemas import UserAssessmentInput, AssessmentScores
+
+ORIGIN = (44.2262, -76.4916)
+
+FACILITIES = [
+    {"name": "Harbour Counselling", "address": "10 King St", "lat": 44.2300, "lng": -76.4900, "category": "mental_health;counseling", "cost": "free", "languages": "en;fr"},
+    {"name": "Lakeside Clinic", "address": "22 Queen St", "lat": 44.2400, "lng": -76.5000, "category": "mental_health", "cost": "sliding", "languages": "en"},
+    {"name": "Grief Circle", "address": "5 Union St", "lat": 44.2250, "lng": -76.4950, "category": "grief_loss", "cost": "free", "languages": "en"},
+    {"name": "Far Away Centre", "address": "1 Distant Rd", "lat": 44.4000, "lng": -76.4916, "category": "mental_health", "cost": "free", "languages": "en"},
+]
+
+
+def build_store(tmpdir):
+    csv_path = os.path.join(tmpdir, "facilities.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(FACILITIES[0]))
+        writer.writeheader()
+        writer.writerows(FACILITIES)
+    db_path = os.path.join(tmpdir, "facilities.db")
+    assert ingest(csv_path, db_path) == len(FACILITIES)
+    return FacilityStore(db_path)
+
+
+def test_radius_and_category_query():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = build_store(tmpdir)
+        results = store.query(*ORIGIN, 5000, "mental_health")
+        names = [p["name"] for p in results]
+        print(f"🗂️ mental_health within 5km: {names}")
+        assert names == ["Harbour Counselling", "Lakeside Clinic"]
+        assert results[0]["cost"] == "free" and results[0]["languages"] == ["en", "fr"]
+        assert [p["name"] for p in store.query(*ORIGIN, 5000, "grief_loss")] == ["Grief Circle"]
+
+        runs = 1000
+        start = time.perf_counter()
+        for _ in range(runs):
+            store.query(*ORIGIN, 5000, "mental_health")
+        per_query_us = (time.perf_counter() - start) / runs * 1e6
+        print(f"⏱️ query: {per_query_us:.0f}µs")
+        assert per_query_us < 1000
+
+
+def test_store_answers_before_places():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = build_store(tmpdir)
+        calls = []
+
+        def fake_search(lat, lng, keyword):
+            calls.append(keyword)
+            return [{"name": "Places Result"}]
+
+        original = (locationsFinder.facility_store, locationsFinder._places_nearby_search, locationsFinder.FACILITY_MIN_RESULTS)
+        locationsFinder.facility_store = store
+        locationsFinder._places_nearby_search = fake_search
+        try:
+            intake = UserAssessmentInput(
+                primary_concern="Lost my father", answer_distress="Sad", answer_functioning="Okay",
+                answer_urgency="Soon", answer_safety="Safe", answer_constraints="Free",
+                latitude=ORIGIN[0], longitude=ORIGIN[1]
+            )
+            scores = AssessmentScores(
+                issue_type="grief_loss", urgency="soon", severity_score=2, needs_immediate_resources=False,
+                confidence=0.9, reasoning="Grief.", personalized_note="We're sorry for your loss."
+            )
+            locationsFinder.FACILITY_MIN_RESULTS = 1
+            dense = locationsFinder.get_nearby_resources(intake, scores)
+            assert [p["name"] for p in dense] == ["Grief Circle"] and calls == []
+
+            # Sparse area: Places fills in after the local match
+            locationsFinder.FACILITY_MIN_RESULTS = 3
+            sparse = locationsFinder.get_nearby_resources(intake, scores)
+            print(f"🗺️ sparse area: {[p['name'] for p in sparse]}")
+            assert [p["name"] for p in sparse] == ["Grief Circle", "Places Result"]
+        finally:
+            locationsFinder.facility_store, locationsFinder._places_nearby_search, locationsFinder.FACILITY_MIN_RESULTS = original
+
+
+if __name__ == "__main__":
+    test_radius_and_category_query()
+    test_store_answers_before_places()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,91 @@
+"""
+Tests for keyset-paginated assessment history.
+Run with: python test_history.py
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import text
+import database
+from assessmentWriter import build_assessment
+from history import history_page, assessment_detail, decode_cursor, encode_cursor
+from models import Assessment, User
+from test_idempotency import make_plan
+from test_classify_cache import make_input
+
+DB_DIR = tempfile.mkdtemp()
+BASE_TIME = datetime(2026, 1, 1, 12, 0)
+
+
+async def seed(name, rows_per_user=25):
+    """Two users; several rows share a created_at so the id tie-break matters."""
+    database.configure(f"sqlite:///{os.path.join(DB_DIR, name)}")
+    await database.create_db_and_tables()
+    async with database.new_session() as session:
+        session.add_all([User(email=f"{n}@b.ca", hashed_password="x") for n in ("one", "two")])
+        await session.commit()
+        for user_id in (1, 2):
+            for i in range(rows_per_user):
+                row = build_assessment(user_id, make_input(), make_plan(f"user {user_id} plan {i}"))
+                session.add(Assessment(created_at=BASE_TIME + timedelta(minutes=i // 3), **row))
+        await session.commit()
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(BASE_TIME, 42)) == (BASE_TIME, 42)
+    for bad in ("not-a-cursor", "", "!!!"):
+        try:
+            decode_cursor(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {bad!r}")
+
+
+def test_pages_cover_history_exactly_once_newest_first():
+    async def scenario():
+        await seed("pages.db")
+        seen, cursor, pages = [], None, 0
+        while True:
+            items, cursor = await history_page(1, limit=7, cursor=cursor)
+            seen.extend(items)
+            pages += 1
+            if cursor is None:
+                break
+        other = await assessment_detail(2, seen[0].id)
+        own = await assessment_detail(1, seen[0].id)
+        await database.dispose_db()
+        return seen, pages, other, own
+
+    seen, pages, other, own = asyncio.run(scenario())
+    keys = [(item.created_at, item.id) for item in seen]
+    print(f"📄 {len(seen)} summaries over {pages} pages")
+    assert len(seen) == 25 and len(set(keys)) == 25 and pages == 4
+    assert keys == sorted(keys, reverse=True)
+    assert other is None  # another user's id is not visible
+    assert own["full_plan_json"]["scores"]["personalized_note"] == "user 1 plan 24"
+
+
+def test_listing_is_served_from_the_covering_index():
+    async def scenario():
+        await seed("plan.db", rows_per_user=3)
+        async with database.engine.connect() as conn:
+            plan = (await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id, created_at, issue_type, urgency, severity_score FROM assessment "
+                "WHERE user_id = 1 AND (created_at < '2027-01-01' OR (created_at = '2027-01-01' AND id < 9)) "
+                "ORDER BY created_at DESC, id DESC LIMIT 21"
+            ))).all()
+        await database.dispose_db()
+        return " ".join(str(row[-1]) for row in plan)
+
+    plan = asyncio.run(scenario())
+    print(f"🔎 {plan}")
+    assert "COVERING INDEX ix_assessment_history" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+if __name__ == "__main__":
+    test_cursor_round_trip_and_rejects_garbage()
+    test_pages_cover_history_exactly_once_newest_first()
+    test_listing_is_served_from_the_covering_index()
+    print("ALL TESTS COMPLETED")
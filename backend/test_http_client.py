@@ -0,0 +1,120 @@
+"""
+Tests for the pooled outbound HTTP client: retries, retry budget and shutdown.
+Run with: python test_http_client.py
+"""
+import asyncio
+import httpx
+import httpClient
+from httpClient import UpstreamError, aclose_clients, aget_json, get_json
+
+URL = "https://upstream.test/data"
+
+
+def scripted(responses):
+    """MockTransport handler replaying `responses` (status codes or exceptions) in order."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        step = responses[min(len(calls), len(responses) - 1)]
+        calls.append(request)
+        if isinstance(step, Exception):
+            raise step
+        return httpx.Response(step, json={"attempt": len(calls)})
+    return handler, calls
+
+
+def with_sync_client(handler, fn):
+    original, original_backoff = httpClient._client, httpClient.BACKOFF_BASE_S
+    httpClient._client = httpx.Client(transport=httpx.MockTransport(handler))
+    httpClient.BACKOFF_BASE_S = 0.001
+    try:
+        return fn()
+    finally:
+        httpClient._client.close()
+        httpClient._client = original
+        httpClient.BACKOFF_BASE_S = original_backoff
+
+
+def test_retries_5xx_then_succeeds():
+    handler, calls = scripted([503, 200])
+    data = with_sync_client(handler, lambda: get_json(URL, retries=2))
+    assert data == {"attempt": 2}
+    assert len(calls) == 2
+
+
+def test_retries_timeouts():
+    handler, calls = scripted([httpx.ReadTimeout("slow"), 200])
+    data = with_sync_client(handler, lambda: get_json(URL, retries=1))
+    assert data == {"attempt": 2}
+    assert len(calls) == 2
+
+
+def test_does_not_retry_4xx():
+    handler, calls = scripted([404, 200])
+    data = with_sync_client(handler, lambda: get_json(URL, retries=3))
+    assert data == {"attempt": 1}  # a 4xx is the answer, not a transient failure
+    assert len(calls) == 1
+
+
+def test_gives_up_after_retries():
+    handler, calls = scripted([500])
+
+    def call():
+        try:
+            get_json(URL, retries=2)
+        except UpstreamError as e:
+            return str(e)
+    error = with_sync_client(handler, call)
+    assert error is not None and "HTTP 500" in error
+    assert len(calls) == 3
+
+
+def test_retry_budget_stops_early():
+    handler, calls = scripted([502])
+    original = httpClient._backoff
+
+    def call():
+        httpClient._backoff = lambda attempt: 0.3  # the second pause would overrun 0.5s
+        try:
+            get_json(URL, retries=5, budget_s=0.5)
+        except UpstreamError:
+            return True
+        finally:
+            httpClient._backoff = original
+    assert with_sync_client(handler, call)
+    assert len(calls) == 2  # well short of the 6 attempts retries=5 allows
+
+
+def test_async_retries_and_aclose_resets_pool():
+    handler, calls = scripted([504, 200])
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        httpClient._async_clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        data = await aget_json(URL, retries=1)
+        pooled = httpClient._async_clients[loop]
+        await aclose_clients()
+        return data, pooled
+
+    original_backoff = httpClient.BACKOFF_BASE_S
+    httpClient.BACKOFF_BASE_S = 0.001
+    try:
+        httpClient.get_client()  # so there's a blocking client to close as well
+        data, pooled = asyncio.run(scenario())
+    finally:
+        httpClient.BACKOFF_BASE_S = original_backoff
+    assert data == {"attempt": 2}
+    assert len(calls) == 2
+    assert pooled.is_closed
+    assert httpClient._async_clients == {}
+    assert httpClient._client is None
+
+
+if __name__ == "__main__":
+    test_retries_5xx_then_succeeds()
+    test_retries_timeouts()
+    test_does_not_retry_4xx()
+    test_gives_up_after_retries()
+    test_retry_budget_stops_early()
+    test_async_retries_and_aclose_resets_pool()
+    print("ALL TESTS COMPLETED")
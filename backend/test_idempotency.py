@@ -0,0 +1,140 @@
+"""
+Tests for idempotency keys and single-flight plan generation.
+Run with: python test_idempotency.py
+"""
+import asyncio
+from idempotency import IdempotencyConflict, PlanFlight, intake_digest, request_key
+from schemas import UserAssessmentInput, AssessmentScores, FinalPlan
+
+
+def make_input(concern="Exam stress"):
+    return UserAssessmentInput(
+        primary_concern=concern,
+        answer_distress="Overwhelmed",
+        answer_functioning="Not sleeping",
+        answer_urgency="Soon",
+        answer_safety="I am safe",
+        answer_constraints="None",
+    )
+
+
+def make_plan(note="plan"):
+    scores = AssessmentScores(
+        issue_type="academic_stress", urgency="soon", severity_score=2,
+        needs_immediate_resources=False, confidence=0.9, reasoning="r", personalized_note=note,
+    )
+    return FinalPlan(scores=scores, recommended_pathway=[])
+
+
+def counting_compute(calls, delay=0.05):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return make_plan(f"run {len(calls)}")
+    return compute
+
+
+def test_keys_are_scoped_and_stable():
+    assert request_key(1, make_input()) == request_key(1, make_input())
+    assert request_key(1, make_input()) != request_key(2, make_input())
+    assert request_key(1, make_input()) != request_key(1, make_input("Work stress"))
+    assert request_key(1, make_input(), "abc") == request_key(1, make_input("Work stress"), "abc")
+    assert request_key(1, make_input(), "abc") != request_key(2, make_input(), "abc")
+
+
+def test_concurrent_repeats_share_one_run():
+    flight, calls = PlanFlight(), []
+
+    async def main():
+        compute = counting_compute(calls)
+        return await asyncio.gather(*(flight.run("k", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    print(f"📊 {flight.stats()}")
+    assert len(calls) == 1
+    assert sorted(outcome for _, outcome in results) == ["coalesced"] * 4 + ["computed"]
+    assert all(plan is results[0][0] for plan, _ in results)
+
+
+def test_repeat_within_window_is_replayed():
+    now = [0.0]
+    flight, calls = PlanFlight(ttl_s=60, clock=lambda: now[0]), []
+    asyncio.run(flight.run("k", counting_compute(calls, 0)))
+    plan, outcome = asyncio.run(flight.run("k", counting_compute(calls, 0)))
+    assert outcome == "replayed" and len(calls) == 1
+
+    now[0] = 61
+    plan, outcome = asyncio.run(flight.run("k", counting_compute(calls, 0)))
+    assert outcome == "computed" and len(calls) == 2
+
+
+def test_failures_are_not_remembered():
+    flight, attempts = PlanFlight(), []
+
+    async def failing():
+        attempts.append(1)
+        raise RuntimeError("upstream down")
+
+    for _ in range(2):
+        try:
+            asyncio.run(flight.run("k", failing))
+        except RuntimeError:
+            pass
+    assert len(attempts) == 2
+    assert flight.stats()["entries"] == 0 and flight.stats()["inflight"] == 0
+
+
+def test_disconnected_leader_does_not_cancel_followers():
+    flight, calls = PlanFlight(), []
+
+    async def main():
+        compute = counting_compute(calls, 0.1)
+        leader = asyncio.create_task(flight.run("k", compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run("k", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        plan, outcome = await follower
+        await asyncio.sleep(0)
+        return outcome
+
+    assert asyncio.run(main()) == "coalesced"
+    assert len(calls) == 1
+    assert flight.get("k") is not None
+
+
+def test_client_key_reused_for_other_intake_is_rejected():
+    flight, calls = PlanFlight(), []
+    key = request_key(1, make_input(), "abc")
+    first, other = intake_digest(make_input()), intake_digest(make_input("Work stress"))
+
+    async def main():
+        compute = counting_compute(calls, 0.05)
+        leader = asyncio.create_task(flight.run(key, compute, first))
+        await asyncio.sleep(0.01)
+        try:
+            await flight.run(key, compute, other)  # while the first is still running
+            assert False, "expected IdempotencyConflict"
+        except IdempotencyConflict:
+            pass
+        await leader
+
+    asyncio.run(main())
+    try:
+        asyncio.run(flight.run(key, counting_compute(calls), other))  # and after it finished
+        assert False, "expected IdempotencyConflict"
+    except IdempotencyConflict:
+        pass
+    plan, outcome = asyncio.run(flight.run(key, counting_compute(calls), first))
+    assert outcome == "replayed" and len(calls) == 1
+    assert flight.stats()["conflicts"] == 2
+
+
+if __name__ == "__main__":
+    test_keys_are_scoped_and_stable()
+    test_concurrent_repeats_share_one_run()
+    test_repeat_within_window_is_replayed()
+    test_failures_are_not_remembered()
+    test_disconnected_leader_does_not_cancel_followers()
+    test_client_key_reused_for_other_intake_is_rejected()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,124 @@
+"""
+Tests for the shared LLM gateway.
+Run with: python test_llm_gateway.py
+"""
+import asyncio
+import json
+import llmGateway
+from llmGateway import LLMGateway, StubBackend, TokenBucket, LLMUnavailable
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+def flaky(failures, exc=QuotaError):
+    calls = []
+
+    def responder(model, prompt):
+        calls.append(prompt)
+        if len(calls) <= failures:
+            raise exc("boom")
+        return '{"ok": true}'
+    return responder, calls
+
+
+def test_token_bucket_spaces_out_bursts():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_s=10, capacity=2, clock=lambda: now[0])
+    waits = [bucket.reserve() for _ in range(4)]
+    print(f"⏳ waits: {waits}")
+    assert waits[:2] == [0.0, 0.0]
+    assert abs(waits[2] - 0.1) < 1e-9 and abs(waits[3] - 0.2) < 1e-9
+    now[0] = 10
+    assert bucket.reserve() == 0.0
+
+
+def test_retries_quota_errors_then_succeeds():
+    original = llmGateway.backoff_delay
+    llmGateway.backoff_delay = lambda attempt: 0
+    try:
+        responder, calls = flaky(2)
+        gateway = LLMGateway(backend=StubBackend(responder), retries=2)
+        assert json.loads(asyncio.run(gateway.agenerate("hi", model="retry-test"))) == {"ok": True}
+        assert len(calls) == 3 and gateway.stats()["retried"] == 2
+
+        responder, calls = flaky(1)
+        gateway = LLMGateway(backend=StubBackend(responder), retries=2)
+        assert gateway.generate("hi", model="retry-test") == '{"ok": true}'
+    finally:
+        llmGateway.backoff_delay = original
+
+
+def test_client_errors_are_not_retried():
+    responder, calls = flaky(5, BadRequest)
+    gateway = LLMGateway(backend=StubBackend(responder), retries=3)
+    try:
+        asyncio.run(gateway.agenerate("hi", model="client-error-test"))
+        assert False, "expected BadRequest"
+    except BadRequest:
+        pass
+    assert len(calls) == 1 and gateway.stats()["failures"] == 1
+
+
+def test_per_model_concurrency_cap():
+    active, peak = [0], [0]
+
+    class SlowBackend(StubBackend):
+        async def agenerate(self, model, prompt, json_output, schema=None, template=None):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.02)
+            active[0] -= 1
+            return "{}"
+
+    gateway = LLMGateway(backend=SlowBackend(), max_concurrency=10, model_concurrency=3, burst=100)
+
+    async def main():
+        await asyncio.gather(*(gateway.agenerate(str(i)) for i in range(12)))
+
+    asyncio.run(main())
+    asyncio.run(main())  # a second event loop gets its own semaphores
+    print(f"📊 peak concurrency: {peak[0]}")
+    assert peak[0] == 3
+
+
+def test_unavailable_backend_raises():
+    class NoKey(StubBackend):
+        def available(self):
+            return False
+
+    gateway = LLMGateway(backend=NoKey())
+    try:
+        gateway.generate("hi")
+        assert False, "expected LLMUnavailable"
+    except LLMUnavailable:
+        pass
+
+
+def test_stub_backend_drives_classifier():
+    import classify
+    from test_classify_cache import make_input
+
+    original = classify.llm_gateway, classify.CLASSIFY_CACHE_ENABLED, classify.LOCAL_CLASSIFIER_ENABLED
+    classify.llm_gateway = LLMGateway(backend=StubBackend())
+    classify.CLASSIFY_CACHE_ENABLED = classify.LOCAL_CLASSIFIER_ENABLED = False
+    try:
+        scores = asyncio.run(classify.classify_user_text_async(make_input()))
+        assert scores["issue_type"] == "general_support" and scores["confidence"] == 0.5
+    finally:
+        classify.llm_gateway, classify.CLASSIFY_CACHE_ENABLED, classify.LOCAL_CLASSIFIER_ENABLED = original
+
+
+if __name__ == "__main__":
+    test_token_bucket_spaces_out_bursts()
+    test_retries_quota_errors_then_succeeds()
+    test_client_errors_are_not_retried()
+    test_per_model_concurrency_cap()
+    test_unavailable_backend_raises()
+    test_stub_backend_drives_classifier()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,146 @@
+"""
+Tests for the local classifier tier.
+Run with: python test_local_classifier.py
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlmodel import Session, SQLModel, create_engine
+import classify
+from localClassifier import LocalClassifier, load_training_rows, train, save_model, report
+from models import Assessment
+from schemas import UserAssessmentInput
+
+TEMPLATES = {
+    ("academic_stress", "soon", 2): ("Stress about exams", "I feel overwhelmed by exams, assignments and deadlines", "I can't focus on studying"),
+    ("work_stress", "routine", 2): ("Burnout at my job", "My job and my manager drain me every shift", "I dread going to work"),
+    ("relationship", "soon", 3): ("Breakup with my partner", "My partner left and we keep arguing over texts", "I cry about the relationship"),
+    ("crisis_safety", "immediate_crisis", 5): ("I can't go on", "Everything feels hopeless and dark", "I stopped eating and sleeping"),
+}
+
+
+def make_rows(per_class=20):
+    rows, start = [], datetime(2025, 1, 1)
+    for n in range(per_class):
+        for (issue, urgency, severity), (concern, distress, functioning) in TEMPLATES.items():
+            rows.append(SimpleNamespace(
+                raw_primary_concern=concern,
+                raw_distress=f"{distress} week {n}",
+                raw_functioning=functioning,
+                raw_urgency="Sometime soon would be good",
+                raw_safety="I am safe",
+                raw_constraints="No car",
+                issue_type=issue,
+                urgency=urgency,
+                severity_score=severity,
+                created_at=start + timedelta(minutes=len(rows)),
+            ))
+    return rows
+
+
+def make_input(concern, distress, functioning, safety="I am safe"):
+    return UserAssessmentInput(
+        primary_concern=concern,
+        answer_distress=distress,
+        answer_functioning=functioning,
+        answer_urgency="Sometime soon would be good",
+        answer_safety=safety,
+        answer_constraints="No car",
+    )
+
+
+def trained_classifier(threshold=0.6):
+    path = os.path.join(tempfile.mkdtemp(), "local.npz")
+    save_model(train(make_rows()), path)
+    return LocalClassifier(path, threshold=threshold)
+
+
+def test_routine_intake_handled_locally():
+    clf = trained_classifier()
+    result = clf.classify(make_input(*TEMPLATES[("academic_stress", "soon", 2)]))
+    print(f"🧮 {result}")
+    assert result["issue_type"] == "academic_stress" and result["severity_score"] == 2
+    assert result["confidence"] >= 0.6 and result["personalized_note"]
+
+
+def test_high_risk_and_uncertain_escalate():
+    clf = trained_classifier()
+    assert clf.classify(make_input(*TEMPLATES[("crisis_safety", "immediate_crisis", 5)])) is None
+    assert clf.classify(make_input(*TEMPLATES[("work_stress", "routine", 2)], safety="not sure")) is None
+    assert clf.stats()["escalated"] == 1
+
+
+def test_low_confidence_escalates():
+    clf = trained_classifier(threshold=0.999)
+    assert clf.classify(make_input("Something else entirely", "Hard to describe", "Mixed days")) is None
+
+
+def test_missing_artifact_is_unavailable():
+    clf = LocalClassifier(os.path.join(tempfile.mkdtemp(), "missing.npz"))
+    assert not clf.available()
+    assert clf.classify(make_input(*TEMPLATES[("academic_stress", "soon", 2)])) is None
+
+
+def test_report_on_unseen_rows():
+    clf = trained_classifier()
+    later = make_rows(per_class=3)
+    for r in later:
+        r.created_at += timedelta(days=365)
+    result = report(clf, later)
+    print(f"📊 {result}")
+    assert result["rows"] == len(later)
+    assert result["agreement"]["issue_type"] >= 0.9
+    assert 0 < result["local_coverage"] <= 0.75   # crisis rows are never kept locally
+
+
+def test_cascade_skips_gemini_when_confident():
+    calls = []
+
+    async def fake_gemini(input):
+        calls.append(input)
+        return {}
+
+    original_clf, original_gemini = classify.local_classifier, classify.classify_with_gemini_async
+    classify.local_classifier = trained_classifier()
+    classify.classify_with_gemini_async = fake_gemini
+    try:
+        import asyncio
+        result = asyncio.run(classify.classify_user_text_async(make_input(*TEMPLATES[("relationship", "soon", 3)])))
+        assert result["issue_type"] == "relationship"
+        assert result["source"] == "local"
+        assert calls == []
+    finally:
+        classify.local_classifier, classify.classify_with_gemini_async = original_clf, original_gemini
+
+
+def test_trains_only_on_gemini_labels():
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'labels.db')}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for n, source in enumerate(["gemini", "local", "cache", "crisis", "fallback", "gemini"]):
+            row = make_rows(per_class=1)[0]
+            session.add(Assessment(
+                user_id=1, raw_primary_concern=row.raw_primary_concern, raw_distress=row.raw_distress,
+                raw_functioning=row.raw_functioning, raw_urgency=row.raw_urgency, raw_safety=row.raw_safety,
+                raw_constraints=row.raw_constraints, issue_type=row.issue_type, urgency=row.urgency,
+                severity_score=row.severity_score, needs_immediate_resources=False, confidence=0.9,
+                reasoning="", personalized_note="", classification_source=source,
+            ))
+        session.commit()
+    engine.dispose()
+    rows = load_training_rows(url)
+    assert len(rows) == 2
+    assert {r.classification_source for r in rows} == {"gemini"}
+
+
+if __name__ == "__main__":
+    test_routine_intake_handled_locally()
+    test_high_risk_and_uncertain_escalate()
+    test_low_confidence_escalates()
+    test_missing_artifact_is_unavailable()
+    test_report_on_unseen_rows()
+    test_cascade_skips_gemini_when_confident()
+    test_trains_only_on_gemini_labels()
+    print("ALL TESTS COMPLETED")
@@ -1,5 +1,8 @@
+import asyncio
 import json
 import os
+import time
+import locationsFinder
 from schemas import UserAssessmentInput, AssessmentScores
 from locationsFinder import get_nearby_resources, pick_best_resources, generate_resource_list
 
@@ -68,9 +71,57 @@ def test_full_resource_flow():
         print(f"    Note: {res.get('description', 'No description available.')}")
 
 
+def run_fallback_chain(mode, responses_by_keyword, delay=0.2):
+    """Runs get_nearby_resources_async against a fake Places search with fixed latency."""
+    calls = []
+
+    async def fake_search(lat, lng, keyword):
+        calls.append(keyword)
+        await asyncio.sleep(delay)
+        return responses_by_keyword.get(keyword, [])
+
+    original = (locationsFinder._places_nearby_search_async, locationsFinder.PLACES_FALLBACK_MODE)
+    locationsFinder._places_nearby_search_async = fake_search
+    locationsFinder.PLACES_FALLBACK_MODE = mode
+    try:
+        assessment = AssessmentScores(
+            issue_type="grief_loss", urgency="soon", severity_score=2, needs_immediate_resources=False,
+            confidence=0.9, reasoning="Recent loss.", personalized_note="We're sorry for your loss."
+        )
+        start = time.perf_counter()
+        results = asyncio.run(locationsFinder.get_nearby_resources_async(UserAssessmentInput(**MOCK_DATA), assessment))
+        return results, calls, time.perf_counter() - start
+    finally:
+        locationsFinder._places_nearby_search_async, locationsFinder.PLACES_FALLBACK_MODE = original
+
+
+def test_parallel_fallback_is_one_round_trip():
+    only_broadest = {"mental health": [{"name": "Broad"}]}
+    _, _, sequential_time = run_fallback_chain("sequential", only_broadest)
+    results, calls, parallel_time = run_fallback_chain("parallel", only_broadest)
+    print(f"⏱️ sequential={sequential_time:.2f}s parallel={parallel_time:.2f}s calls={calls}")
+    assert results == [{"name": "Broad"}]
+    assert sequential_time > 0.55
+    assert parallel_time < 0.35
+
+
+def test_most_specific_keyword_wins():
+    all_hit = {"grief counseling": [{"name": "Specific"}], "counseling": [{"name": "Broader"}], "mental health": [{"name": "Broad"}]}
+    results, _, _ = run_fallback_chain("parallel", all_hit)
+    assert results == [{"name": "Specific"}]
+
+    # Hedged: a fast specific hit never triggers the fallbacks
+    results, calls, _ = run_fallback_chain("hedged", all_hit, delay=0.05)
+    print(f"🎯 hedged calls={calls}")
+    assert results == [{"name": "Specific"}]
+    assert calls == ["grief counseling"]
+
+
 if __name__ == "__main__":
     # Ensure your API keys are actually in your environment or hardcode them in locationsFinder.py for this test
     try:
         test_full_resource_flow()
+        test_parallel_fallback_is_one_round_trip()
+        test_most_specific_keyword_wins()
     except Exception as e:
         print(f"❌ Test Failed: {e}")
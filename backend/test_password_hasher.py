@@ -0,0 +1,134 @@
+"""
+Tests for the dedicated bcrypt pool.
+Run with: python test_password_hasher.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+import httpx
+from passlib.context import CryptContext
+from sqlmodel import select
+import database
+import main
+from authCache import principal_cache, revocations
+from models import User
+from passwordHasher import HashingBusy, PasswordHasher
+
+FAST = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5)
+OLD = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+
+
+def test_event_loop_keeps_running_during_a_burst():
+    hasher = PasswordHasher(workers=2, max_waiting=16, context=CryptContext(schemes=["bcrypt"], bcrypt__rounds=10))
+
+    async def scenario():
+        gaps, stop = [], False
+
+        async def ticker():
+            last = time.perf_counter()
+            while not stop:
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        tick = asyncio.create_task(ticker())
+        hashes = await asyncio.gather(*[hasher.hash(f"pw{i}") for i in range(8)])
+        stop = True
+        await tick
+        return hashes, max(gaps)
+
+    hashes, worst_gap = asyncio.run(scenario())
+    stats = hasher.stats()
+    print(f"⏱️ 8 hashes, worst loop stall {worst_gap * 1000:.1f}ms, mean wait {stats['mean_wait_ms']}ms, hash {stats['mean_hash_ms']}ms")
+    assert len(set(hashes)) == 8 and stats["completed"] == 8 and stats["peak_waiting"] >= 1
+    assert worst_gap < 0.05
+
+
+def test_burst_beyond_the_queue_is_shed():
+    slow = CryptContext(schemes=["bcrypt"], bcrypt__rounds=10)
+    hasher = PasswordHasher(workers=1, max_waiting=2, context=slow)
+    stored = slow.hash("pw")
+
+    async def scenario():
+        return await asyncio.gather(*[hasher.verify("guess", stored) for _ in range(6)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    shed = [r for r in results if isinstance(r, HashingBusy)]
+    # One running + two queued at most; the rest are turned away immediately
+    assert len(shed) >= 3 and hasher.stats()["rejected"] == len(shed)
+    assert all(r == (False, None) for r in results if not isinstance(r, HashingBusy))
+    assert hasher.stats()["waiting"] == 0
+
+
+def test_login_rehashes_outdated_cost_factor():
+    database.configure(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'rehash.db')}")
+    principal_cache.clear()
+    revocations.clear()
+    original = main.password_hasher
+    main.password_hasher = PasswordHasher(context=FAST)
+
+    async def scenario():
+        await database.create_db_and_tables()
+        async with database.new_session() as session:
+            session.add(User(email="old@b.ca", hashed_password=OLD.hash("pw")))
+            await session.commit()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = [(await client.post("/api/login", data={"username": "old@b.ca", "password": "pw"})).status_code for _ in range(2)]
+        async with database.new_session() as session:
+            stored = (await session.exec(select(User.hashed_password))).one()
+        await database.dispose_db()
+        return statuses, stored
+
+    try:
+        statuses, stored = asyncio.run(scenario())
+        rehashed = main.password_hasher.stats()["rehashed"]
+    finally:
+        main.password_hasher = original
+    assert statuses == [200, 200]
+    assert stored.startswith("$2b$05$") and FAST.verify("pw", stored)
+    assert rehashed == 1  # the second login already found the new cost
+
+
+def test_login_holds_no_db_connection_while_hashing():
+    database.configure(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pool.db')}")
+    principal_cache.clear()
+    revocations.clear()
+    checked_out = []
+
+    class PoolProbe(PasswordHasher):
+        async def verify(self, password, hashed):
+            checked_out.append(database.get_engine().pool.checkedout())
+            return await super().verify(password, hashed)
+
+    original = main.password_hasher
+    main.password_hasher = PoolProbe(context=FAST)
+
+    async def scenario():
+        await database.create_db_and_tables()
+        async with database.new_session() as session:
+            session.add(User(email="a@b.ca", hashed_password=FAST.hash("pw")))
+            await session.commit()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = [(await client.post("/api/login", data={"username": "a@b.ca", "password": pw})).status_code
+                        for pw in ("pw", "wrong")]
+        await database.dispose_db()
+        return statuses
+
+    try:
+        statuses = asyncio.run(scenario())
+    finally:
+        main.password_hasher = original
+    assert statuses == [200, 401]
+    assert checked_out == [0, 0]
+
+
+if __name__ == "__main__":
+    test_event_loop_keeps_running_during_a_burst()
+    test_burst_beyond_the_queue_is_shed()
+    test_login_rehashes_outdated_cost_factor()
+    test_login_holds_no_db_connection_while_hashing()
+    print("ALL TESTS COMPLETED")
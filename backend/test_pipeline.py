@@ -0,0 +1,196 @@
+"""
+Checks that the generate-plan pipeline overlaps its stages.
+Run with: python test_pipeline.py
+"""
+import asyncio
+import time
+import pipeline
+from deadline import Deadline, STAGE_BUDGETS_S
+from schemas import UserAssessmentInput
+
+STAGE_DELAY = 0.2
+
+MOCK_INPUT = UserAssessmentInput(
+    primary_concern="I've been feeling very anxious lately",
+    answer_distress="I feel overwhelmed and worried most days",
+    answer_functioning="I can still go to work but it's getting harder to focus",
+    answer_urgency="I'd like help soon but it's not an emergency",
+    answer_safety="I am safe, no thoughts of self-harm",
+    answer_constraints="I prefer online or phone support",
+    latitude=44.2262,
+    longitude=-76.4916
+)
+
+MOCK_SCORES = {
+    "issue_type": "mental_health",
+    "urgency": "soon",
+    "severity_score": 2,
+    "needs_immediate_resources": False,
+    "confidence": 0.9,
+    "reasoning": "Anxiety affecting focus at work.",
+    "personalized_note": "Thank you for reaching out."
+}
+
+
+async def fake_classify(data):
+    await asyncio.sleep(STAGE_DELAY)
+    return dict(MOCK_SCORES)
+
+
+async def fake_places(data, scores):
+    await asyncio.sleep(STAGE_DELAY)
+    return [{"name": "Clinic A", "vicinity": "1 Main St"}]
+
+
+async def fake_pick(data, scores, raw_places):
+    await asyncio.sleep(STAGE_DELAY)
+    return [{"name": "Clinic A", "type": "Facility", "description": "Close by", "data": "1 Main St"}]
+
+
+async def fake_exercises(scores):
+    await asyncio.sleep(STAGE_DELAY * 2)
+    return [{"title": "Box Breathing", "steps": ["Inhale 4s"], "benefit": "Calms"}]
+
+
+FAKES = {
+    "classify_user_text_async": fake_classify,
+    "classify_with_gemini_async": fake_classify,
+    "get_nearby_resources_async": fake_places,
+    "pick_best_resources_async": fake_pick,
+    "generate_exercise_toolbox_async": fake_exercises,
+}
+
+
+def run_with_fakes(coro_fn, *args, overrides=None):
+    fakes = {**FAKES, **(overrides or {})}
+    originals = {name: getattr(pipeline, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(pipeline, name, fake)
+    try:
+        return asyncio.run(coro_fn(*args))
+    finally:
+        for name, original in originals.items():
+            setattr(pipeline, name, original)
+
+
+def test_build_plan_runs_branches_concurrently():
+    start = time.perf_counter()
+    plan = run_with_fakes(pipeline.build_plan, MOCK_INPUT, 1)
+    elapsed = time.perf_counter() - start
+
+    # classify (1 delay) + max(places→pick (2 delays), exercises (2 delays))
+    print(f"⏱️ build_plan took {elapsed:.2f}s")
+    assert elapsed < STAGE_DELAY * 3.8
+    assert plan.scores.issue_type == "mental_health"
+    assert plan.recommended_pathway[-1]["name"] == "Clinic A"
+    assert len(plan.exercises) == 1
+
+
+async def collect_events(data):
+    start = time.perf_counter()
+    events = []
+    async for event in pipeline.plan_events(data, 1):
+        events.append((event["event"], time.perf_counter() - start, event))
+    return events
+
+
+def test_plan_events_streams_scores_first():
+    events = run_with_fakes(collect_events, MOCK_INPUT)
+    names = [name for name, _, _ in events]
+    print(f"📡 Events: {names}")
+
+    assert names[0] == "scores"
+    assert names[-1] == "complete"
+    assert set(names[1:3]) == {"local_resources", "exercises"}
+
+    # Safety net must be available after a single classify round trip
+    _, first_at, first = events[0]
+    assert first_at < STAGE_DELAY * 1.8
+    assert first["static_resources"]
+
+
+def test_crisis_intake_skips_llm_wait():
+    crisis_input = MOCK_INPUT.model_copy(update={"answer_safety": "I'm not sure I'm safe, having self-harm thoughts"})
+    events = run_with_fakes(collect_events, crisis_input)
+    names = [name for name, _, _ in events]
+    print(f"📡 Events: {names}")
+
+    _, first_at, first = events[0]
+    assert first_at < STAGE_DELAY * 0.5
+    assert first["scores"].urgency == "immediate_crisis"
+    assert any(res["data"] == "9-8-8" for res in first["static_resources"])
+
+    # The LLM wording arrives later but never downgrades the routing
+    assert "scores_enriched" in names
+    plan = events[-1][2]["plan"]
+    assert plan.scores.urgency == "immediate_crisis"
+    assert plan.scores.personalized_note == MOCK_SCORES["personalized_note"]
+
+
+async def hang(*args):
+    await asyncio.sleep(30)
+
+
+def test_build_plan_does_not_wait_for_crisis_enrichment():
+    crisis_input = MOCK_INPUT.model_copy(update={"answer_safety": "I'm not sure I'm safe, having self-harm thoughts"})
+    calls = []
+
+    async def slow_enrichment(data):
+        calls.append(data)
+        await asyncio.sleep(30)
+
+    start = time.perf_counter()
+    plan = run_with_fakes(pipeline.build_plan, crisis_input, 1, overrides={"classify_with_gemini_async": slow_enrichment})
+    elapsed = time.perf_counter() - start
+
+    print(f"⏱️ crisis build_plan took {elapsed:.2f}s")
+    assert elapsed < STAGE_DELAY * 3
+    assert calls == []  # the one-shot endpoint never starts the wording call
+    assert plan.scores.urgency == "immediate_crisis"
+
+
+def test_slow_stages_degrade_within_deadline():
+    budgets = dict(STAGE_BUDGETS_S)
+    STAGE_BUDGETS_S.update({stage: 0.1 for stage in STAGE_BUDGETS_S}, places=STAGE_DELAY * 2)
+    try:
+        start = time.perf_counter()
+        plan = run_with_fakes(
+            pipeline.build_plan, MOCK_INPUT, 1,
+            overrides={"classify_user_text_async": hang, "pick_best_resources_async": hang, "generate_exercise_toolbox_async": hang},
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        STAGE_BUDGETS_S.update(budgets)
+
+    print(f"⏱️ degraded plan in {elapsed:.2f}s: {plan.degraded_stages}")
+    assert elapsed < STAGE_DELAY * 4
+    assert set(plan.degraded_stages) == {"classify", "selection", "exercises"}
+    assert plan.scores.confidence == 0.0
+    assert plan.recommended_pathway[-1]["name"] == "Clinic A"  # ranker pick instead of Gemini's
+    assert len(plan.exercises) == 3
+
+
+def test_total_deadline_caps_every_stage():
+    events = run_with_fakes(
+        lambda data: collect_events_with_deadline(data, Deadline(total_s=STAGE_DELAY * 4)), MOCK_INPUT,
+        overrides={"get_nearby_resources_async": hang},
+    )
+    plan = events[-1][2]["plan"]
+    assert events[-1][1] < STAGE_DELAY * 5
+    assert plan.degraded_stages == ["places"]
+    assert plan.exercises  # the exercises branch still finished in time
+
+
+async def collect_events_with_deadline(data, deadline):
+    start = time.perf_counter()
+    return [(e["event"], time.perf_counter() - start, e) async for e in pipeline.plan_events(data, 1, deadline)]
+
+
+if __name__ == "__main__":
+    test_build_plan_runs_branches_concurrently()
+    test_plan_events_streams_scores_first()
+    test_crisis_intake_skips_llm_wait()
+    test_build_plan_does_not_wait_for_crisis_enrichment()
+    test_slow_stages_degrade_within_deadline()
+    test_total_deadline_caps_every_stage()
+    print("✅ Pipeline stages overlap")
@@ -0,0 +1,79 @@
+"""
+Tests for the geo-tiled Places cache.
+Run with: python test_places_cache.py
+"""
+import locationsFinder
+from placesCache import PlacesCache, geohash_encode, geohash_bounds, cell_query, haversine_m, places_cache
+
+
+def make_place(name, lat, lng):
+    return {"name": name, "vicinity": f"{name} St", "geometry": {"location": {"lat": lat, "lng": lng}}, "photos": ["big"]}
+
+
+def test_geohash_round_trip():
+    cell = geohash_encode(57.64911, 10.40744, 11)
+    print(f"🔢 geohash: {cell}")
+    assert cell == "u4pruydqqvj"
+    min_lat, max_lat, min_lng, max_lng = geohash_bounds(cell[:6])
+    assert min_lat <= 57.64911 <= max_lat and min_lng <= 10.40744 <= max_lng
+
+
+def test_cell_query_covers_whole_cell():
+    cell = geohash_encode(44.2262, -76.4916)
+    c_lat, c_lng, radius = cell_query(cell, 5000)
+    min_lat, max_lat, min_lng, max_lng = geohash_bounds(cell)
+    # Any point in the cell plus 5km stays inside the superset circle
+    assert haversine_m(c_lat, c_lng, max_lat, max_lng) + 5000 <= radius + 1e-6
+
+
+def test_ttl_and_lru_eviction():
+    now = [0.0]
+    cache = PlacesCache(max_entries=2, ttl_s=10, clock=lambda: now[0])
+    cache.put("a", "counseling", [make_place("A", 0, 0)])
+    cache.put("b", "counseling", [])
+    assert cache.get("a", "Counseling")[0]["name"] == "A"
+    assert "photos" not in cache.get("a", "counseling")[0]
+
+    cache.put("c", "counseling", [])  # evicts "b", the least recently used
+    assert cache.get("b", "counseling") is None
+    assert cache.get("a", "counseling") is not None
+
+    now[0] = 11
+    assert cache.get("a", "counseling") is None
+    stats = cache.stats()
+    print(f"📊 {stats}")
+    assert stats["evictions"] == 1 and stats["expirations"] == 1 and stats["hits"] == 3
+
+
+def test_nearby_users_share_one_fetch():
+    calls = []
+    lat, lng = 44.2262, -76.4916
+    near = make_place("Near", lat + 0.01, lng)   # ~1.1km away
+    far = make_place("Far", lat + 0.06, lng)     # ~6.7km away
+
+    def fake_fetch(c_lat, c_lng, keyword, radius):
+        calls.append((c_lat, c_lng, keyword, radius))
+        return [near, far], True
+
+    original = locationsFinder._fetch_places
+    locationsFinder._fetch_places = fake_fetch
+    places_cache.clear()
+    try:
+        first = locationsFinder._places_nearby_search(lat, lng, "mental health clinic")
+        second = locationsFinder._places_nearby_search(lat + 0.0005, lng + 0.0005, "mental health clinic")
+    finally:
+        locationsFinder._fetch_places = original
+        places_cache.clear()
+
+    print(f"🗺️ upstream calls: {len(calls)}")
+    assert len(calls) == 1
+    assert [p["name"] for p in first] == ["Near"]
+    assert [p["name"] for p in second] == ["Near"]
+
+
+if __name__ == "__main__":
+    test_geohash_round_trip()
+    test_cell_query_covers_whole_cell()
+    test_ttl_and_lru_eviction()
+    test_nearby_users_share_one_fetch()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,158 @@
+"""
+Tests for content-addressed plan storage.
+Run with: python test_plan_store.py
+"""
+import asyncio
+import os
+import tempfile
+from sqlalchemy import delete, func
+from sqlmodel import select
+import database
+import planStore
+from assessmentWriter import AssessmentWriter, build_assessment
+from exerciseLibrary import canned_toolbox
+from history import assessment_detail
+from locationsFinder import generate_resource_list
+from models import Assessment, PlanBlob, User
+from schemas import AssessmentScores, FinalPlan
+from test_classify_cache import make_input
+
+DB_DIR = tempfile.mkdtemp()
+
+
+def make_plan(i, issue_type="mental_health"):
+    scores = AssessmentScores(
+        issue_type=issue_type, urgency="soon", severity_score=1 + i % 3,
+        needs_immediate_resources=False, confidence=0.9, reasoning=f"reason {i}", personalized_note=f"note {i}",
+    )
+    pathway = generate_resource_list(scores) + [{"name": f"Clinic {i}", "type": "Local Clinic", "data": f"{i} Main St"}]
+    return FinalPlan(scores=scores, recommended_pathway=pathway, exercises=canned_toolbox(scores.severity_score))
+
+
+async def fresh_db(name):
+    database.configure(f"sqlite:///{os.path.join(DB_DIR, name)}")
+    await database.create_db_and_tables()
+    async with database.new_session() as session:
+        session.add(User(email=f"{name}@b.ca", hashed_password="x"))
+        await session.commit()
+
+
+async def blob_count():
+    async with database.new_session() as session:
+        return (await session.exec(select(func.count()).select_from(PlanBlob))).one()
+
+
+def test_split_and_join_round_trip():
+    plan = make_plan(1).dict()
+    manifest, blobs = planStore.split_plan(plan)
+    decoded = {digest: planStore.decode_blob(codec, data) for digest, (codec, data, _) in blobs.items()}
+    assert planStore.is_manifest(manifest) and not planStore.is_manifest(plan)
+    assert planStore.join_plan(manifest, decoded) == plan
+    assert manifest["scores"] == plan["scores"]  # per-user parts stay inline
+    # Same content, same hash, whatever the key order
+    assert planStore.encode_blob({"a": 1, "b": 2})[0] == planStore.encode_blob({"b": 2, "a": 1})[0]
+
+
+def test_large_components_are_compressed():
+    codec, data, size = planStore.encode_blob(canned_toolbox(3) * 3)[1:]
+    assert codec == "zlib" and len(data) < size
+    assert planStore.encode_blob({"name": "x"})[1] == "raw"
+
+
+def test_shared_components_are_stored_once():
+    plans = [make_plan(i) for i in range(60)]
+
+    async def scenario():
+        await fresh_db("dedupe.db")
+        writer = AssessmentWriter()
+        await asyncio.gather(*[writer.submit(build_assessment(1, make_input(), plan)) for plan in plans])
+        await writer.stop()
+        async with database.new_session() as session:
+            ids = (await session.exec(select(Assessment.id).order_by(Assessment.id))).all()
+            stored = (await session.exec(select(Assessment.full_plan_json).where(Assessment.id == ids[0]))).one()
+        planStore.blob_cache._items.clear()
+        details = [await assessment_detail(1, assessment_id) for assessment_id in ids]
+        blobs = await blob_count()
+        await database.dispose_db()
+        return details, blobs, stored
+
+    details, blobs, stored = asyncio.run(scenario())
+    inline = len(planStore.canonical_json(plans[0].dict()))
+    print(f"🧩 60 plans -> {blobs} blobs; row keeps {len(planStore.canonical_json(stored))} of {inline} bytes")
+    # 60 distinct clinics + the shared helplines + 3 canned toolboxes
+    assert blobs < 60 + 10
+    assert [d["full_plan_json"] for d in details] == [p.dict() for p in plans]
+
+
+def test_migrate_converts_legacy_rows():
+    plans = [make_plan(i, "substance_use") for i in range(10)]
+
+    async def scenario():
+        await fresh_db("legacy.db")
+        async with database.new_session() as session:
+            session.add_all([Assessment(**build_assessment(1, make_input(), plan)) for plan in plans])
+            await session.commit()
+        converted = await planStore.migrate(batch_size=4)
+        again = await planStore.migrate()
+        details = [await assessment_detail(1, i) for i in range(1, 11)]
+        await database.dispose_db()
+        return converted, again, details
+
+    converted, again, details = asyncio.run(scenario())
+    assert converted == 10 and again == 0
+    assert [d["full_plan_json"] for d in details] == [p.dict() for p in plans]
+
+
+def test_gc_removes_only_unreferenced_blobs():
+    async def scenario():
+        await fresh_db("gc.db")
+        async with database.new_session() as session:
+            session.add(User(email="two@b.ca", hashed_password="x"))
+            await session.commit()
+        writer = AssessmentWriter()
+        for user_id in (1, 2):
+            for i in range(3):
+                await writer.submit(build_assessment(user_id, make_input(), make_plan(user_id * 10 + i)))
+        await writer.stop()
+        before = await blob_count()
+        async with database.new_session() as session:
+            mine = (await session.exec(select(Assessment.full_plan_json).where(Assessment.user_id == 1))).all()
+            await session.execute(delete(Assessment).where(Assessment.user_id == 1))
+            await session.commit()
+        within_grace = await planStore.collect_garbage(planStore.plan_hashes(mine))
+        targeted = await planStore.collect_garbage(planStore.plan_hashes(mine), grace_s=0)
+        again = await planStore.collect_garbage(grace_s=0)
+        planStore.blob_cache._items.clear()
+        async with database.new_session() as session:
+            ids = (await session.exec(select(Assessment.id).where(Assessment.user_id == 2))).all()
+        details = [await assessment_detail(2, assessment_id) for assessment_id in ids]
+        after = await blob_count()
+        await database.dispose_db()
+        return within_grace, before, targeted, again, after, details
+
+    within_grace, before, targeted, again, after, details = asyncio.run(scenario())
+    assert within_grace == 0  # just written: a writer could still be committing rows that use them
+    assert targeted == 3  # user 1's three clinics; shared helplines and toolboxes stay
+    assert again == 0 and after == before - 3
+    assert [d["full_plan_json"] for d in details] == [make_plan(20 + i).dict() for i in range(3)]
+
+
+def test_missing_blobs_do_not_fail_the_read():
+    plan = make_plan(1).dict()
+    manifest, blobs = planStore.split_plan(plan)
+    decoded = {digest: planStore.decode_blob(codec, data) for digest, (codec, data, _) in blobs.items()}
+    clinic = manifest["recommended_pathway"][-1]
+    del decoded[clinic], decoded[manifest["exercises"]]
+    joined = planStore.join_plan(manifest, decoded)
+    assert joined["recommended_pathway"] == plan["recommended_pathway"][:-1]
+    assert joined["exercises"] == []
+
+
+if __name__ == "__main__":
+    test_split_and_join_round_trip()
+    test_large_components_are_compressed()
+    test_shared_components_are_stored_once()
+    test_migrate_converts_legacy_rows()
+    test_gc_removes_only_unreferenced_blobs()
+    test_missing_blobs_do_not_fail_the_read()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,136 @@
+"""
+Tests for versioned prompt templates and Gemini context caching.
+Run with: python test_prompts.py
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import classify
+import pipeline
+from llmGateway import GeminiBackend, LLMGateway, StubBackend
+from prompts import CLASSIFY_PROMPT, PromptTemplate, SELECTION_PROMPT
+from test_classify_cache import make_input
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeModels:
+    def __init__(self, stale_caches=()):
+        self.configs = []
+        self.stale_caches = set(stale_caches)
+
+    def generate_content(self, model, contents, config):
+        self.configs.append(config)
+        if config.get("cached_content") in self.stale_caches:
+            raise APIError(404)
+        return SimpleNamespace(text='{"ok": true}')
+
+
+class FakeCaches:
+    def __init__(self, fail=False, delay_s=0.0):
+        self.created = []
+        self.fail = fail
+        self.delay_s = delay_s
+        self.aio = SimpleNamespace(caches=SimpleNamespace(create=self.acreate))
+
+    def create(self, model, config):
+        time.sleep(self.delay_s)  # a slow create widens the race window
+        if self.fail:
+            raise APIError(400)  # e.g. instruction below the minimum cacheable size
+        self.created.append(config["display_name"])
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def acreate(self, model, config):
+        await asyncio.sleep(self.delay_s)
+        self.created.append(config["display_name"])
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+
+def fake_backend(**options):
+    backend = GeminiBackend.__new__(GeminiBackend)
+    backend._caches = {}
+    backend._cache_locks, backend._cache_locks_guard, backend._cache_inflight = {}, threading.Lock(), {}
+    caches = FakeCaches(options.get("fail", False), options.get("delay_s", 0.0))
+    backend.client = SimpleNamespace(models=FakeModels(options.get("stale", ())), caches=caches, aio=caches.aio)
+    return backend
+
+
+def test_payload_is_small_and_versioned():
+    payload = classify._build_prompt(make_input())
+    print(f"📏 system {len(CLASSIFY_PROMPT.system)} chars, payload {len(payload)} chars")
+    assert "DECISION RULES" in CLASSIFY_PROMPT.system and "DECISION RULES" not in payload
+    assert payload.startswith("INTAKE DATA:")
+    assert CLASSIFY_PROMPT.tag.startswith("v2-")
+
+    edited = PromptTemplate("classify", 2, CLASSIFY_PROMPT.system + "extra rule")
+    assert edited.fingerprint != CLASSIFY_PROMPT.fingerprint
+
+
+def test_static_instruction_is_context_cached():
+    backend = fake_backend()
+    for _ in range(3):
+        backend.generate("gemini-2.5-flash", "payload", True, template=SELECTION_PROMPT)
+    configs = backend.client.models.configs
+    assert backend.client.caches.created == [SELECTION_PROMPT.key]
+    assert all(c["cached_content"] == "cachedContents/1" and "system_instruction" not in c for c in configs)
+
+
+def test_uncacheable_instruction_falls_back_to_system_instruction():
+    backend = fake_backend(fail=True)
+    for _ in range(2):
+        backend.generate("gemini-2.5-flash", "payload", True, template=CLASSIFY_PROMPT)
+    configs = backend.client.models.configs
+    assert all(c["system_instruction"] == CLASSIFY_PROMPT.system and "cached_content" not in c for c in configs)
+    assert backend._caches[("gemini-2.5-flash", CLASSIFY_PROMPT.key)][0] is None  # not retried on every call
+
+
+def test_stale_cache_is_dropped_and_resent_inline():
+    backend = fake_backend(stale=["cachedContents/1"])
+    assert backend.generate("gemini-2.5-flash", "payload", True, template=CLASSIFY_PROMPT) == '{"ok": true}'
+    assert backend.client.models.configs[-1]["system_instruction"] == CLASSIFY_PROMPT.system
+    assert ("gemini-2.5-flash", CLASSIFY_PROMPT.key) not in backend._caches
+
+
+def test_plan_records_prompt_versions():
+    original = classify.llm_gateway, classify.CLASSIFY_CACHE_ENABLED, classify.LOCAL_CLASSIFIER_ENABLED
+    classify.llm_gateway = LLMGateway(backend=StubBackend())
+    classify.CLASSIFY_CACHE_ENABLED = classify.LOCAL_CLASSIFIER_ENABLED = False
+    try:
+        plan = asyncio.run(pipeline.build_plan(make_input(), 1))
+    finally:
+        classify.llm_gateway, classify.CLASSIFY_CACHE_ENABLED, classify.LOCAL_CLASSIFIER_ENABLED = original
+    print(f"🏷️ {plan.prompt_versions}")
+    assert plan.prompt_versions == {"classify": CLASSIFY_PROMPT.tag}
+
+
+def test_concurrent_first_calls_create_one_cache():
+    backend = fake_backend(delay_s=0.05)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        names = list(pool.map(lambda _: backend._cached_name("gemini-2.5-flash", SELECTION_PROMPT), range(8)))
+    assert backend.client.caches.created == [SELECTION_PROMPT.key]
+    assert set(names) == {"cachedContents/1"}
+
+    backend = fake_backend(delay_s=0.05)
+
+    async def burst():
+        return await asyncio.gather(*[backend._acached_name("gemini-2.5-flash", SELECTION_PROMPT) for _ in range(8)])
+    names = asyncio.run(burst())
+    assert backend.client.caches.created == [SELECTION_PROMPT.key]
+    assert set(names) == {"cachedContents/1"}
+    assert backend._cache_inflight == {}
+
+
+if __name__ == "__main__":
+    test_payload_is_small_and_versioned()
+    test_static_instruction_is_context_cached()
+    test_uncacheable_instruction_falls_back_to_system_instruction()
+    test_stale_cache_is_dropped_and_resent_inline()
+    test_plan_records_prompt_versions()
+    test_concurrent_first_calls_create_one_cache()
+    print("ALL TESTS COMPLETED")
@@ -0,0 +1,50 @@
+import re
+import zlib
+import numpy as np
+from schemas import UserAssessmentInput
+from crisisDetector import INTAKE_FIELDS
+
+# --- Hashing vectorizer for intake text ---
+# Unigrams + bigrams hashed (crc32, stable across processes) into a fixed-size,
+# signed, sublinear-tf, L2-normalised float32 vector. No vocabulary to fit or ship.
+
+HASH_DIM = 2048
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "i", "i'm", "im", "me", "my", "is", "am", "are", "was", "be",
+    "been", "to", "of", "in", "on", "at", "for", "with", "it", "its", "that", "this", "so", "just",
+    "have", "has", "had", "do", "does", "lately", "really", "very", "some", "also",
+}
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def normalize_intake(input: UserAssessmentInput) -> str:
+    """Lower-cased, whitespace-collapsed text of the six intake answers."""
+    text = " \n ".join((getattr(input, field) or "") for field in INTAKE_FIELDS)
+    return re.sub(r"\s+", " ", text.lower().replace("’", "'")).strip()
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def hash_features(tokens: list) -> list:
+    """Unigram and bigram features."""
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def hash_vector(text: str, dim: int = HASH_DIM) -> np.ndarray:
+    """L2-normalised hashed bag of n-grams."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature in hash_features(tokenize(text)):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    nonzero = vec != 0
+    vec[nonzero] = np.sign(vec[nonzero]) * (1.0 + np.log(np.abs(vec[nonzero])))
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def intake_vector(input: UserAssessmentInput, dim: int = HASH_DIM) -> np.ndarray:
+    return hash_vector(normalize_intake(input), dim)
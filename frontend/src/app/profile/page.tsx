@@ -1,6 +1,6 @@
 "use client"
 
-import { useEffect, useMemo, useState } from "react"
+import { useCallback, useEffect, useState } from "react"
 import { useRouter } from "next/navigation"
 import { API_URL, logout } from "@/assess_server/api"
 
@@ -26,61 +26,99 @@ type AssessmentRecord = {
 	full_plan_json: Record<string, unknown>
 }
 
+type AssessmentSummary = Pick<AssessmentRecord, "id" | "created_at" | "issue_type" | "urgency" | "severity_score">
+
 type AssessmentsResponse = {
 	email: string
-	history: AssessmentRecord[]
+	history: AssessmentSummary[]
+	next_cursor: string | null
 }
 
+const PAGE_SIZE = 20
+
 export default function ProfilePage() {
 	const router = useRouter()
 	const [email, setEmail] = useState<string>("")
-	const [history, setHistory] = useState<AssessmentRecord[]>([])
+	const [history, setHistory] = useState<AssessmentSummary[]>([])
+	const [nextCursor, setNextCursor] = useState<string | null>(null)
 	const [isLoading, setIsLoading] = useState(true)
+	const [isLoadingMore, setIsLoadingMore] = useState(false)
 	const [error, setError] = useState<string | null>(null)
 	const [selected, setSelected] = useState<AssessmentRecord | null>(null)
+	const [detailError, setDetailError] = useState<string | null>(null)
 
-	useEffect(() => {
-		const token = localStorage.getItem("auth_token")
-		if (!token) {
-			router.push("/login")
-			return
-		}
+	// Authenticated GET; null when the session expired (and we're redirecting to login)
+	const authedFetch = useCallback(
+		async <T,>(path: string): Promise<T | null> => {
+			const token = localStorage.getItem("auth_token")
+			if (!token) {
+				router.push("/login")
+				return null
+			}
+
+			const response = await fetch(`${API_URL}${path}`, {
+				headers: {
+					Authorization: `Bearer ${token}`,
+				},
+			})
 
-		const load = async () => {
-			try {
-				const response = await fetch(`${API_URL}/api/me/assessments`, {
-					headers: {
-						Authorization: `Bearer ${token}`,
-					},
-				})
-
-				if (response.status === 401) {
-					logout()
-					router.push("/login")
-					return
-				}
-
-				if (!response.ok) {
-					throw new Error(`Request failed with status ${response.status}`)
-				}
-
-				const data = (await response.json()) as AssessmentsResponse
-				setEmail(data.email)
-				setHistory(data.history || [])
-			} catch (err) {
-				const message = err instanceof Error ? err.message : "Failed to load profile"
-				setError(message)
-			} finally {
-				setIsLoading(false)
+			if (response.status === 401) {
+				logout()
+				router.push("/login")
+				return null
 			}
-		}
 
-		load()
-	}, [router])
+			if (!response.ok) {
+				throw new Error(`Request failed with status ${response.status}`)
+			}
+
+			return (await response.json()) as T
+		},
+		[router]
+	)
+
+	// History arrives newest first, one page at a time (summary fields only)
+	const loadPage = useCallback(
+		async (cursor: string | null) => {
+			const params = new URLSearchParams({ limit: String(PAGE_SIZE) })
+			if (cursor) params.set("cursor", cursor)
+			const data = await authedFetch<AssessmentsResponse>(`/api/me/assessments?${params}`)
+			if (!data) return
+			setEmail(data.email)
+			setHistory((previous) => (cursor ? [...previous, ...data.history] : data.history || []))
+			setNextCursor(data.next_cursor)
+		},
+		[authedFetch]
+	)
+
+	useEffect(() => {
+		loadPage(null)
+			.catch((err) => setError(err instanceof Error ? err.message : "Failed to load profile"))
+			.finally(() => setIsLoading(false))
+	}, [loadPage])
+
+	const handleLoadMore = async () => {
+		if (!nextCursor) return
+		setIsLoadingMore(true)
+		try {
+			await loadPage(nextCursor)
+		} catch (err) {
+			setError(err instanceof Error ? err.message : "Failed to load more history")
+		} finally {
+			setIsLoadingMore(false)
+		}
+	}
 
-	const sortedHistory = useMemo(() => {
-		return [...history].sort((a, b) => (a.created_at < b.created_at ? 1 : -1))
-	}, [history])
+	// The full record (answers + plan JSON) is only fetched when a card is opened
+	const handleSelect = async (id: number) => {
+		setDetailError(null)
+		try {
+			const record = await authedFetch<AssessmentRecord>(`/api/me/assessments/${id}`)
+			if (record) setSelected(record)
+		} catch (err) {
+			setDetailError(err instanceof Error ? err.message : "Failed to load assessment")
+		}
+	}
 
 	const handleLogout = () => {
 		logout()
@@ -127,7 +165,10 @@ export default function ProfilePage() {
 
 						<div className="mb-6 flex items-center justify-between">
 							<h2 className="text-2xl font-semibold text-queens-navy">Your past conversations</h2>
-							<span className="text-sm text-text-secondary">{sortedHistory.length} total</span>
+							<span className="text-sm text-text-secondary">
+								{history.length}
+								{nextCursor ? "+" : ""} shown
+							</span>
 						</div>
 
 						{isLoading && (
@@ -138,19 +179,23 @@ export default function ProfilePage() {
 							<div className="action-card text-center text-red-600">{error}</div>
 						)}
 
-						{!isLoading && !error && sortedHistory.length === 0 && (
+						{detailError && (
+							<div className="action-card text-center text-red-600 mb-5">{detailError}</div>
+						)}
+
+						{!isLoading && !error && history.length === 0 && (
 							<div className="action-card text-center">
 								No assessments yet. Take one to see it here.
 							</div>
 						)}
 
-						{!isLoading && !error && sortedHistory.length > 0 && (
+						{!isLoading && !error && history.length > 0 && (
 							<div className="grid grid-cols-1 md:grid-cols-2 gap-5">
-								{sortedHistory.map((item) => (
+								{history.map((item) => (
 									<button
 										key={item.id}
 										type="button"
-										onClick={() => setSelected(item)}
+										onClick={() => handleSelect(item.id)}
 										className="action-card text-left"
 									>
 										<div className="flex items-center justify-between">
@@ -164,14 +209,23 @@ export default function ProfilePage() {
 										<p className="mt-2 text-sm text-text-secondary">
 											Issue: {item.issue_type} · Urgency: {item.urgency}
 										</p>
-										<p className="mt-3 text-sm text-text-primary line-clamp-2">
-											{item.raw_primary_concern}
-										</p>
 										<p className="mt-4 text-xs text-queens-navy font-semibold">View full details</p>
 									</button>
 								))}
 							</div>
 						)}
+
+						{!isLoading && nextCursor && (
+							<div className="mt-6 text-center">
+								<button
+									onClick={handleLoadMore}
+									disabled={isLoadingMore}
+									className="px-6 py-3 rounded-full bg-white text-queens-navy font-semibold shadow-md hover:shadow-lg transition border border-queens-navy disabled:opacity-60"
+								>
+									{isLoadingMore ? "Loading..." : "Load older conversations"}
+								</button>
+							</div>
+						)}
 					</div>
 				</div>
 			</div>
@@ -35,6 +35,7 @@ export interface AssessmentResponse {
     confidence: number                  // 0-1 (e.g., 0.85)
     reasoning: string                   // Why these scores were given
     personalized_note: string           // Friendly message to user
+    source?: string                     // tier that classified: gemini, cache, local, crisis, fallback
   }
   recommended_pathway: Array<{
     name: string
@@ -46,6 +47,8 @@ export interface AssessmentResponse {
     longitude?: number
     [key: string]: any
   }>
+  degraded_stages?: string[]            // stages that hit the deadline and used a fallback
+  prompt_versions?: Record<string, string> // prompt template version per LLM stage
 }
 
 // Stored in localStorage after assessment (pathway + user location for map)